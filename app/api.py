@@ -1,7 +1,6 @@
 # app/api.py - OPTIMIZED VERSION with caching and async processing
 from __future__ import annotations
 
-import io
 import os
 
 # Disable tokenizers parallelism warning
@@ -10,39 +9,108 @@ import ssl
 import tempfile
 import threading
 import time
-import wave
 import zipfile
 import asyncio
 import hashlib
+import hmac
+import json
+import queue
 from pathlib import Path
-from typing import Dict, Optional, Iterable, Iterator
+from typing import AsyncIterator, Dict, Optional, Iterable, Iterator, Tuple
 from urllib.parse import unquote
 from urllib.request import Request, urlopen
 from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 
 import numpy as np
-from fastapi import FastAPI, File, Form, Query, Request, UploadFile, BackgroundTasks
+from fastapi import FastAPI, File, Form, Query, Request, UploadFile, BackgroundTasks, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse, JSONResponse, Response
+from fastapi.responses import FileResponse, HTMLResponse, JSONResponse, Response
 from fastapi.staticfiles import StaticFiles
 from starlette.responses import StreamingResponse
 
-from app.utils.chunk_text import split_sentences
+from app.utils.chunk_text import IncrementalSegmenter, split_for_streaming, split_sentences
 from app.utils.extract_text import extract_text
-from app.utils.synthesize import synthesize_kokoro_chunks, synthesize_cosyvoice2_chunks, concat_audio, stream_cosyvoice2_cross, stream_kokoro_chunks, load_ref_16k_trimmed
+from app.utils.synthesize import COSY_STREAM_SR, synthesize_kokoro_chunks, synthesize_cosyvoice2_chunks, stream_cosyvoice2_cross, stream_kokoro_chunks, load_ref_16k_trimmed
 from app.utils.align_subtitles import mfa_align_chunks_to_srt
-from app.utils.make_captions import srt_to_vtt
-from app.utils.streaming import wav_stream_from_chunks, pcm16_stream_from_chunks
-from app.services.models import get_cosyvoice2, get_kokoro, preload_models
+from app.utils.make_captions import srt_text_to_vtt
+from app.utils.zipstream import stream_zip
+from app.utils.streaming import acaptioned_jsonl_stream, achain, aencoded_stream, apcm16_stream_from_chunks, awav_stream_from_chunks
+from app.utils.codecs import make_stream_encoder
+from app.utils.http_range import FileRangeResponse, RangeNotSatisfiable
+from app.utils.quantize import parse_mode as parse_quantize
+from app.services.models import (KOKORO_REGISTRY, get_cosyvoice2, kokoro_voices, model_fingerprint, preload_models,
+                                 set_quantization)
+from app.services.cache import ResultCache
+from app.services.jobs import JobManager
+from app.services.admission import Overloaded, build_controllers
+from app.services.audio_store import MEDIA_TYPES as AUDIO_MEDIA_TYPES, AudioStore, valid_key
+from app.services.coalesce import AsyncSingleFlight, StreamCoalescer
+from app.services.kokoro_batcher import batcher_stats as kokoro_batcher_stats
+from app.services.kokoro_pool import pool_stats as kokoro_pool_stats
+from app.services.engine_workers import engine_workers, start_engine_workers, stop_engine_workers, workers_stats
+from app.services.lifecycle import MODELS, ModelBusy
+from app.services.pipeline import RenderResult, start_render
+from app.services import metrics
+
+# Per-engine admission control: concurrent renders, queue depth and max estimated wait
+ENGINE_CONCURRENCY = {
+    # Kokoro renders only do G2P/packaging in their own thread; model work is
+    # micro-batched across requests, so more of them can usefully overlap.
+    "kokoro": int(os.environ.get("TTS_KOKORO_CONCURRENCY", "8")),
+    "cosyvoice2": int(os.environ.get("TTS_COSY_CONCURRENCY", "1")),
+}
+ADMISSION = build_controllers(
+    ENGINE_CONCURRENCY,
+    max_queue=int(os.environ.get("TTS_MAX_QUEUE", "16")),
+    max_wait=float(os.environ.get("TTS_MAX_WAIT_SECONDS", "120")),
+)
+
+# Thread pool for CPU-bound operations (sized so admitted renders never starve extraction)
+executor = ThreadPoolExecutor(max_workers=max(4, sum(ENGINE_CONCURRENCY.values()) + 2))
+
+# Cache for rendered /synthesize responses (bounded by total bytes, not entries)
+MAX_CACHE_BYTES = int(float(os.environ.get("TTS_RESULT_CACHE_MB", "256")) * 1024 * 1024)
+CACHE_TTL = float(os.environ.get("TTS_RESULT_CACHE_TTL", "3600"))  # 1 hour
+MAX_CACHE_ENTRY_BYTES = int(float(os.environ.get("TTS_RESULT_CACHE_ENTRY_MB", "64")) * 1024 * 1024)
+SYNTHESIS_CACHE = ResultCache(MAX_CACHE_BYTES, CACHE_TTL, MAX_CACHE_ENTRY_BYTES)
+
+# Single-flight coalescing of identical concurrent renders / live streams
+RENDERS = AsyncSingleFlight()
+_LIVE_RENDERS: Dict[str, RenderResult] = {}  # renders still synthesizing, by cache key
+STREAMS = StreamCoalescer()
+
+# Finished renders kept on disk by cache key for ranged playback (GET /audio/{key}.wav|flac)
+AUDIO_STORE = AudioStore(
+    os.environ.get("TTS_AUDIO_STORE_DIR") or os.path.join(os.environ.get("TTS_CACHE_DIR", "cache"), "renders"),
+    int(float(os.environ.get("TTS_AUDIO_STORE_MB", "4096")) * 1024 * 1024),
+)
+TRANSCODES = AsyncSingleFlight()
 
-# Thread pool for CPU-bound operations
-executor = ThreadPoolExecutor(max_workers=4)
+# Background jobs for long documents (state persisted under TTS_JOBS_DIR)
+JOBS = JobManager(
+    os.environ.get("TTS_JOBS_DIR", "jobs"),
+    workers=int(os.environ.get("TTS_JOB_WORKERS", "1")),
+    ttl=float(os.environ.get("TTS_JOB_TTL", "86400")),
+)
 
-# Cache for synthesis results
-SYNTHESIS_CACHE = {}
-CACHE_LOCK = threading.Lock()
-MAX_CACHE_SIZE = 50
-CACHE_TTL = 3600  # 1 hour
+# Scrape-time gauges for /metrics
+metrics.Gauge("tts_executor_queue_depth", "Tasks waiting for a thread in the blocking-work executor.",
+              fn=lambda: executor._work_queue.qsize())
+metrics.Gauge("tts_admission_active", "Renders currently holding an admission slot.", ["engine"],
+              fn=lambda: {(name,): ctl.active for name, ctl in ADMISSION.items()})
+metrics.Gauge("tts_admission_waiting", "Renders queued for an admission slot.", ["engine"],
+              fn=lambda: {(name,): ctl.waiting for name, ctl in ADMISSION.items()})
+metrics.Gauge("tts_result_cache_bytes", "Bytes held by the /synthesize result cache.",
+              fn=lambda: SYNTHESIS_CACHE.stats()["bytes"])
+metrics.Gauge("tts_live_streams", "Live synthesis streams currently producing audio.",
+              fn=lambda: STREAMS.stats()["inflight"])
+metrics.Gauge("tts_kokoro_registry_bytes", "Estimated memory held by loaded Kokoro models and pipelines.",
+              fn=lambda: KOKORO_REGISTRY.stats()["bytes"])
+metrics.Gauge("tts_kokoro_replicas_busy", "Kokoro model replicas currently checked out.",
+              fn=lambda: kokoro_pool_stats()["busy"])
+metrics.Gauge("tts_model_resident_bytes", "Memory attributed to each loaded model (0 when unloaded).", ["model"],
+              fn=lambda: {(m["name"],): m["resident_bytes"] for m in MODELS.status()})
 
 app = FastAPI(title="TTS Starter - Optimized")
 
@@ -54,119 +122,163 @@ app.add_middleware(
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Audio-URL", "Content-Range", "Accept-Ranges"],
 )
 
 # ---------------- Cache Management ----------------
 
 
-def get_cache_key(text: str, engine: str, voice: str, speed: float, align: bool) -> str:
-    """Generate a cache key for synthesis parameters"""
-    # Use first 500 chars of text for key to avoid huge keys
-    text_key = text[:500] if len(text) > 500 else text
-    key_str = f"{engine}:{voice}:{speed}:{align}:{text_key}"
-    return hashlib.md5(key_str.encode()).hexdigest()
+def _digest(data: bytes | None) -> str:
+    return hashlib.sha256(data).hexdigest() if data else ""
+
+
+def get_cache_key(
+    text: str,
+    engine: str,
+    voice: str,
+    speed: float,
+    align: bool,
+    *,
+    file_digest: str = "",
+    post: str = "",
+    max_chars: int = 240,
+    cosy_mode: str = "",
+    cosy_prompt: str = "",
+    cosy_ref_digest: str = "",
+) -> str:
+    """Generate a cache key covering the full text, the model (identity and precision) and every output-affecting parameter"""
+    h = hashlib.sha256()
+    parts = [
+        engine, model_fingerprint(engine), f"{float(speed):.4f}", str(bool(align)), post or "", str(int(max_chars)),
+        file_digest, _digest((text or "").encode("utf-8")),
+    ]
+    if engine == "cosyvoice2":
+        parts += [cosy_mode or "", cosy_prompt or "", cosy_ref_digest]
+    else:
+        parts += [voice or ""]
+    for part in parts:
+        h.update(part.encode("utf-8"))
+        h.update(b"\x00")
+    return h.hexdigest()
 
 
 def cache_result(key: str, data: bytes):
-    """Store result in cache with TTL"""
-    with CACHE_LOCK:
-        # Remove oldest entries if cache is full
-        if len(SYNTHESIS_CACHE) >= MAX_CACHE_SIZE:
-            oldest = min(SYNTHESIS_CACHE.items(),
-                         key=lambda x: x[1]['timestamp'])
-            del SYNTHESIS_CACHE[oldest[0]]
-
-        SYNTHESIS_CACHE[key] = {
-            'data': data,
-            'timestamp': time.time()
-        }
+    """Store result in cache; LRU entries are evicted to stay under MAX_CACHE_BYTES"""
+    SYNTHESIS_CACHE.put(key, data)
 
 
 def get_cached_result(key: str) -> Optional[bytes]:
     """Get cached result if available and not expired"""
-    with CACHE_LOCK:
-        if key in SYNTHESIS_CACHE:
-            entry = SYNTHESIS_CACHE[key]
-            # Check if expired
-            if time.time() - entry['timestamp'] < CACHE_TTL:
-                # Update timestamp for LRU
-                entry['timestamp'] = time.time()
-                return entry['data']
-            else:
-                # Remove expired entry
-                del SYNTHESIS_CACHE[key]
-    return None
+    data = SYNTHESIS_CACHE.get(key)
+    metrics.CACHE_REQUESTS.inc(cache="result", result="miss" if data is None else "hit")
+    return data
 
 
 def clear_old_cache():
     """Background task to clear expired cache entries"""
-    with CACHE_LOCK:
-        current_time = time.time()
-        expired_keys = [
-            k for k, v in SYNTHESIS_CACHE.items()
-            if current_time - v['timestamp'] > CACHE_TTL
-        ]
-        for key in expired_keys:
-            del SYNTHESIS_CACHE[key]
+    SYNTHESIS_CACHE.purge_expired()
 
 # ---------------- Async Wrappers ----------------
 
 
-async def async_synthesize_kokoro(chunks, voice, lang_code, speed):
+async def run_blocking(fn, *args, **kwargs):
+    """Run a CPU-bound/blocking call on the shared executor without blocking the event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, partial(fn, *args, **kwargs))
+
+
+async def async_synthesize_kokoro(chunks, voice, lang_code, speed, cache_dir=None):
     """Async wrapper for Kokoro synthesis"""
-    loop = asyncio.get_event_loop()
-    return await loop.run_in_executor(
-        executor,
-        synthesize_kokoro_chunks,
-        chunks,
-        voice,
-        lang_code,
-        speed
-    )
+    return await run_blocking(
+        synthesize_kokoro_chunks, chunks, voice=voice, lang_code=lang_code, speed=speed, cache_dir=cache_dir)
 
 
-async def async_synthesize_cosyvoice2(chunks, model_dir, ref_wav, prompt_text, stream, fp16, mode, speed):
+async def async_synthesize_cosyvoice2(chunks, model_dir, ref_wav, prompt_text, stream, fp16, mode, speed, cache_dir=None):
     """Async wrapper for CosyVoice2 synthesis"""
-    loop = asyncio.get_event_loop()
-    return await loop.run_in_executor(
-        executor,
+    return await run_blocking(
         synthesize_cosyvoice2_chunks,
         chunks,
-        model_dir,
-        ref_wav,
-        prompt_text,
-        stream,
-        fp16,
-        mode,
-        speed
+        model_dir=model_dir,
+        ref_wav=ref_wav,
+        prompt_text=prompt_text,
+        stream=stream,
+        fp16=fp16,
+        mode=mode,
+        speed=speed,
+        cache_dir=cache_dir,
     )
 
 
 async def async_align_chunks(chunks, wavs, sr, srt_path, num_jobs, single_speaker):
     """Async wrapper for MFA alignment"""
-    loop = asyncio.get_event_loop()
-    return await loop.run_in_executor(
-        executor,
-        mfa_align_chunks_to_srt,
-        chunks,
-        wavs,
-        sr,
-        srt_path,
-        num_jobs,
-        single_speaker
+    return await run_blocking(
+        mfa_align_chunks_to_srt, chunks, wavs, sr, srt_path, num_jobs=num_jobs, single_speaker=single_speaker)
+
+
+def _overloaded_response(e: Overloaded) -> JSONResponse:
+    return JSONResponse(
+        {"error": "server busy", "reason": e.reason, "retry_after": e.retry_after},
+        status_code=e.status_code,
+        headers={"Retry-After": str(e.retry_after)},
     )
 
 # ---------------- Helper functions ----------------
 
 
-def _save_full_wav(path: str, audio: np.ndarray, sr: int = 24000):
-    """Save audio array as WAV file."""
-    a16 = (np.clip(audio, -1, 1) * 32767).astype("<i2").tobytes()
-    with wave.open(path, "wb") as f:
-        f.setnchannels(1)
-        f.setsampwidth(2)
-        f.setframerate(sr)
-        f.writeframes(a16)
+def _extract_upload(content: bytes, suffix: str) -> str:
+    """Write an uploaded document to a temp file and extract its text."""
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
+        tmp.write(content)
+        tmp.flush()
+    try:
+        with metrics.STAGE_SECONDS.time(stage="extract_text"):
+            return extract_text(tmp.name)
+    finally:
+        os.unlink(tmp.name)
+
+
+def _split_chunks(text: str, max_chars: int) -> list[str]:
+    with metrics.STAGE_SECONDS.time(stage="split_sentences"):
+        return split_sentences(text, max_chars=max_chars)
+
+
+def _zip_entries(render: RenderResult):
+    yield "audio.wav", render.audio_blocks(), zipfile.ZIP_STORED
+    render.wait()  # captions close the archive once alignment is done
+    srt = render.srt
+    with metrics.STAGE_SECONDS.time(stage="captions"):
+        vtt = srt_text_to_vtt(srt)
+    yield "captions.srt", srt.encode("utf-8"), zipfile.ZIP_DEFLATED
+    yield "captions.vtt", vtt.encode("utf-8"), zipfile.ZIP_DEFLATED
+
+
+def _zip_response(render: RenderResult) -> StreamingResponse:
+    """
+    Stream audio.wav (stored, not deflated) + captions as a ZIP without building
+    it in memory. audio.wav follows a live render as its chunks land; the
+    captions are appended when alignment finishes.
+    """
+    body = stream_zip(_zip_entries(render))
+    if render.done:  # otherwise the time is mostly spent waiting on synthesis, not packaging
+        body = metrics.timed_iter(body, metrics.STAGE_SECONDS, stage="package")
+    return StreamingResponse(
+        body,
+        media_type="application/zip",
+        headers={
+            "Content-Disposition": "attachment; filename=tts_output.zip",
+            "X-Cache": "MISS",
+        },
+    )
+
+
+def _publish_render(cache_key: str, render: RenderResult) -> None:
+    """Keep a finished render: its WAV for /audio/{key} and, if it fits an entry, the ZIP in the result cache."""
+    try:
+        AUDIO_STORE.put(cache_key, render.wav_path)
+    except OSError as e:
+        print(f"Warning: could not store rendered audio {cache_key}: {e}")
+    if render.wav_bytes + 2 * len(render.srt) + 1024 <= SYNTHESIS_CACHE.max_entry_bytes:
+        cache_result(cache_key, b"".join(stream_zip(_zip_entries(render))))
 
 
 def _primer_silence(sr: int, ms: int = 120) -> bytes:
@@ -274,8 +386,6 @@ def home() -> HTMLResponse:
 def health():
     """Health check endpoint with cache stats"""
     import torch
-    with CACHE_LOCK:
-        cache_size = len(SYNTHESIS_CACHE)
 
     gpu_info = {}
     if torch.cuda.is_available():
@@ -287,20 +397,30 @@ def health():
 
     return {
         "ok": True,
-        "cache_size": cache_size,
-        "max_cache_size": MAX_CACHE_SIZE,
+        "cache_size": len(SYNTHESIS_CACHE),
+        "cache": SYNTHESIS_CACHE.stats(),
+        "admission": {name: ctl.stats() for name, ctl in ADMISSION.items()},
+        "coalescing": {"renders": RENDERS.stats(), "streams": STREAMS.stats()},
+        "audio_store": AUDIO_STORE.stats(),
+        "kokoro_batching": kokoro_batcher_stats(),
+        "kokoro_pool": kokoro_pool_stats(),
+        "kokoro_registry": KOKORO_REGISTRY.stats(),
+        "engine_workers": workers_stats(),
+        "models": MODELS.status(),
         **gpu_info
     }
 
 
+@app.get("/metrics")
+def prometheus_metrics():
+    """Prometheus text exposition of this worker's metrics."""
+    return Response(metrics.render_latest(), media_type=metrics.CONTENT_TYPE)
+
+
 @app.get("/voices")
 def list_voices():
-    try:
-        kp = get_kokoro()
-        voices = sorted({v for v in getattr(kp, "voices", [])} or {"af_heart"})
-        return {"voices": voices}
-    except Exception:
-        return {"voices": ["af_heart"]}
+    # From the repo's voice files: listing voices must not load Kokoro into this process
+    return {"voices": kokoro_voices()}
 
 
 @app.get("/recommended-engine")
@@ -310,9 +430,194 @@ async def get_recommended_engine_endpoint():
     recommended = get_recommended_engine()
     return {"recommended_engine": recommended}
 
+# ---------------- Model lifecycle (admin) ----------------
+
+ADMIN_TOKEN = os.environ.get("TTS_ADMIN_TOKEN", "")
+
+
+def _admin_denied(request: Request) -> Optional[JSONResponse]:
+    """Error response unless the request carries TTS_ADMIN_TOKEN; with no token configured, admin is off."""
+    if not ADMIN_TOKEN:
+        return JSONResponse({"error": "admin endpoints disabled (TTS_ADMIN_TOKEN not set)"}, status_code=403)
+    if not hmac.compare_digest(request.headers.get("x-admin-token", "").encode(), ADMIN_TOKEN.encode()):
+        return JSONResponse({"error": "admin token required"}, status_code=401)
+    return None
+
+
+def _admin_model(request: Request, name: str) -> Optional[JSONResponse]:
+    """Error response for a rejected admin call on model `name`, or None if it may proceed."""
+    denied = _admin_denied(request)
+    if denied is not None:
+        return denied
+    if name not in MODELS.names():
+        return JSONResponse({"error": f"unknown model: {name}"}, status_code=404)
+    if engine_workers(name) is not None:
+        # the model lives in the worker processes, which manage it themselves (TTS_MODEL_IDLE_TTL etc.)
+        return JSONResponse({"error": f"{name} is served by worker processes"}, status_code=409)
+    return None
+
+
+@app.get("/admin/models")
+def admin_list_models(request: Request):
+    """Per-model state, warmth, resident size and idle time in this process."""
+    denied = _admin_denied(request)
+    if denied is not None:
+        return denied
+    return {"models": MODELS.status(), "engine_workers": workers_stats()}
+
+
+@app.post("/admin/models/{name}/load")
+async def admin_load_model(name: str, request: Request, warm: bool = Query(False),
+                           quantize: Optional[str] = Query(None)):
+    """
+    Load a model now (optionally with a warm-up inference) instead of on the
+    next request. `quantize=int8|none` picks the precision it loads with.
+    """
+    rejected = _admin_model(request, name)
+    if rejected is not None:
+        return rejected
+    if quantize is not None:
+        try:
+            mode = parse_quantize(quantize)
+        except ValueError as e:
+            return JSONResponse({"error": str(e)}, status_code=400)
+        status = MODELS.status(name)
+        if status["state"] != "unloaded" and status["quantize"] != mode:
+            return JSONResponse({"error": f"{name} is loaded with quantize={status['quantize']}; unload it first",
+                                 **status}, status_code=409)
+        set_quantization(name, mode)
+    try:
+        return await run_blocking(partial(MODELS.load, name, warm=warm))
+    except Exception as e:
+        return JSONResponse({"error": f"load failed: {e}", **MODELS.status(name)}, status_code=500)
+
+
+@app.post("/admin/models/{name}/unload")
+async def admin_unload_model(name: str, request: Request, force: bool = Query(False)):
+    """Release a model's memory; 409 while requests are using it unless force=true."""
+    rejected = _admin_model(request, name)
+    if rejected is not None:
+        return rejected
+    try:
+        return await run_blocking(partial(MODELS.unload, name, force=force))
+    except ModelBusy as e:
+        return JSONResponse({"error": str(e), **MODELS.status(name)}, status_code=409)
+
+
+@app.post("/admin/models/{name}/warm")
+async def admin_warm_model(name: str, request: Request):
+    """Run a warm-up inference (loading the model first if needed)."""
+    rejected = _admin_model(request, name)
+    if rejected is not None:
+        return rejected
+    try:
+        return await run_blocking(partial(MODELS.load, name, warm=True))
+    except Exception as e:
+        return JSONResponse({"error": f"warm-up failed: {e}", **MODELS.status(name)}, status_code=500)
+
 # ---------------- Main synthesis endpoint - OPTIMIZED ----------------
 
 
+class NoTextError(ValueError):
+    """The request (or extracted document) contained no text to synthesize."""
+
+
+async def _render(
+    *,
+    cache_key: str,
+    engine: str,
+    text: Optional[str],
+    file_content: Optional[bytes],
+    file_suffix: str,
+    ref_content: Optional[bytes],
+    voice: str,
+    speed: float,
+    align: bool,
+    max_chars: int,
+    cosy_mode: str,
+    cosy_prompt: str,
+):
+    """
+    Extract → split → start the pipelined synthesize/write/caption render.
+    Returns its RenderResult as soon as the first audio is on disk; the rest
+    runs on under the admission slot (see _run_render).
+    """
+    # Extract text from input (PDF/ePub parsing is CPU-bound: keep it off the loop)
+    if file_content:
+        input_text = await run_blocking(_extract_upload, file_content, file_suffix)
+    else:
+        input_text = text.strip()
+
+    if not input_text:
+        raise NoTextError("No text content found")
+
+    # Split into chunks
+    chunks = await run_blocking(_split_chunks, input_text, max_chars)
+    metrics.REQUEST_CHUNKS.observe(len(chunks), endpoint="synthesize")
+
+    started: asyncio.Future = asyncio.get_running_loop().create_future()
+    asyncio.ensure_future(_run_render(
+        started, cache_key, engine, chunks, cost=len(input_text), ref_content=ref_content,
+        align=align, voice=voice, speed=speed, prompt_text=cosy_prompt, mode=cosy_mode,
+    ))
+    return await started
+
+
+async def _run_render(started: asyncio.Future, cache_key: str, engine: str, chunks: list[str], *,
+                      cost: int, ref_content: Optional[bytes], **render_kwargs) -> None:
+    """
+    Run one render under the engine's admission slot, resolving `started`
+    with the RenderResult once audio is flowing (or with the error if it
+    fails before that). The slot is held until synthesis and alignment end;
+    the finished render is then published to the audio store and result cache.
+    """
+    render: Optional[RenderResult] = None
+    try:
+        async with ADMISSION[engine].slot(cost=cost):
+            # Handle reference audio if provided
+            ref_path = None
+            if ref_content:
+                with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as tmp:
+                    tmp.write(ref_content)
+                    tmp.flush()
+                    ref_path = tmp.name
+            try:
+                render = await run_blocking(
+                    start_render,
+                    engine,
+                    chunks,
+                    spool_dir=os.environ.get("TTS_SPOOL_DIR") or AUDIO_STORE.spool_dir,
+                    synth_chunks=int(os.environ.get("TTS_PIPELINE_CHUNKS", "4")),
+                    align_prefix_chars=int(os.environ.get("TTS_PIPELINE_ALIGN_PREFIX_CHARS", "200")),
+                    ref_wav=ref_path,
+                    # Enable caching for better performance
+                    cache_dir=os.environ.get("TTS_CACHE_DIR", "cache"),
+                    **render_kwargs,
+                )
+                _LIVE_RENDERS[cache_key] = render  # identical requests join it until it finishes
+                await run_blocking(render.wait_started)
+                started.set_result(render)
+                await run_blocking(render.wait)
+            finally:
+                if render is not None and _LIVE_RENDERS.get(cache_key) is render:
+                    del _LIVE_RENDERS[cache_key]
+                # Clean up temp ref file (the engine reads it until synthesis ends)
+                if ref_path:
+                    try:
+                        os.unlink(ref_path)
+                    except (OSError, IOError) as e:
+                        # Log the error but don't fail the request
+                        print(
+                            f"Warning: Failed to delete temp file {ref_path}: {e}")
+        await run_blocking(_publish_render, cache_key, render)
+    except BaseException as e:
+        if not started.done():
+            started.set_exception(e)
+        elif not isinstance(e, asyncio.CancelledError):
+            # readers of the render see the error themselves (their ZIP stream is cut short)
+            print(f"Synthesis error after streaming started: {e}")
+
+
 # Fixed version of the synthesize_full method
 # Replace the existing synthesize_full method with this one:
 
@@ -339,157 +644,322 @@ async def synthesize_full(
         if engine == "auto":
             from app.services.models import get_recommended_engine
             engine = get_recommended_engine()
-            print(f"Auto-selected engine: {engine}")
         
-        # Extract text from input
-        if file and file.filename:
-            # Save uploaded file temporarily
-            with tempfile.NamedTemporaryFile(delete=False, suffix=Path(file.filename).suffix) as tmp:
-                content = await file.read()
-                tmp.write(content)
-                tmp.flush()
-                input_text = extract_text(tmp.name)
-                os.unlink(tmp.name)
-        elif text:
-            input_text = text.strip()
-        else:
-            return JSONResponse({"error": "No text or file provided"}, status_code=400)
-
-        if not input_text:
-            return JSONResponse({"error": "No text content found"}, status_code=400)
+        engine = engine.lower().strip()
+        if engine not in ("kokoro", "cosyvoice2"):
+            return JSONResponse({"error": f"Unknown engine: {engine}"}, status_code=400)
+        metrics.REQUESTS.inc(endpoint="synthesize", engine=engine)
 
-        # Split into chunks
-        chunks = split_sentences(input_text, max_chars=max_chars)
-        print(f"Processing {len(chunks)} chunks (max_chars={max_chars})")
+        # Read uploads up front so their content is part of the cache key
+        file_content = await file.read() if file and file.filename else None
+        ref_content = await cosy_ref.read() if engine == "cosyvoice2" and cosy_ref and cosy_ref.filename else None
+        if not file_content and not (text and text.strip()):
+            return JSONResponse({"error": "No text or file provided"}, status_code=400)
 
-        # Synthesize audio
-        engine = engine.lower().strip()
-        if engine == "kokoro":
-            # Enable caching for better performance
-            cache_dir = os.environ.get("TTS_CACHE_DIR", "cache")
-            wavs, sr = synthesize_kokoro_chunks(
-                chunks,
+        cache_key = get_cache_key(
+            "" if file_content else text.strip(),
+            engine,
+            voice,
+            speed,
+            align.lower() == "true",
+            file_digest=_digest(file_content) + (Path(file.filename).suffix.lower() if file_content else ""),
+            post=post,
+            max_chars=max_chars,
+            cosy_mode=cosy_mode,
+            cosy_prompt=cosy_prompt,
+            cosy_ref_digest=_digest(ref_content),
+        )
+        cached = get_cached_result(cache_key)
+        if cached is not None:
+            headers = {
+                "Content-Disposition": "attachment; filename=tts_output.zip",
+                "X-Cache": "HIT",
+            }
+            if AUDIO_STORE.has(cache_key):
+                headers["X-Audio-URL"] = f"/audio/{cache_key}.wav"
+            return Response(content=cached, media_type="application/zip", headers=headers)
+
+        # Identical concurrent requests share one render; each streams its own ZIP
+        render = _LIVE_RENDERS.get(cache_key)
+        shared = render is not None
+        if render is None:
+            render, shared = await RENDERS.do(cache_key, partial(
+                _render,
+                cache_key=cache_key,
+                engine=engine,
+                text=text,
+                file_content=file_content,
+                file_suffix=Path(file.filename).suffix if file_content else "",
+                ref_content=ref_content,
                 voice=voice,
-                lang_code="a",
                 speed=speed,
-                cache_dir=cache_dir,
-            )
-        elif engine == "cosyvoice2":
-            # Handle reference audio if provided
-            ref_path = None
-            if cosy_ref and cosy_ref.filename:
-                with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as tmp:
-                    content = await cosy_ref.read()
-                    tmp.write(content)
-                    tmp.flush()
-                    ref_path = tmp.name
+                align=align.lower() == "true",
+                max_chars=max_chars,
+                cosy_mode=cosy_mode,
+                cosy_prompt=cosy_prompt,
+            ))
+        response = _zip_response(render)
+        if shared:
+            response.headers["X-Coalesced"] = "1"
+        # Published to the audio store when the render finishes
+        response.headers["X-Audio-URL"] = f"/audio/{cache_key}.wav"
+        return response
+
+    except NoTextError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    except Overloaded as e:
+        return _overloaded_response(e)
+    except Exception as e:
+        print(f"Synthesis error: {e}")
+        import traceback
+        traceback.print_exc()
+        return JSONResponse({"error": str(e)}, status_code=500)
 
-            wavs, sr = synthesize_cosyvoice2_chunks(
-                chunks,
-                model_dir=None,
-                ref_wav=ref_path,
-                prompt_text=cosy_prompt,
-                stream=False,
-                fp16=False,
-                mode=cosy_mode,
-                speed=speed,
-            )
+# ---------------- Background jobs for long documents ----------------
 
-            # Clean up temp ref file
-            if ref_path:
-                try:
-                    os.unlink(ref_path)
-                except (OSError, IOError) as e:
-                    # Log the error but don't fail the request
-                    print(
-                        f"Warning: Failed to delete temp file {ref_path}: {e}")
-        else:
-            return JSONResponse({"error": f"Unknown engine: {engine}"}, status_code=400)
 
-        # Concatenate audio
-        full_audio = concat_audio(wavs)
+@app.post("/jobs")
+async def create_job(
+    text: str = Form(None),
+    file: UploadFile = File(None),
+    engine: str = Form("auto"),
+    voice: str = Form("af_heart"),
+    speed: float = Form(1.0),
+    align: str = Form("true"),
+    max_chars: int = Form(240),
+    cosy_mode: str = Form("cross"),
+    cosy_prompt: str = Form(""),
+    cosy_ref: UploadFile = File(None),
+):
+    """
+    Queue a synthesis job and return its id immediately.
+    Takes the same fields as /synthesize; poll GET /jobs/{id} for progress.
+    """
+    if engine == "auto":
+        from app.services.models import get_recommended_engine
+        engine = get_recommended_engine()
+    engine = engine.lower().strip()
+    if engine not in ("kokoro", "cosyvoice2"):
+        return JSONResponse({"error": f"Unknown engine: {engine}"}, status_code=400)
+
+    file_content = await file.read() if file and file.filename else None
+    ref_content = await cosy_ref.read() if engine == "cosyvoice2" and cosy_ref and cosy_ref.filename else None
+    if not file_content and not (text and text.strip()):
+        return JSONResponse({"error": "No text or file provided"}, status_code=400)
+
+    params = {
+        "engine": engine,
+        "voice": voice,
+        "speed": float(speed),
+        "align": align.lower() == "true",
+        "max_chars": int(max_chars),
+        "cosy_mode": cosy_mode,
+        "cosy_prompt": cosy_prompt,
+    }
+    job_id = JOBS.submit(
+        params,
+        text=None if file_content else text.strip(),
+        file_bytes=file_content,
+        file_suffix=Path(file.filename).suffix if file_content else "",
+        ref_bytes=ref_content,
+    )
+    return JSONResponse(
+        {"job_id": job_id, "status_url": f"/jobs/{job_id}", "result_url": f"/jobs/{job_id}/result"},
+        status_code=202,
+    )
 
-        # Create output directory
-        with tempfile.TemporaryDirectory() as temp_dir:
-            temp_path = Path(temp_dir)
 
-            # Save audio
-            audio_path = temp_path / "audio.wav"
-            _save_full_wav(str(audio_path), full_audio, sr)
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    """Job state, chunks done/total and ETA."""
+    status = JOBS.status(job_id)
+    if status is None:
+        return JSONResponse({"error": "job not found"}, status_code=404)
+    return status
 
-            # Generate subtitles
-            srt_path = temp_path / "captions.srt"
 
-            # Check if we should skip MFA alignment based on text length and system capabilities
-            total_chars = sum(len(chunk) for chunk in chunks)
-            
-            # Adjust MFA threshold based on recommended engine (system capability)
-            from app.services.models import get_recommended_engine
-            recommended = get_recommended_engine()
-            
-            if recommended == "kokoro":
-                # Lower-end system - be more conservative with MFA
-                mfa_threshold = 300  # Use MFA only for very short texts
-            else:
-                # Higher-end system - can handle MFA on longer texts
-                mfa_threshold = 1000
-                
-            use_simple_timing = total_chars > mfa_threshold
-            
-            if align.lower() == "true" and not use_simple_timing:
-                try:
-                    # Use MFA for precise alignment with more CPU cores
-                    num_cores = min(os.cpu_count() or 4, 8)  # Use up to 8 cores
-                    mfa_align_chunks_to_srt(
-                        chunks,
-                        wavs,
-                        sr,
-                        str(srt_path),
-                        num_jobs=num_cores,
-                        single_speaker=True,
-                    )
-                except Exception as e:
-                    print(f"MFA alignment failed ({e}), falling back to duration-based timing")
-                    # Fallback to duration-based alignment
-                    from app.utils.srt import srt_from_durations
-                    durations_ms = [int(len(wav) / sr * 1000) for wav in wavs]
-                    srt_content = srt_from_durations(chunks, durations_ms)
-                    srt_path.write_text(srt_content, encoding="utf-8")
-            else:
-                # Duration-based alignment only (for short text or when align=false)
-                if use_simple_timing:
-                    print(f"Skipping MFA alignment for short text ({total_chars} chars). Using simple timing.")
-                from app.utils.srt import srt_from_durations
-                durations_ms = [int(len(wav) / sr * 1000) for wav in wavs]
-                srt_content = srt_from_durations(chunks, durations_ms)
-                srt_path.write_text(srt_content, encoding="utf-8")
-
-            # Generate VTT
-            vtt_path = temp_path / "captions.vtt"
-            srt_to_vtt(str(srt_path), str(vtt_path))
-
-            # Create ZIP file
-            zip_buffer = io.BytesIO()
-            with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-                zip_file.write(audio_path, "audio.wav")
-                zip_file.write(srt_path, "captions.srt")
-                zip_file.write(vtt_path, "captions.vtt")
-
-            zip_buffer.seek(0)
-
-            return Response(
-                content=zip_buffer.getvalue(),
-                media_type="application/zip",
-                headers={
-                    "Content-Disposition": "attachment; filename=tts_output.zip"
-                }
-            )
+@app.get("/jobs/{job_id}/result")
+def get_job_result(job_id: str):
+    """Download the finished job's ZIP (audio.wav + captions)."""
+    status = JOBS.status(job_id)
+    if status is None:
+        return JSONResponse({"error": "job not found"}, status_code=404)
+    path = JOBS.result_path(job_id)
+    if path is None:
+        return JSONResponse({"error": f"job is {status['state']}", **status}, status_code=409)
+    return FileResponse(str(path), media_type="application/zip", filename="tts_output.zip")
 
-    except Exception as e:
-        print(f"Synthesis error: {e}")
-        import traceback
-        traceback.print_exc()
-        return JSONResponse({"error": str(e)}, status_code=500)
+
+@app.api_route("/jobs/{job_id}/audio.wav", methods=["GET", "HEAD"])
+def get_job_audio(job_id: str, request: Request):
+    """The finished job's audio.wav, served in place from the stored ZIP entry with Range support."""
+    status = JOBS.status(job_id)
+    if status is None:
+        return JSONResponse({"error": "job not found"}, status_code=404)
+    span = JOBS.audio_span(job_id)
+    if span is None:
+        return JSONResponse({"error": f"job is {status['state']}", **status}, status_code=409)
+    path, offset, length = span
+    return _ranged_file(request, str(path), "audio/wav", etag=f'"{job_id}"', filename="tts_output.wav",
+                        offset=offset, length=length)
+
+# ---------------- Rendered audio (seekable) ----------------
+
+
+AUDIO_MAX_AGE = int(os.environ.get("TTS_AUDIO_MAX_AGE", "300"))
+
+
+def _ranged_file(request: Request, path: str, media_type: str, *, etag: str, filename: str, **span) -> Response:
+    try:
+        return FileRangeResponse(
+            path,
+            media_type=media_type,
+            range_header=request.headers.get("range"),
+            if_range=request.headers.get("if-range"),
+            if_none_match=request.headers.get("if-none-match"),
+            etag=etag,
+            filename=filename,
+            method=request.method,
+            # A key can be rendered again (expiry, model or precision change): revalidate with the ETag
+            headers={"Cache-Control": f"public, max-age={AUDIO_MAX_AGE}, must-revalidate"},
+            **span,
+        )
+    except FileNotFoundError:
+        return JSONResponse({"error": "audio not found"}, status_code=404)
+    except RangeNotSatisfiable:
+        size = span.get("length")
+        if size is None:
+            size = os.path.getsize(path) - span.get("offset", 0)
+        return Response(status_code=416, headers={"Content-Range": f"bytes */{size}", "Accept-Ranges": "bytes"})
+
+
+@app.api_route("/audio/{name}", methods=["GET", "HEAD"])
+async def get_audio(name: str, request: Request):
+    """
+    A finished /synthesize render by cache key (see the X-Audio-URL response
+    header): /audio/{key}.wav or .flac, with Content-Length and Range support.
+    """
+    key, _, fmt = name.partition(".")
+    fmt = fmt.lower() or "wav"
+    if fmt not in AUDIO_MEDIA_TYPES:
+        return JSONResponse({"error": f"unsupported format: {fmt}"}, status_code=400)
+    if not valid_key(key):
+        return JSONResponse({"error": "audio not found"}, status_code=404)
+    if fmt == "wav":
+        path = AUDIO_STORE.get(key, fmt)
+    else:
+        # FLAC is encoded once, on first request; concurrent requests wait for the same encode
+        path, _ = await TRANSCODES.do(f"{key}.{fmt}", partial(run_blocking, AUDIO_STORE.get, key, fmt))
+    if path is None:
+        return JSONResponse({"error": "audio not found (expired or never rendered)"}, status_code=404)
+    return _ranged_file(request, path, AUDIO_MEDIA_TYPES[fmt], etag=f'"{key}.{fmt}"', filename=f"tts_output.{fmt}")
+
+# ---------------- Live stream coalescing ----------------
+
+
+def _stream_key(engine: str, text: str, *, voice: str = "", speed: float = 1.0,
+                max_chars: int = 0, chunking: str = "", ref_path: Optional[str] = None) -> str:
+    """
+    Key for sharing one live synthesis between identical concurrent listeners.
+    Whitespace is normalized; the output format is not part of the key because
+    framing (WAV/PCM, primer) is applied per listener.
+    """
+    ref_digest = ""
+    if ref_path:
+        try:
+            ref_digest = _digest(Path(ref_path).read_bytes())
+        except OSError:
+            ref_digest = ref_path
+    parts = [engine, model_fingerprint(engine), " ".join(text.split()), f"{float(speed):.3f}"]
+    if engine == "cosyvoice2":
+        parts += ["cross", ref_digest]
+    else:
+        parts += [voice, str(max_chars), chunking]
+    return hashlib.sha256("\x00".join(parts).encode("utf-8")).hexdigest()
+
+
+def _stream_chunks(text: str, max_chars: int, chunking: str, engine: str) -> list[str]:
+    """
+    "latency" (default): tiny first chunk, growing later, sized against the
+    engine's measured realtime factor; "sentences": plain split_sentences.
+    """
+    if (chunking or "latency").lower() == "sentences":
+        return _split_chunks(text, max_chars)
+    rtf = metrics.REALTIME_FACTOR.mean(engine=engine) or float(os.environ.get("TTS_STREAM_ASSUMED_RTF", "0.5"))
+    with metrics.STAGE_SECONDS.time(stage="split_sentences"):
+        return split_for_streaming(
+            text, max_chars=max_chars,
+            first_chars=int(os.environ.get("TTS_STREAM_FIRST_CHARS", "48")),
+            rtf=rtf)
+
+
+# Live streams synthesize ahead of the listener, but only this far
+STREAM_LOOKAHEAD_CHUNKS = int(os.environ.get("TTS_STREAM_LOOKAHEAD_CHUNKS", "4"))
+STREAM_LOOKAHEAD_SECONDS = float(os.environ.get("TTS_STREAM_LOOKAHEAD_SECONDS", "8"))
+# ...and keep a bounded ring of it for late joiners; readers it overtakes catch up or are dropped
+STREAM_RING_SECONDS = max(2 * STREAM_LOOKAHEAD_SECONDS, float(os.environ.get("TTS_STREAM_RING_SECONDS", "60")))
+STREAM_SLOW_READERS = os.environ.get("TTS_STREAM_SLOW_READERS", "catchup").lower()
+
+
+def _join_mode(join: Optional[str]) -> str:
+    return "live" if (join or "").lower() == "live" else "beginning"
+
+
+def _kokoro_live(text: str, voice: str, speed: float, max_chars: int, *, chunking: str,
+                 endpoint: str, start: float, join: str = "beginning",
+                 indexed: bool = False) -> Tuple[AsyncIterator, list[str]]:
+    """The live stream (one block per chunk; (index, block) when `indexed`) and its chunk texts."""
+    chunks = _stream_chunks(text, max_chars, chunking, "kokoro")
+    metrics.REQUESTS.inc(endpoint=endpoint, engine="kokoro")
+    metrics.REQUEST_CHUNKS.observe(len(chunks), endpoint=endpoint)
+    key = _stream_key("kokoro", text, voice=voice, speed=speed, max_chars=max_chars, chunking=chunking)
+    gen, _ = STREAMS.join(
+        key, partial(stream_kokoro_chunks, chunks, voice=voice, speed=float(speed)), asynchronous=True,
+        max_ahead_blocks=STREAM_LOOKAHEAD_CHUNKS, max_ahead_bytes=int(STREAM_LOOKAHEAD_SECONDS * 24000 * 2),
+        max_buffer_bytes=int(STREAM_RING_SECONDS * 24000 * 2), slow=STREAM_SLOW_READERS,
+        start=_join_mode(join), indexed=indexed)
+    return metrics.afirst_byte_iter(gen, metrics.STREAM_TTFB_SECONDS, start, endpoint=endpoint, engine="kokoro"), chunks
+
+
+def _cosy_live(text: str, ref_path: Optional[str], speed: float, *, endpoint: str, start: float,
+               join: str = "beginning") -> AsyncIterator[bytes]:
+    metrics.REQUESTS.inc(endpoint=endpoint, engine="cosyvoice2")
+    key = _stream_key("cosyvoice2", text, speed=speed, ref_path=ref_path)
+    # Cosy yields ~30 ms frames, so only the seconds bound is meaningful here
+    gen, _ = STREAMS.join(
+        key, lambda: stream_cosyvoice2_cross(text, ref_path=ref_path, speed=float(speed))[1], asynchronous=True,
+        max_ahead_bytes=int(STREAM_LOOKAHEAD_SECONDS * COSY_STREAM_SR * 2),
+        max_buffer_bytes=int(STREAM_RING_SECONDS * COSY_STREAM_SR * 2), slow=STREAM_SLOW_READERS,
+        start=_join_mode(join))
+    return metrics.afirst_byte_iter(gen, metrics.STREAM_TTFB_SECONDS, start, endpoint=endpoint, engine="cosyvoice2")
+
+
+def _wants_cues(fmt: Optional[str]) -> bool:
+    """jsonl/ndjson (any case): audio interleaved with caption cues, which needs chunk-indexed audio."""
+    return (fmt or "").strip().lower() in ("jsonl", "ndjson")
+
+
+def _encoded_response(fmt: str, sr: int, chunks: AsyncIterator[bytes], *, texts: list[str],
+                      cue_per_chunk: bool = True, prepend_silence_ms: int = 0) -> Optional[StreamingResponse]:
+    """
+    Response for the encoded formats (flac, ogg, mulaw, alaw) and for jsonl
+    (audio interleaved with caption cues for `texts`); None for wav/pcm.
+    """
+    if _wants_cues(fmt):
+        return StreamingResponse(
+            acaptioned_jsonl_stream(sr, chunks, texts, cue_per_chunk=cue_per_chunk,
+                                    prepend_silence_ms=prepend_silence_ms),
+            media_type="application/x-ndjson",
+            headers={"Cache-Control": "no-store"},
+        )
+    encoder = make_stream_encoder(fmt, sr)
+    if encoder is None:
+        return None
+    return StreamingResponse(
+        aencoded_stream(chunks, encoder, prepend_silence_ms=prepend_silence_ms, run=run_blocking),
+        media_type=encoder.media_type,
+        headers={"Cache-Control": "no-store", "X-Audio-Rate": str(encoder.sample_rate)},
+    )
 
 # ---------------- GET streaming endpoints (unchanged) ----------------
 
@@ -505,21 +975,26 @@ def synthesize_stream_get(
     cosy_ref_url: str | None = Query(None),
     speed: float = Query(1.15),
     fmt: str = Query("wav"),
+    chunking: str = Query("latency"),
+    join: str = Query("beginning"),
 ):
     """GET streaming endpoint - unchanged from original"""
-    import itertools
+    t0 = time.perf_counter()
 
     engine = engine.lower().strip()
-    chunks = split_sentences(text, max_chars=max_chars)
 
     if engine == "kokoro":
         sr = 24000
-        gen = stream_kokoro_chunks(chunks, voice=voice, speed=float(speed))
+        gen, chunks = _kokoro_live(text, voice, float(speed), max_chars, chunking=chunking,
+                                   endpoint="stream_get", start=t0, join=join, indexed=_wants_cues(fmt))
+        encoded = _encoded_response(fmt, sr, gen, texts=chunks, prepend_silence_ms=80)
+        if encoded is not None:
+            return encoded
         if fmt.lower() == "pcm":
             primer = b"\x00" * int(sr * 2 * 120 / 1000)
-            gen_pcm = itertools.chain([primer], gen)
+            gen_pcm = achain([primer], gen)
             return StreamingResponse(
-                pcm16_stream_from_chunks(
+                apcm16_stream_from_chunks(
                     sr, gen_pcm, prepend_silence_ms=0, prebuffer_chunks=2),
                 media_type="audio/L16",
                 headers={"Cache-Control": "no-store",
@@ -527,7 +1002,7 @@ def synthesize_stream_get(
             )
         else:
             return StreamingResponse(
-                wav_stream_from_chunks(
+                awav_stream_from_chunks(
                     sr, gen, prepend_silence_ms=80, prebuffer_chunks=1),
                 media_type="audio/wav",
                 headers={"Cache-Control": "no-store"},
@@ -538,14 +1013,18 @@ def synthesize_stream_get(
             return JSONResponse({"error": "stream_get supports cosy_mode=cross"}, status_code=400)
 
         ref_path = _resolve_cosy_ref(cosy_ref_id, cosy_ref_url)
-        sr, cosy_bytes = stream_cosyvoice2_cross(
-            text, ref_path=ref_path, speed=float(speed or 1.15))
+        sr = COSY_STREAM_SR
+        cosy_bytes = _cosy_live(text, ref_path, float(speed or 1.15), endpoint="stream_get", start=t0, join=join)
+        encoded = _encoded_response(fmt, sr, cosy_bytes, texts=[text], cue_per_chunk=False,
+                                    prepend_silence_ms=40)
+        if encoded is not None:
+            return encoded
 
         if fmt.lower() == "pcm":
             primer = b"\x00" * int(sr * 2 * 120 / 1000)
-            gen = itertools.chain([primer], cosy_bytes)
+            gen = achain([primer], cosy_bytes)
             return StreamingResponse(
-                pcm16_stream_from_chunks(
+                apcm16_stream_from_chunks(
                     sr, gen, prepend_silence_ms=0, prebuffer_chunks=1),
                 media_type="audio/L16",
                 headers={"Cache-Control": "no-store",
@@ -553,7 +1032,7 @@ def synthesize_stream_get(
             )
         else:
             return StreamingResponse(
-                wav_stream_from_chunks(
+                awav_stream_from_chunks(
                     sr, cosy_bytes, prepend_silence_ms=40, prebuffer_chunks=0),
                 media_type="audio/wav",
                 headers={"Cache-Control": "no-store"},
@@ -575,27 +1054,32 @@ async def synthesize_stream(
     cosy_mode: str | None = Form(None),
     cosy_ref_id: str | None = Form(None),
     cosy_ref_url: str | None = Form(None),
+    chunking: str = Form("latency"),
+    join: str = Form("beginning"),
 ):
     """Streaming endpoint - unchanged from original"""
+    t0 = time.perf_counter()
     # Auto-select engine based on system capabilities
     if engine == "auto":
         from app.services.models import get_recommended_engine
         engine = get_recommended_engine()
-        print(f"Auto-selected engine: {engine}")
     
     engine = (engine or "").lower()
-    fmt = (fmt or "wav").lower()
-    chunks = split_sentences(text, max_chars=max_chars)
+    fmt = (fmt or "wav").strip().lower()
 
-    streamer = wav_stream_from_chunks
+    streamer = awav_stream_from_chunks
     media = "audio/wav"
     if fmt == "pcm":
-        streamer = pcm16_stream_from_chunks
+        streamer = apcm16_stream_from_chunks
         media = "audio/L16"
 
     if engine == "kokoro":
         sr = 24000
-        gen = stream_kokoro_chunks(chunks, voice=voice, speed=float(speed))
+        gen, chunks = _kokoro_live(text, voice, float(speed), max_chars, chunking=chunking,
+                                   endpoint="stream", start=t0, join=join, indexed=_wants_cues(fmt))
+        encoded = _encoded_response(fmt, sr, gen, texts=chunks, prepend_silence_ms=80)
+        if encoded is not None:
+            return encoded
         return StreamingResponse(
             streamer(sr, gen, prepend_silence_ms=80, prebuffer_chunks=3),
             media_type=media,
@@ -607,16 +1091,192 @@ async def synthesize_stream(
         if mode != "cross":
             return JSONResponse({"error": "Only cosy_mode=cross is supported in this endpoint."}, status_code=400)
         ref_path = _resolve_cosy_ref(cosy_ref_id, cosy_ref_url)
-        sr, gen = stream_cosyvoice2_cross(
-            text, ref_path=ref_path, speed=float(speed))
+        sr = COSY_STREAM_SR
+        gen = _cosy_live(text, ref_path, float(speed), endpoint="stream", start=t0, join=join)
+        encoded = _encoded_response(fmt, sr, gen, texts=[text], cue_per_chunk=False,
+                                    prepend_silence_ms=120)
+        if encoded is not None:
+            return encoded
         return StreamingResponse(
-            pcm16_stream_from_chunks(
+            apcm16_stream_from_chunks(
                 sr, gen, prepend_silence_ms=120, prebuffer_chunks=2),
             media_type="application/octet-stream"
         )
 
     return JSONResponse({"error": f"unknown engine '{engine}'"}, status_code=400)
 
+# ---------------- WebSocket: incremental text in, PCM out ----------------
+
+_WS_FLUSH = object()
+
+
+def _ws_produce(engine: str, segments: "queue.Queue", emit, stopped: threading.Event, *,
+                voice: str, speed: float, ref_path: Optional[str]) -> None:
+    """
+    Per-connection synthesis thread: takes completed segments in order and
+    emits ("segment" | "audio" | "segment_end" | "error" | "flushed", ...)
+    events; None marks the end. Cosy frames are emitted as they decode.
+    """
+    try:
+        while not stopped.is_set():
+            item = segments.get()
+            if item is None:
+                return
+            if item is _WS_FLUSH:
+                emit(("flushed",))
+                continue
+            index, text = item
+            emit(("segment", index, text))
+            if engine == "kokoro":
+                blocks = stream_kokoro_chunks([text], voice=voice, speed=speed)
+            else:
+                blocks = stream_cosyvoice2_cross(text, ref_path=ref_path, speed=speed)[1]
+            nbytes = 0
+            try:
+                for block in blocks:
+                    if stopped.is_set():
+                        return
+                    nbytes += len(block)
+                    emit(("audio", bytes(block)))
+            except Exception as e:
+                emit(("error", index, str(e)))
+            finally:
+                close = getattr(blocks, "close", None)
+                if close is not None:
+                    close()
+            emit(("segment_end", index, nbytes // 2))
+    finally:
+        emit(None)
+
+
+@app.websocket("/synthesize/ws")
+async def synthesize_ws(
+    ws: WebSocket,
+    engine: str = "kokoro",
+    voice: str = "af_heart",
+    speed: float = 1.0,
+    max_chars: int = 240,
+    cosy_ref_id: str | None = None,
+    cosy_ref_url: str | None = None,
+):
+    """
+    Text deltas in, PCM16 out, on one socket (for LLM token streams).
+
+    Client sends text frames (binary frames are read as UTF-8 text):
+    {"text": "..."} (or raw text) appends a delta; {"flush": true}
+    synthesizes any trailing partial text; {"end": true} flushes and closes
+    once the audio is sent. Each completed sentence or clause is synthesized
+    as soon as it is detected. Server sends a JSON "ready" event, then per
+    segment: {"type": "segment"}, binary s16le frames, {"type":
+    "segment_end"}; "flushed" after a flush, "done" last.
+    """
+    await ws.accept()
+    if engine == "auto":
+        from app.services.models import get_recommended_engine
+        engine = get_recommended_engine()
+    engine = (engine or "").lower().strip()
+    if engine not in ("kokoro", "cosyvoice2"):
+        await ws.send_json({"type": "error", "error": f"unknown engine '{engine}'"})
+        await ws.close(code=1003)
+        return
+    ref_path = await run_blocking(_resolve_cosy_ref, cosy_ref_id, cosy_ref_url) if engine == "cosyvoice2" else None
+    sr = 24000 if engine == "kokoro" else COSY_STREAM_SR
+    metrics.REQUESTS.inc(endpoint="ws", engine=engine)
+
+    loop = asyncio.get_running_loop()
+    events: asyncio.Queue = asyncio.Queue()
+    segments: "queue.Queue" = queue.Queue()
+    stopped = threading.Event()
+
+    def _emit(ev) -> None:
+        try:
+            loop.call_soon_threadsafe(events.put_nowait, ev)
+        except RuntimeError:
+            stopped.set()  # loop closed under us
+
+    threading.Thread(
+        target=_ws_produce, name="tts-ws",
+        args=(engine, segments, _emit, stopped),
+        kwargs={"voice": voice, "speed": float(speed), "ref_path": ref_path}, daemon=True,
+    ).start()
+    segmenter = IncrementalSegmenter(max_chars=max(12, int(max_chars)))
+    queued: list[float] = []  # enqueue time of each segment
+
+    def _enqueue(texts: list[str]) -> None:
+        for text in texts:
+            segments.put((len(queued), text))
+            queued.append(time.perf_counter())
+
+    async def _send() -> None:
+        first_audio = True
+        sent = 0  # samples sent so far: segment events carry caption times in stream seconds
+        seg_start = 0
+        while True:
+            ev = await events.get()
+            if ev is None:
+                await ws.send_json({"type": "done", "segments": len(queued)})
+                return
+            kind = ev[0]
+            if kind == "audio":
+                if first_audio and queued:
+                    # measured from the first completed segment, not from connect
+                    metrics.STREAM_TTFB_SECONDS.observe(time.perf_counter() - queued[0],
+                                                        endpoint="ws", engine=engine)
+                    first_audio = False
+                sent += len(ev[1]) // 2
+                await ws.send_bytes(ev[1])
+            elif kind == "segment":
+                seg_start = sent
+                await ws.send_json({"type": "segment", "index": ev[1], "text": ev[2],
+                                    "start": round(seg_start / sr, 3)})
+            elif kind == "segment_end":
+                await ws.send_json({"type": "segment_end", "index": ev[1], "samples": ev[2],
+                                    "seconds": round(ev[2] / sr, 3), "start": round(seg_start / sr, 3),
+                                    "end": round(sent / sr, 3)})
+            elif kind == "error":
+                await ws.send_json({"type": "error", "index": ev[1], "error": ev[2]})
+            elif kind == "flushed":
+                await ws.send_json({"type": "flushed"})
+
+    sender = asyncio.ensure_future(_send())
+    ended = False
+    try:
+        await ws.send_json({"type": "ready", "sample_rate": sr, "format": "s16le", "channels": 1})
+        while not ended:
+            frame = await ws.receive()
+            if frame["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(frame.get("code", 1000))
+            raw = frame.get("text")
+            if raw is None:  # binary frame: accept UTF-8 text sent that way
+                try:
+                    raw = (frame.get("bytes") or b"").decode("utf-8")
+                except UnicodeDecodeError:
+                    await ws.send_json({"type": "error", "error": "binary frames must be UTF-8 text"})
+                    await ws.close(code=1003)
+                    return
+            try:
+                msg = json.loads(raw)
+            except ValueError:
+                msg = {"text": raw}
+            if not isinstance(msg, dict):
+                msg = {"text": str(msg)}
+            if msg.get("text"):
+                _enqueue(segmenter.feed(str(msg["text"])))
+            if msg.get("flush") or msg.get("end") or msg.get("close"):
+                _enqueue(segmenter.flush())
+                segments.put(_WS_FLUSH)
+            ended = bool(msg.get("end") or msg.get("close"))
+        segments.put(None)
+        await sender
+        metrics.REQUEST_CHUNKS.observe(len(queued), endpoint="ws")
+        await ws.close()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        stopped.set()
+        segments.put(None)
+        sender.cancel()
+
 # ---------------- Startup event - CRITICAL FOR PERFORMANCE ----------------
 
 
@@ -644,9 +1304,14 @@ async def startup_event():
 
     print("Preloading models to avoid first-request delay...")
 
+    # Engines with TTS_*_WORKERS > 0 run in worker processes and load their models there
+    out_of_process = start_engine_workers()
+    if out_of_process:
+        print(f"Engine workers: {', '.join(out_of_process)}")
+
     # Preload models
     from app.services.models import preload_models
-    await asyncio.get_event_loop().run_in_executor(executor, preload_models)
+    await asyncio.get_event_loop().run_in_executor(executor, partial(preload_models, skip=out_of_process))
 
     # Warm up with CosyVoice2 reference
     def _warm_cosy():
@@ -664,6 +1329,12 @@ async def startup_event():
     # Run warm-up in background
     threading.Thread(target=_warm_cosy, daemon=True).start()
 
+    # Unload idle models (TTS_MODEL_IDLE_TTL) or under memory pressure (TTS_MODEL_RSS_LIMIT_MB)
+    MODELS.start()
+
+    # Start job workers (resumes jobs interrupted by a previous shutdown/crash)
+    JOBS.start()
+
     print("=" * 60)
     print("Server ready! First request should be fast now.")
     print("=" * 60)
@@ -673,6 +1344,9 @@ async def startup_event():
 async def shutdown_event():
     """Cleanup on shutdown"""
     import torch
+    JOBS.stop()
+    MODELS.stop()
+    stop_engine_workers()
     if torch.cuda.is_available():
         torch.cuda.empty_cache()
     executor.shutdown(wait=False)
@@ -88,8 +88,8 @@ def main():
     t0 = time.time()
 
     # Preload models for better performance (only if not already loaded)
-    from app.services.models import preload_models, _COSYVOICE2_SINGLETON, _KOKORO
-    if _COSYVOICE2_SINGLETON is None or _KOKORO is None:
+    from app.services.models import preload_models, _COSYVOICE2_SINGLETON, kokoro_loaded
+    if _COSYVOICE2_SINGLETON is None or not kokoro_loaded():
         print("Preloading models...")
         preload_models()
     else:
@@ -116,6 +116,7 @@ def main():
             # post=args.post,
             mode=args.cosy_mode,
             speed=args.speed,
+            cache_dir=args.cache_dir,
         )
 
     full = concat_audio(wavs)
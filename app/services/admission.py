@@ -0,0 +1,103 @@
+# app/services/admission.py
+from __future__ import annotations
+import asyncio
+import math
+import time
+from contextlib import asynccontextmanager
+from typing import Dict
+
+
+class Overloaded(Exception):
+    """Raised when a request is rejected; carries the suggested Retry-After and HTTP status."""
+
+    def __init__(self, reason: str, retry_after: float, status_code: int = 503):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = max(1, int(math.ceil(retry_after)))
+        self.status_code = status_code
+
+
+class AdmissionController:
+    """
+    Bounded concurrency + bounded queue for one engine.
+
+    At most `max_concurrency` requests run at once; up to `max_queue` more may
+    wait. Work is measured in cost units (characters of text), and an EMA of
+    seconds-per-unit turns the queued + running cost into an estimated wait.
+    A request is rejected up front (instead of piling onto the thread pool)
+    when the queue is full (503) or its estimated wait exceeds `max_wait` (429).
+    """
+
+    def __init__(self, name: str, max_concurrency: int, max_queue: int, max_wait: float,
+                 *, initial_sec_per_unit: float = 0.01, alpha: float = 0.2):
+        self.name = name
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.max_queue = max(0, int(max_queue))
+        self.max_wait = float(max_wait)
+        self.alpha = float(alpha)
+        self.sec_per_unit = float(initial_sec_per_unit)
+        self._sem = asyncio.Semaphore(self.max_concurrency)
+        self.active = 0
+        self.waiting = 0
+        self._pending_cost = 0.0  # waiting + running
+        self.admitted = 0
+        self.rejected = 0
+
+    def estimated_wait(self, extra_cost: float = 0.0) -> float:
+        """Seconds until a new request of `extra_cost` would start running."""
+        if self.active + self.waiting < self.max_concurrency:
+            return 0.0
+        return (self._pending_cost + extra_cost) * self.sec_per_unit / self.max_concurrency
+
+    def _observe(self, cost: float, seconds: float) -> None:
+        if cost > 0:
+            sample = seconds / cost
+            self.sec_per_unit += self.alpha * (sample - self.sec_per_unit)
+
+    @asynccontextmanager
+    async def slot(self, cost: float = 1.0):
+        """Admit (or raise Overloaded), wait for a free slot, then hold it for the block."""
+        cost = max(1.0, float(cost))
+        if self.waiting >= self.max_queue and self.active >= self.max_concurrency:
+            self.rejected += 1
+            raise Overloaded(f"{self.name} queue full", self.estimated_wait(cost), 503)
+        wait = self.estimated_wait()
+        if wait > self.max_wait:
+            self.rejected += 1
+            raise Overloaded(f"{self.name} estimated wait {wait:.0f}s", wait, 429)
+
+        self.waiting += 1
+        self._pending_cost += cost
+        try:
+            await self._sem.acquire()
+        except BaseException:
+            self.waiting -= 1
+            self._pending_cost -= cost
+            raise
+        self.waiting -= 1
+        self.active += 1
+        self.admitted += 1
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._observe(cost, time.perf_counter() - start)
+            self.active -= 1
+            self._pending_cost -= cost
+            self._sem.release()
+
+    def stats(self) -> dict:
+        return {
+            "active": self.active,
+            "waiting": self.waiting,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "estimated_wait_seconds": round(self.estimated_wait(), 2),
+            "sec_per_char": round(self.sec_per_unit, 5),
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+        }
+
+
+def build_controllers(limits: Dict[str, int], max_queue: int, max_wait: float) -> Dict[str, AdmissionController]:
+    return {name: AdmissionController(name, n, max_queue, max_wait) for name, n in limits.items()}
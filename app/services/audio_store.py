@@ -0,0 +1,180 @@
+# app/services/audio_store.py
+from __future__ import annotations
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from typing import Optional
+
+MEDIA_TYPES = {"wav": "audio/wav", "flac": "audio/flac"}
+
+_KEY = re.compile(r"^[0-9a-f]{32,64}$")
+
+
+def valid_key(key: str) -> bool:
+    return bool(_KEY.match(key or ""))
+
+
+def _touch(path: str) -> None:
+    """Mark `path` used now (atime), leaving its mtime alone."""
+    st = os.stat(path)
+    os.utime(path, ns=(time.time_ns(), st.st_mtime_ns))
+
+
+class AudioStore:
+    """
+    Rendered audio kept on disk by content key, so finished renders can be
+    fetched (and seeked with Range requests) without re-synthesizing.
+
+    Layout and housekeeping follow DiskChunkCache: <root>/<key[:2]>/<key>.<fmt>,
+    written to a temp file and moved into place with os.replace(), and trimmed
+    least-recently-used first to `low_water` of `max_bytes`. Use is tracked in
+    atime (set explicitly on access), not mtime: mtime stays the render time,
+    so the ETag/Last-Modified served for a file are stable. put() hard-links the render's spool file when it is on the same
+    filesystem, so publishing a render costs no copy; `spool_dir` (<root>/.spool)
+    is the default place to spool renders for that reason. FLAC is derived from
+    the WAV on first request and then kept alongside it.
+    """
+
+    SPOOL_STALE = 24 * 3600.0  # spool files this old were left by a crashed render
+
+    def __init__(self, root: str, max_bytes: int, *, low_water: float = 0.9):
+        self.root = root
+        self.max_bytes = int(max_bytes)
+        self.low_water = float(low_water)
+        self._lock = threading.Lock()
+        self._size: Optional[int] = None  # lazily scanned
+        self.spool_dir = os.path.join(root, ".spool")
+        os.makedirs(self.spool_dir, exist_ok=True)
+        self._clean_spool()
+
+    def _clean_spool(self) -> None:
+        cutoff = time.time() - self.SPOOL_STALE
+        for entry in os.scandir(self.spool_dir):
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    os.unlink(entry.path)
+            except OSError:
+                pass  # gone already
+
+    def path(self, key: str, fmt: str = "wav") -> str:
+        return os.path.join(self.root, key[:2], f"{key}.{fmt}")
+
+    def has(self, key: str) -> bool:
+        return os.path.exists(self.path(key))
+
+    def get(self, key: str, fmt: str = "wav") -> Optional[str]:
+        """Path of the stored file for `key`, deriving `fmt` from the WAV if needed; None on miss."""
+        p = self.path(key, fmt)
+        try:
+            _touch(p)  # LRU bookkeeping
+            return p
+        except FileNotFoundError:
+            pass
+        if fmt == "wav":
+            return None
+        src = self.get(key, "wav")
+        if src is None:
+            return None
+        try:
+            self._transcode(src, p, fmt)
+        except FileNotFoundError:
+            return None  # evicted mid-way
+        return p
+
+    def put(self, key: str, src: str) -> str:
+        """Publish the WAV at `src` under `key` (idempotent). Returns the stored path."""
+        p = self.path(key)
+        try:
+            _touch(p)
+            return p
+        except FileNotFoundError:
+            pass
+        shard = os.path.dirname(p)
+        os.makedirs(shard, exist_ok=True)
+        tmp = os.path.join(shard, f".{key}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            try:
+                os.link(src, tmp)
+            except OSError:  # other filesystem, or no hard links
+                shutil.copyfile(src, tmp)
+            os.replace(tmp, p)
+        except Exception:
+            self._unlink(tmp)
+            raise
+        self._added(os.path.getsize(p))
+        return p
+
+    def _transcode(self, src: str, dst: str, fmt: str) -> None:
+        import soundfile as sf
+
+        shard = os.path.dirname(dst)
+        fd, tmp = tempfile.mkstemp(dir=shard, suffix=".tmp")
+        os.close(fd)
+        try:
+            with sf.SoundFile(src) as r, sf.SoundFile(tmp, "w", samplerate=r.samplerate, channels=r.channels,
+                                                      format=fmt.upper(), subtype="PCM_16") as w:
+                for block in r.blocks(blocksize=1 << 16, dtype="int16"):
+                    w.write(block)
+            os.replace(tmp, dst)
+        except Exception:
+            self._unlink(tmp)
+            raise
+        self._added(os.path.getsize(dst))
+
+    @staticmethod
+    def _unlink(path: str) -> None:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+    def _added(self, nbytes: int) -> None:
+        with self._lock:
+            if self._size is None:
+                self._size = self._scan_size()
+            else:
+                self._size += nbytes
+            over = self._size > self.max_bytes
+        if over:
+            self.evict()
+
+    def _iter_files(self):
+        for shard in os.scandir(self.root):
+            if not shard.is_dir() or shard.name.startswith("."):  # skip the spool
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith(tuple(f".{fmt}" for fmt in MEDIA_TYPES)):
+                    try:
+                        st = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    yield entry.path, st.st_size, st.st_atime
+
+    def _scan_size(self) -> int:
+        return sum(size for _, size, _ in self._iter_files())
+
+    def evict(self) -> int:
+        """Delete least-recently-used files until under the low-water mark. Returns files removed."""
+        with self._lock:
+            files = sorted(self._iter_files(), key=lambda f: f[2])
+            total = sum(size for _, size, _ in files)
+            target = int(self.max_bytes * self.low_water)
+            removed = 0
+            for path, size, _ in files:
+                if total <= target:
+                    break
+                try:
+                    os.unlink(path)  # open responses keep reading the unlinked inode
+                    removed += 1
+                except FileNotFoundError:
+                    pass  # another worker got there first
+                total -= size
+            self._size = total
+            return removed
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"bytes": self._size, "max_bytes": self.max_bytes}
@@ -0,0 +1,111 @@
+# app/services/cache.py
+from __future__ import annotations
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+
+class ResultCache:
+    """
+    Thread-safe LRU cache for rendered responses, bounded by total payload bytes.
+
+    Entries also expire after `ttl` seconds without access. Because the
+    OrderedDict is kept in access order, both LRU and TTL eviction only ever
+    pop from the front, so every operation is O(1) amortized.
+    """
+
+    def __init__(self, max_bytes: int, ttl: float, max_entry_bytes: Optional[int] = None):
+        self.max_bytes = int(max_bytes)
+        self.ttl = float(ttl)
+        self.max_entry_bytes = int(max_entry_bytes or max_bytes)
+        self._data: "OrderedDict[str, tuple[bytes, float]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.rejected = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return key in self._data
+
+    def _drop_front(self) -> None:
+        _, (data, _) = self._data.popitem(last=False)
+        self._bytes -= len(data)
+
+    def _expire(self, now: float) -> None:
+        while self._data:
+            _, stamp = next(iter(self._data.values()))
+            if now - stamp < self.ttl:
+                break
+            self._drop_front()
+            self.expirations += 1
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Return the cached payload (refreshing its recency) or None."""
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            data = entry[0]
+            self._data[key] = (data, now)
+            self._data.move_to_end(key)
+            self.hits += 1
+            return data
+
+    def put(self, key: str, data: bytes) -> bool:
+        """Store a payload, evicting least-recently-used entries to fit. Returns False if too large."""
+        size = len(data)
+        if size > self.max_entry_bytes or size > self.max_bytes:
+            with self._lock:
+                self.rejected += 1
+            return False
+        now = time.time()
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old[0])
+            self._expire(now)
+            while self._data and self._bytes + size > self.max_bytes:
+                self._drop_front()
+                self.evictions += 1
+            self._data[key] = (data, now)
+            self._bytes += size
+        return True
+
+    def purge_expired(self) -> int:
+        """Drop all expired entries; returns how many were removed."""
+        with self._lock:
+            before = self.expirations
+            self._expire(time.time())
+            return self.expirations - before
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "rejected": self.rejected,
+            }
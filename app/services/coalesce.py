@@ -0,0 +1,338 @@
+# app/services/coalesce.py
+from __future__ import annotations
+import asyncio
+import threading
+import weakref
+from collections import deque
+from itertools import islice
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+
+class AsyncSingleFlight:
+    """
+    Coalesce identical concurrent async computations.
+
+    The first caller for a key starts the computation as its own task; callers
+    arriving while it runs await the same task. The task is shielded, so a
+    leader whose client disconnects does not cancel the work for followers.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.leaders = 0
+        self.shared = 0
+
+    async def do(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Returns (result, shared) where shared=True means another request computed it."""
+        task = self._inflight.get(key)
+        shared = task is not None
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self._inflight[key] = task
+            self.leaders += 1
+
+            def _done(t: asyncio.Task, key=key):
+                if self._inflight.get(key) is t:
+                    del self._inflight[key]
+                if not t.cancelled():
+                    t.exception()  # mark retrieved
+
+            task.add_done_callback(_done)
+        else:
+            self.shared += 1
+        return await asyncio.shield(task), shared
+
+    def stats(self) -> dict:
+        return {"inflight": len(self._inflight), "leaders": self.leaders, "shared": self.shared}
+
+
+class StreamLagged(RuntimeError):
+    """A reader fell further behind than the stream's ring buffer holds."""
+
+
+class SharedStream:
+    """
+    One producer thread feeding any number of readers (broadcast).
+
+    Produced blocks are kept in a ring of at most `max_buffer_bytes` (0 =
+    unbounded); each reader has its own cursor. A reader joining with
+    start="beginning" first receives the oldest block still in the ring,
+    start="live" begins with the next block produced. The producer runs at
+    most `max_ahead_blocks` blocks / `max_ahead_bytes` bytes ahead of the
+    furthest reader (0 = unbounded) and never waits for slower ones; a reader
+    the ring has overtaken skips ahead to the oldest retained block
+    (slow="catchup") or fails with StreamLagged (slow="drop"). The producer
+    stops once every reader has gone. Readers may be sync iterators or async
+    iterators; async readers are woken from the producer thread without tying
+    up a worker thread.
+    """
+
+    def __init__(self, factory: Callable[[], Iterator[bytes]], on_done: Callable[["SharedStream"], None],
+                 *, max_ahead_blocks: int = 0, max_ahead_bytes: int = 0, max_buffer_bytes: int = 0,
+                 slow: str = "catchup", on_lag: Optional[Callable[[], None]] = None):
+        self._factory = factory
+        self._on_done = on_done
+        self._on_lag = on_lag
+        self.max_ahead_blocks = int(max_ahead_blocks)
+        self.max_ahead_bytes = int(max_ahead_bytes)
+        self.max_buffer_bytes = int(max_buffer_bytes)
+        self.slow = slow
+        self._blocks: Deque[bytes] = deque()
+        self._starts: Deque[int] = deque()  # byte offset of each retained block
+        self._first = 0  # absolute index of _blocks[0]
+        self._produced = 0  # absolute index of the next block
+        self._total = 0  # bytes produced
+        self._retained = 0  # bytes in the ring
+        self._lead = 0  # furthest block index handed to any reader
+        self._cond = threading.Condition()
+        self._async_waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Event]] = []
+        self._readers = 0
+        self._pending = 0  # subscribed, not yet iterated
+        self._had_reader = False
+        self.closing = False  # producer is stopping early: nobody may join any more
+        self.done = False
+        self.dropped_blocks = 0
+        self._error: Optional[BaseException] = None
+        self._thread = threading.Thread(target=self._produce, name="tts-shared-stream", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def _abandoned(self) -> bool:
+        return self._had_reader and self._readers == 0 and self._pending == 0
+
+    def _offset(self, i: int) -> int:
+        """Byte offset of absolute block i (clamped to the ring)."""
+        if i >= self._produced or not self._blocks:
+            return self._total
+        return self._starts[max(i, self._first) - self._first]
+
+    def _too_far_ahead(self) -> bool:
+        if self.max_ahead_blocks and self._produced - self._lead >= self.max_ahead_blocks:
+            return True
+        return bool(self.max_ahead_bytes) and self._total - self._offset(self._lead) >= self.max_ahead_bytes
+
+    def _append(self, block: bytes) -> None:
+        self._blocks.append(block)
+        self._starts.append(self._total)
+        self._total += len(block)
+        self._retained += len(block)
+        self._produced += 1
+        while self.max_buffer_bytes and self._retained > self.max_buffer_bytes and len(self._blocks) > 1:
+            self._retained -= len(self._blocks.popleft())
+            self._starts.popleft()
+            self._first += 1
+            self.dropped_blocks += 1
+
+    def _wake_async(self) -> None:
+        waiters, self._async_waiters = self._async_waiters, []
+        for loop, ev in waiters:
+            try:
+                loop.call_soon_threadsafe(ev.set)
+            except RuntimeError:
+                pass  # loop already closed
+
+    def _produce(self) -> None:
+        it = None
+        try:
+            it = iter(self._factory())
+            for block in it:
+                with self._cond:
+                    self._append(block)
+                    self._cond.notify_all()
+                    self._wake_async()
+                    while self._too_far_ahead() and not self._abandoned():
+                        self._cond.wait()
+                    if self._abandoned():
+                        self.closing = True  # before the lock drops, so join() cannot pick up a truncated stream
+                        break  # everyone left
+        except BaseException as e:  # surfaced to every reader
+            self._error = e
+        finally:
+            close = getattr(it, "close", None)
+            if close is not None:
+                try:
+                    close()
+                except Exception:
+                    pass
+            with self._cond:
+                self.done = True
+                self._cond.notify_all()
+                self._wake_async()
+            self._on_done(self)
+
+    def _reserve(self, it, token: list) -> None:
+        """
+        Hold the stream open for a subscriber that has not read yet. The reader
+        is only counted once it starts iterating (see _claim); if its iterator
+        is dropped unstarted - e.g. the client disconnected before the response
+        body was sent - the reservation is released when it is collected.
+        """
+        with self._cond:
+            self._pending += 1
+            self._had_reader = True
+        weakref.finalize(it, self._release, token).atexit = False
+
+    def _release(self, token: list) -> None:
+        with self._cond:
+            if not token[0]:
+                token[0] = True
+                self._pending -= 1
+                self._cond.notify_all()  # producer may be waiting on lookahead with nobody left
+
+    def _claim(self, token: list, start: str) -> int:
+        """Turn a reservation into a counted reader; returns its starting cursor."""
+        with self._cond:
+            if not token[0]:
+                token[0] = True
+                self._pending -= 1
+            self._readers += 1
+            return self._produced if start == "live" else self._first
+
+    def _take(self, i: int) -> Tuple[int, List[bytes], bool, Optional[BaseException]]:
+        """
+        Under the lock: (cursor, blocks from it, whether the reader is finished,
+        error). The cursor moves forward if the ring overtook the reader.
+        """
+        if i < self._first:
+            if self._on_lag is not None:
+                self._on_lag()
+            if self.slow == "drop":
+                return i, [], True, StreamLagged(f"reader fell {self._first - i} blocks behind the stream")
+            i = self._first
+        batch = list(islice(self._blocks, i - self._first, None))
+        if batch and i + len(batch) > self._lead:
+            self._lead = i + len(batch)
+            self._cond.notify_all()  # producer may be waiting on lookahead
+        return i, batch, self.done and not batch, self._error
+
+    def _leave(self) -> None:
+        with self._cond:
+            self._readers -= 1
+            self._cond.notify_all()
+
+    def subscribe(self, start: str = "beginning", *, indexed: bool = False) -> Iterator[Any]:
+        """
+        Subscribe a reader. The iterator yields blocks (or (index, block)
+        pairs when `indexed`, index counting blocks from the stream start);
+        its position is taken when it is first iterated.
+        """
+        token = [False]  # True once claimed by the reader or released unstarted
+        it = self._follow(token, start, indexed)
+        self._reserve(it, token)
+        return it
+
+    def subscribe_async(self, start: str = "beginning", *, indexed: bool = False) -> AsyncIterator[Any]:
+        """Like subscribe(), but an async iterator for the event loop."""
+        token = [False]  # True once claimed by the reader or released unstarted
+        it = self._follow_async(token, start, indexed)
+        self._reserve(it, token)
+        return it
+
+    def try_subscribe(self, start: str = "beginning", *, indexed: bool = False,
+                      asynchronous: bool = False) -> Optional[Any]:
+        """
+        subscribe()/subscribe_async() unless the stream is done or closing;
+        None then. Checked under the producer's lock, so a reader it admits
+        is counted before the producer next looks for abandonment.
+        """
+        with self._cond:
+            if self.done or self.closing:
+                return None
+            if asynchronous:
+                return self.subscribe_async(start, indexed=indexed)
+            return self.subscribe(start, indexed=indexed)
+
+    def _follow(self, token: list, start: str, indexed: bool) -> Iterator[Any]:
+        i = self._claim(token, start)
+        try:
+            while True:
+                with self._cond:
+                    while i >= self._produced and not self.done:
+                        self._cond.wait()
+                    i, batch, finished, error = self._take(i)
+                for block in batch:
+                    yield (i, block) if indexed else block
+                    i += 1
+                if finished:
+                    if error is not None:
+                        raise error
+                    return
+        finally:
+            self._leave()
+
+    async def _follow_async(self, token: list, start: str, indexed: bool) -> AsyncIterator[Any]:
+        i = self._claim(token, start)
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                ev = None
+                with self._cond:
+                    i, batch, finished, error = self._take(i)
+                    if not batch and not finished:
+                        ev = asyncio.Event()
+                        self._async_waiters.append((loop, ev))
+                for block in batch:
+                    yield (i, block) if indexed else block
+                    i += 1
+                if finished:
+                    if error is not None:
+                        raise error
+                    return
+                if ev is not None:
+                    await ev.wait()
+        finally:
+            self._leave()
+
+
+class StreamCoalescer:
+    """Registry of in-flight SharedStreams keyed by normalized synthesis parameters."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._streams: Dict[str, SharedStream] = {}
+        self.started = 0
+        self.joined = 0
+        self.lagged = 0
+
+    def join(self, key: str, factory: Callable[[], Iterator[bytes]], *, asynchronous: bool = False,
+             max_ahead_blocks: int = 0, max_ahead_bytes: int = 0, max_buffer_bytes: int = 0,
+             slow: str = "catchup", start: str = "beginning", indexed: bool = False) -> Tuple[Any, bool]:
+        """
+        Subscribe to the live stream for `key`, starting it if needed. Returns
+        (iterator, joined); the iterator is async when `asynchronous` is set.
+        `start`/`indexed` apply to this reader; the lookahead, ring size and
+        slow-reader policy only apply to a stream this call starts.
+        """
+        with self._lock:
+            stream = self._streams.get(key)
+            it = None
+            if stream is not None:  # a stream that is closing or done is left to finish on its own
+                it = stream.try_subscribe(start, indexed=indexed, asynchronous=asynchronous)
+            joined = it is not None
+            if not joined:
+                stream = SharedStream(factory, on_done=lambda s, key=key: self._remove(key, s),
+                                      max_ahead_blocks=max_ahead_blocks, max_ahead_bytes=max_ahead_bytes,
+                                      max_buffer_bytes=max_buffer_bytes, slow=slow, on_lag=self._lagged)
+                self._streams[key] = stream
+                self.started += 1
+                it = stream.try_subscribe(start, indexed=indexed, asynchronous=asynchronous)
+            else:
+                self.joined += 1
+        if not joined:
+            stream.start()
+        return it, joined
+
+    def _remove(self, key: str, stream: SharedStream) -> None:
+        with self._lock:
+            if self._streams.get(key) is stream:
+                del self._streams[key]
+
+    def _lagged(self) -> None:
+        # called under a stream's condition; taking self._lock here would invert join()'s lock order
+        self.lagged += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"inflight": len(self._streams), "started": self.started, "joined": self.joined,
+                    "lagged": self.lagged}
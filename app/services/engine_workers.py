@@ -0,0 +1,428 @@
+# app/services/engine_workers.py
+"""
+Out-of-process engine workers.
+
+With TTS_KOKORO_WORKERS / TTS_COSY_WORKERS > 0 the synthesis functions in
+app.utils.synthesize run in spawned worker processes instead of the API
+process, so model threads, the GIL and the event loop stop competing and a
+crashing engine (segfault, OOM kill) only takes its worker down.
+
+Requests travel over one duplex pipe per worker as small tuples; audio comes
+back through multiprocessing.shared_memory segments - the worker writes the
+samples into a fresh segment and sends only its name and size, the API
+copies them out once and unlinks it. A supervisor thread reads every pipe;
+a worker whose pipe closes is reaped, its in-flight requests fail with
+WorkerError, and it is restarted with exponential backoff while requests go
+to the remaining healthy workers.
+"""
+from __future__ import annotations
+import itertools
+import logging
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import connection, shared_memory
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from app.services.admission import Overloaded
+
+ENGINES = {"kokoro": "TTS_KOKORO_WORKERS", "cosyvoice2": "TTS_COSY_WORKERS"}
+
+_POOLS: Dict[str, "EngineWorkers"] = {}
+_POOLS_LOCK = threading.Lock()
+_IN_WORKER = False
+
+# A worker that dies sooner than this after starting counts as crash-looping
+_STABLE_SECONDS = 60.0
+_MAX_BACKOFF = 30.0
+
+
+class WorkerError(RuntimeError):
+    """Synthesis failed inside a worker, or the worker died while handling the request."""
+
+
+class WorkerUnavailable(Overloaded):
+    """No live worker for the engine (all restarting); maps to 503 + Retry-After."""
+
+
+# ---------------- shared memory ----------------
+
+
+def _to_shm(parts) -> Tuple[Optional[str], int]:
+    """Copy byte-like `parts` back to back into a new segment; returns (name, nbytes)."""
+    views = [memoryview(p).cast("B") for p in parts]
+    nbytes = sum(v.nbytes for v in views)
+    if not nbytes:
+        return None, 0
+    shm = shared_memory.SharedMemory(create=True, size=nbytes)
+    pos = 0
+    for v in views:
+        shm.buf[pos:pos + v.nbytes] = v
+        pos += v.nbytes
+    shm.close()  # the receiver unlinks it
+    return shm.name, nbytes
+
+
+def _from_shm(name: Optional[str], nbytes: int) -> bytearray:
+    if not name:
+        return bytearray()
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        return bytearray(shm.buf[:nbytes])
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def _discard_shm(name: Optional[str]) -> None:
+    if not name:
+        return
+    try:
+        shm = shared_memory.SharedMemory(name=name)
+    except FileNotFoundError:
+        return
+    shm.close()
+    shm.unlink()
+
+
+# ---------------- worker process ----------------
+
+
+def _run_op(op: str, kwargs: dict):
+    from app.utils import synthesize as synth
+
+    if op == "synthesize_kokoro_chunks":
+        return synth.synthesize_kokoro_chunks(**kwargs)
+    if op == "synthesize_cosyvoice2_chunks":
+        return synth.synthesize_cosyvoice2_chunks(**kwargs)
+    if op == "stream_kokoro_chunks":
+        return synth.stream_kokoro_chunks(**kwargs)
+    if op == "stream_cosyvoice2_cross":
+        return synth.stream_cosyvoice2_cross(**kwargs)[1]
+    raise ValueError(f"unknown worker op '{op}'")
+
+
+def _load_engine(engine: str) -> None:
+    from app.services.lifecycle import MODELS
+    if engine == "kokoro":
+        import app.services.kokoro_pool  # noqa: F401  (registers the "kokoro" model)
+    else:
+        import app.services.models  # noqa: F401
+    MODELS.start()  # idle / memory-pressure unloading applies inside the worker too
+    MODELS.load(engine)
+
+
+def _worker_main(engine: str, conn, cores: Optional[List[int]], threads: int) -> None:
+    global _IN_WORKER
+    _IN_WORKER = True
+    if cores and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)  # before any thread pool exists, so every thread inherits it
+    send_lock = threading.Lock()
+    active, cancelled = set(), set()
+    state_lock = threading.Lock()
+
+    def send(msg) -> None:
+        with send_lock:
+            conn.send(msg)
+
+    def handle(req_id: int, op: str, kwargs: dict) -> None:
+        try:
+            result = _run_op(op, kwargs)
+            if op.startswith("stream_"):
+                try:
+                    for part in result:
+                        if req_id in cancelled:
+                            break
+                        name, nbytes = _to_shm([part])
+                        send(("part", req_id, name, nbytes, None))
+                finally:
+                    close = getattr(result, "close", None)
+                    if close is not None:
+                        close()
+                send(("done", req_id, None, 0, None))
+            else:
+                wavs, sr = result
+                wavs = [np.ascontiguousarray(w, dtype=np.float32) for w in wavs]
+                name, nbytes = _to_shm(wavs)
+                send(("done", req_id, name, nbytes, {"sr": sr, "lengths": [len(w) for w in wavs]}))
+        except Exception as e:
+            logging.exception(f"{engine} worker: {op} failed")
+            send(("error", req_id, f"{type(e).__name__}: {e}"))
+        finally:
+            with state_lock:
+                active.discard(req_id)
+                cancelled.discard(req_id)
+
+    try:
+        _load_engine(engine)
+    except Exception as e:
+        logging.error(f"{engine} worker: model load failed ({e}); requests will retry the load")
+    send(("ready",))
+    pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix=f"{engine}-worker")
+    while True:
+        try:
+            msg = conn.recv()
+        except (EOFError, OSError):
+            break  # API process went away
+        if msg[0] == "stop":
+            break
+        if msg[0] == "cancel":
+            with state_lock:
+                if msg[1] in active:
+                    cancelled.add(msg[1])
+            continue
+        _, req_id, op, kwargs = msg
+        with state_lock:
+            active.add(req_id)
+        pool.submit(handle, req_id, op, kwargs)
+    os._exit(0)  # don't wait for in-flight work nobody will read
+
+
+# ---------------- API side ----------------
+
+
+class _Worker:
+    def __init__(self, index: int, cores: Optional[List[int]]):
+        self.index = index
+        self.cores = cores
+        self.proc = None
+        self.conn = None
+        self.send_lock = threading.Lock()
+        self.inflight: Dict[int, "queue.Queue"] = {}
+        self.ready = False
+        self.started = 0.0
+        self.restarts = 0
+        self.failures = 0  # consecutive short-lived runs
+        self.restart_at = 0.0
+
+    @property
+    def alive(self) -> bool:
+        return self.conn is not None
+
+
+class EngineWorkers:
+    """N worker processes for one engine, with least-loaded dispatch and automatic restarts."""
+
+    def __init__(self, engine: str, n: int, *, threads: int = 8, pin: bool = True):
+        self.engine = engine
+        self.threads = max(1, int(threads))
+        self._ctx = mp.get_context("spawn")
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._stop = threading.Event()
+        cores = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else []
+        share = len(cores) // n if pin and n > 1 else 0
+        self._workers = [_Worker(i, cores[i * share:(i + 1) * share] if share else None) for i in range(n)]
+        for w in self._workers:
+            self._spawn(w)
+        self._thread = threading.Thread(target=self._supervise, name=f"{engine}-workers", daemon=True)
+        self._thread.start()
+
+    def _spawn(self, w: _Worker) -> None:
+        parent, child = self._ctx.Pipe(duplex=True)
+        proc = self._ctx.Process(target=_worker_main, args=(self.engine, child, w.cores, self.threads),
+                                 name=f"tts-{self.engine}-worker-{w.index}", daemon=True)
+        proc.start()
+        child.close()
+        with self._lock:
+            w.proc, w.conn, w.ready, w.started = proc, parent, False, time.monotonic()
+        logging.info(f"{self.engine} worker {w.index} started (pid {proc.pid})")
+
+    # ---------------- requests ----------------
+
+    def _submit(self, op: str, kwargs: dict) -> Tuple[_Worker, int, "queue.Queue"]:
+        with self._lock:
+            live = [w for w in self._workers if w.alive]
+            if not live:
+                wait = min(w.restart_at for w in self._workers) - time.monotonic()
+                raise WorkerUnavailable(f"no live {self.engine} worker (restarting)", max(1.0, wait))
+            w = min(live, key=lambda w: (not w.ready, len(w.inflight)))
+            req_id = next(self._ids)
+            inbox: "queue.Queue" = queue.Queue()
+            w.inflight[req_id] = inbox
+            conn = w.conn
+        try:
+            with w.send_lock:
+                conn.send(("call", req_id, op, kwargs))
+        except (OSError, EOFError, ValueError) as e:
+            with self._lock:
+                w.inflight.pop(req_id, None)
+            raise WorkerError(f"{self.engine} worker {w.index} unreachable: {e}") from e
+        return w, req_id, inbox
+
+    def call(self, op: str, **kwargs) -> Tuple[List[np.ndarray], int]:
+        """Run a chunk-list synthesis op in a worker; returns (wavs, sr) like the in-process function."""
+        _w, _req_id, inbox = self._submit(op, kwargs)
+        msg = inbox.get()
+        if msg[0] == "error":
+            raise WorkerError(msg[1])
+        _, name, nbytes, meta = msg
+        audio = np.frombuffer(_from_shm(name, nbytes), dtype=np.float32)
+        bounds = np.cumsum(meta["lengths"])[:-1]
+        return np.split(audio, bounds) if meta["lengths"] else [], meta["sr"]
+
+    def stream(self, op: str, **kwargs) -> Iterator[memoryview]:
+        """Run a streaming op in a worker; yields each PCM16 part as it arrives."""
+        w, req_id, inbox = self._submit(op, kwargs)
+        finished = False
+        try:
+            while True:
+                msg = inbox.get()
+                if msg[0] == "error":
+                    finished = True
+                    raise WorkerError(msg[1])
+                if msg[0] == "done":
+                    finished = True
+                    return
+                yield memoryview(_from_shm(msg[1], msg[2]))
+        finally:
+            if not finished:  # reader went away: stop the worker and drop what it already sent
+                with self._lock:
+                    w.inflight.pop(req_id, None)
+                    conn = w.conn
+                if conn is not None:
+                    try:
+                        with w.send_lock:
+                            conn.send(("cancel", req_id))
+                    except (OSError, ValueError):
+                        pass
+                while True:
+                    try:
+                        msg = inbox.get_nowait()
+                    except queue.Empty:
+                        break
+                    if msg[0] == "part":
+                        _discard_shm(msg[1])
+
+    # ---------------- supervision ----------------
+
+    def _supervise(self) -> None:
+        while not self._stop.is_set():
+            with self._lock:
+                conns = {w.conn: w for w in self._workers if w.conn is not None}
+            ready = connection.wait(list(conns), timeout=0.5) if conns else (time.sleep(0.5) or [])
+            if self._stop.is_set():
+                return
+            for conn in ready:
+                w = conns[conn]
+                try:
+                    msg = conn.recv()
+                except (EOFError, OSError):
+                    self._lost(w)
+                    continue
+                self._deliver(w, msg)
+            now = time.monotonic()
+            for w in self._workers:
+                if w.conn is None and now >= w.restart_at and not self._stop.is_set():
+                    w.restarts += 1
+                    self._spawn(w)
+
+    def _deliver(self, w: _Worker, msg) -> None:
+        if msg[0] == "ready":
+            w.ready = True
+            return
+        kind, req_id = msg[0], msg[1]
+        with self._lock:
+            inbox = w.inflight.get(req_id) if kind == "part" else w.inflight.pop(req_id, None)
+        if inbox is not None:
+            inbox.put((kind, *msg[2:]))
+        elif kind in ("part", "done"):
+            _discard_shm(msg[2])  # cancelled: nobody will read it
+
+    def _lost(self, w: _Worker) -> None:
+        proc = w.proc
+        lived = time.monotonic() - w.started
+        w.failures = w.failures + 1 if lived < _STABLE_SECONDS else 1
+        backoff = min(_MAX_BACKOFF, 2.0 ** (w.failures - 1))
+        with self._lock:
+            try:
+                w.conn.close()
+            except OSError:
+                pass
+            w.conn, w.ready = None, False
+            w.restart_at = time.monotonic() + backoff
+            orphans, w.inflight = w.inflight, {}
+        logging.error(f"{self.engine} worker {w.index} (pid {proc.pid}) lost its connection; "
+                      f"failing {len(orphans)} request(s), restarting in {backoff:.0f}s")
+        for inbox in orphans.values():
+            inbox.put(("error", f"{self.engine} worker exited during the request"))
+        # Reaping can take seconds (a dying CUDA process); keep it off the supervisor, which serves the other workers
+        threading.Thread(target=self._reap, args=(w.index, proc), name=f"{self.engine}-reap-{w.index}",
+                         daemon=True).start()
+
+    def _reap(self, index: int, proc) -> None:
+        proc.join(timeout=5)
+        if proc.is_alive():  # closed its pipe but hung on the way out
+            proc.terminate()
+            proc.join(timeout=5)
+        logging.info(f"{self.engine} worker {index} (pid {proc.pid}) exited with code {proc.exitcode}")
+
+    def stop(self) -> None:
+        self._stop.set()
+        with self._lock:
+            workers = [(w.conn, w.proc) for w in self._workers if w.conn is not None]
+        for conn, proc in workers:
+            try:
+                conn.send(("stop",))
+            except (OSError, ValueError):
+                pass
+        for _conn, proc in workers:
+            proc.join(timeout=5)
+            if proc.is_alive():
+                proc.terminate()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": [{
+                    "pid": w.proc.pid if w.alive else None,
+                    "alive": w.alive,
+                    "ready": w.ready,
+                    "inflight": len(w.inflight),
+                    "restarts": w.restarts,
+                    "cores": w.cores,
+                } for w in self._workers],
+            }
+
+
+def engine_workers(engine: str) -> Optional[EngineWorkers]:
+    """The engine's worker pool when worker mode is on (and we are not a worker ourselves), else None."""
+    if _IN_WORKER:
+        return None
+    pool = _POOLS.get(engine)
+    if pool is not None:
+        return pool
+    n = int(os.environ.get(ENGINES.get(engine, ""), "0") or 0)
+    if n <= 0:
+        return None
+    with _POOLS_LOCK:
+        pool = _POOLS.get(engine)
+        if pool is None:
+            pool = _POOLS[engine] = EngineWorkers(
+                engine, n,
+                threads=int(os.environ.get("TTS_WORKER_THREADS", "8")),
+                pin=os.environ.get("TTS_WORKER_PIN_CORES", "1").lower() not in ("0", "false", "no", "off"),
+            )
+        return pool
+
+
+def start_engine_workers() -> List[str]:
+    """Spawn the configured worker pools now (models load in them right away). Returns the engines served."""
+    return [engine for engine in ENGINES if engine_workers(engine) is not None]
+
+
+def stop_engine_workers() -> None:
+    with _POOLS_LOCK:
+        pools = list(_POOLS.values())
+        _POOLS.clear()
+    for pool in pools:
+        pool.stop()
+
+
+def workers_stats() -> Dict[str, dict]:
+    return {engine: pool.stats() for engine, pool in list(_POOLS.items())}
@@ -0,0 +1,387 @@
+# app/services/jobs.py
+from __future__ import annotations
+import json
+import logging
+import os
+import shutil
+import socket
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+import wave
+import zipfile
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from app.services.metrics import STAGE_SECONDS
+
+# A running job whose owner has not refreshed its heartbeat for this long is
+# considered orphaned (worker crashed/restarted) and is picked up again.
+HEARTBEAT_STALE = 120.0
+HEARTBEAT_EVERY = 15.0
+# How often finished jobs older than the retention TTL are deleted.
+SWEEP_EVERY = 300.0
+
+
+class JobManager:
+    """
+    Persistent background jobs for long documents.
+
+    Each job lives in <root>/<job_id>/ (input, reference audio, per-chunk WAVs
+    and finally result.zip); job state and per-chunk progress live in
+    <root>/jobs.sqlite. A chunk's WAV is written before its row is marked done,
+    so a restarted worker - or another uvicorn worker that finds the job's
+    heartbeat stale - resumes from the last completed chunk. Jobs that
+    finished (done or failed) more than `ttl` seconds ago are deleted with
+    their files by a periodic sweep (ttl=0 keeps them forever).
+    """
+
+    def __init__(self, root: str, *, workers: int = 1, batch_chunks: int = 8, ttl: float = 0.0):
+        self.root = Path(root)
+        self.workers = max(1, int(workers))
+        self.batch_chunks = max(1, int(batch_chunks))
+        self.ttl = max(0.0, float(ttl))
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._local = threading.local()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self.root.mkdir(parents=True, exist_ok=True)
+        db = self._db()
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY, state TEXT NOT NULL, stage TEXT, params TEXT NOT NULL,"
+            " owner TEXT, heartbeat REAL, created REAL NOT NULL, started REAL, finished REAL,"
+            " chunks_total INTEGER NOT NULL DEFAULT 0, chunks_done INTEGER NOT NULL DEFAULT 0,"
+            " synth_seconds REAL NOT NULL DEFAULT 0, synth_chunks INTEGER NOT NULL DEFAULT 0,"
+            " sr INTEGER, error TEXT)")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            " job_id TEXT NOT NULL, idx INTEGER NOT NULL, text TEXT NOT NULL, nsamples INTEGER,"
+            " PRIMARY KEY (job_id, idx))")
+        db.execute("CREATE INDEX IF NOT EXISTS jobs_state ON jobs(state, created)")
+        db.execute("CREATE INDEX IF NOT EXISTS jobs_finished ON jobs(finished)")
+
+    # ---------------- storage ----------------
+
+    def _db(self) -> sqlite3.Connection:
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(str(self.root / "jobs.sqlite"), timeout=30.0,
+                                 isolation_level=None, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.row_factory = sqlite3.Row
+            self._local.db = db
+        return db
+
+    def _job_dir(self, job_id: str) -> Path:
+        return self.root / job_id
+
+    def _update(self, job_id: str, **fields) -> None:
+        cols = ", ".join(f"{k}=?" for k in fields)
+        self._db().execute(f"UPDATE jobs SET {cols} WHERE id=?", [*fields.values(), job_id])
+
+    # ---------------- public API ----------------
+
+    def submit(
+        self,
+        params: dict,
+        *,
+        text: Optional[str] = None,
+        file_bytes: Optional[bytes] = None,
+        file_suffix: str = "",
+        ref_bytes: Optional[bytes] = None,
+    ) -> str:
+        """Persist the job inputs and queue it. Returns the job id."""
+        job_id = uuid.uuid4().hex
+        d = self._job_dir(job_id)
+        d.mkdir(parents=True)
+        params = dict(params)
+        if file_bytes:
+            params["input"] = f"upload{file_suffix.lower()}"
+            (d / params["input"]).write_bytes(file_bytes)
+        else:
+            params["input"] = "text.txt"
+            (d / "text.txt").write_text(text or "", encoding="utf-8")
+        if ref_bytes:
+            (d / "ref.wav").write_bytes(ref_bytes)
+        self._db().execute(
+            "INSERT INTO jobs (id, state, stage, params, created) VALUES (?, 'queued', 'queued', ?, ?)",
+            (job_id, json.dumps(params), time.time()))
+        self._wake.set()
+        return job_id
+
+    def status(self, job_id: str) -> Optional[dict]:
+        row = self._db().execute("SELECT * FROM jobs WHERE id=?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        total, done = row["chunks_total"], row["chunks_done"]
+        eta = None
+        if row["state"] in ("queued", "running") and row["synth_chunks"] and total:
+            per_chunk = row["synth_seconds"] / row["synth_chunks"]
+            eta = round(per_chunk * (total - done), 1)
+        return {
+            "job_id": job_id,
+            "state": row["state"],
+            "stage": row["stage"],
+            "chunks_done": done,
+            "chunks_total": total,
+            "progress": round(done / total, 4) if total else 0.0,
+            "eta_seconds": eta,
+            "created": row["created"],
+            "started": row["started"],
+            "finished": row["finished"],
+            "error": row["error"],
+            "result_url": f"/jobs/{job_id}/result" if row["state"] == "done" else None,
+            "audio_url": f"/jobs/{job_id}/audio.wav" if row["state"] == "done" else None,
+        }
+
+    def result_path(self, job_id: str) -> Optional[Path]:
+        row = self._db().execute("SELECT state FROM jobs WHERE id=?", (job_id,)).fetchone()
+        if row is None or row["state"] != "done":
+            return None
+        p = self._job_dir(job_id) / "result.zip"
+        return p if p.exists() else None
+
+    def audio_span(self, job_id: str) -> Optional[Tuple[Path, int, int]]:
+        """(result.zip, offset, length) of the stored audio.wav, so it can be served in place."""
+        from app.utils.zipstream import stored_member_span
+
+        p = self.result_path(job_id)
+        if p is None:
+            return None
+        offset, length = stored_member_span(str(p), "audio.wav")
+        return p, offset, length
+
+    def sweep(self, now: Optional[float] = None) -> int:
+        """Delete jobs that finished more than `ttl` seconds ago, with their files. Returns how many."""
+        if not self.ttl:
+            return 0
+        db = self._db()
+        cutoff = (time.time() if now is None else now) - self.ttl
+        rows = db.execute("SELECT id FROM jobs WHERE state IN ('done', 'failed') AND finished < ?",
+                          (cutoff,)).fetchall()
+        for row in rows:
+            # rows first, so the job is gone from the API before its files are
+            db.execute("BEGIN")
+            try:
+                db.execute("DELETE FROM chunks WHERE job_id=?", (row["id"],))
+                db.execute("DELETE FROM jobs WHERE id=?", (row["id"],))
+                db.execute("COMMIT")
+            except Exception:
+                db.execute("ROLLBACK")
+                raise
+            shutil.rmtree(self._job_dir(row["id"]), ignore_errors=True)
+        return len(rows)
+
+    def start(self) -> None:
+        """Start worker threads (also resumes jobs left unfinished by a previous process)."""
+        if self._threads:
+            return
+        self._stop.clear()
+        for i in range(self.workers):
+            t = threading.Thread(target=self._worker_loop, name=f"tts-job-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        hb = threading.Thread(target=self._heartbeat_loop, name="tts-job-heartbeat", daemon=True)
+        hb.start()
+        self._threads.append(hb)
+        if self.ttl:
+            sweeper = threading.Thread(target=self._sweep_loop, name="tts-job-sweep", daemon=True)
+            sweeper.start()
+            self._threads.append(sweeper)
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Stop after the current batch; interrupted jobs go back to the queue."""
+        self._stop.set()
+        self._wake.set()
+        for t in self._threads:
+            t.join(timeout)
+        self._threads.clear()
+
+    # ---------------- workers ----------------
+
+    def _heartbeat_loop(self) -> None:
+        while not self._stop.wait(HEARTBEAT_EVERY):
+            try:
+                self._db().execute(
+                    "UPDATE jobs SET heartbeat=? WHERE owner=? AND state='running'",
+                    (time.time(), self.owner))
+            except sqlite3.Error as e:
+                logging.warning(f"Job heartbeat failed: {e}")
+
+    def _sweep_loop(self) -> None:
+        while True:
+            try:
+                n = self.sweep()
+                if n:
+                    logging.info(f"Deleted {n} expired job(s)")
+            except sqlite3.Error as e:
+                logging.warning(f"Job sweep failed: {e}")
+            if self._stop.wait(min(SWEEP_EVERY, self.ttl)):
+                return
+
+    def _claim(self) -> Optional[str]:
+        db = self._db()
+        now = time.time()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            row = db.execute(
+                "SELECT id FROM jobs WHERE state='queued' OR (state='running' AND heartbeat < ?)"
+                " ORDER BY created LIMIT 1", (now - HEARTBEAT_STALE,)).fetchone()
+            if row is not None:
+                db.execute(
+                    "UPDATE jobs SET state='running', owner=?, heartbeat=?, started=COALESCE(started, ?)"
+                    " WHERE id=?", (self.owner, now, now, row["id"]))
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+        return row["id"] if row is not None else None
+
+    def _worker_loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                job_id = self._claim()
+            except sqlite3.Error as e:
+                logging.warning(f"Job claim failed: {e}")
+                job_id = None
+            if job_id is None:
+                self._wake.wait(2.0)
+                self._wake.clear()
+                continue
+            try:
+                self._run(job_id)
+            except Exception as e:
+                logging.exception(f"Job {job_id} failed")
+                self._update(job_id, state="failed", error=str(e), finished=time.time(), owner=None)
+
+    def _run(self, job_id: str) -> None:
+        from app.utils.chunk_text import split_sentences
+        from app.utils.extract_text import extract_text
+        from app.utils.synthesize import synthesize_chunks
+
+        db = self._db()
+        row = db.execute("SELECT * FROM jobs WHERE id=?", (job_id,)).fetchone()
+        params = json.loads(row["params"])
+        d = self._job_dir(job_id)
+        chunk_dir = d / "chunks"
+        chunk_dir.mkdir(exist_ok=True)
+
+        # --- extract + split (only once; resumed jobs reuse the stored chunk list)
+        if not row["chunks_total"]:
+            self._update(job_id, stage="extract")
+            src = d / params["input"]
+            if params["input"] == "text.txt":
+                text = src.read_text(encoding="utf-8").strip()
+            else:
+                with STAGE_SECONDS.time(stage="extract_text"):
+                    text = extract_text(str(src))
+            with STAGE_SECONDS.time(stage="split_sentences"):
+                chunks = split_sentences(text, max_chars=int(params.get("max_chars", 240))) if text else []
+            if not chunks:
+                raise ValueError("No text content found")
+            db.execute("BEGIN")
+            db.executemany("INSERT OR REPLACE INTO chunks (job_id, idx, text) VALUES (?, ?, ?)",
+                           [(job_id, i, c) for i, c in enumerate(chunks)])
+            db.execute("UPDATE jobs SET chunks_total=? WHERE id=?", (len(chunks), job_id))
+            db.execute("COMMIT")
+
+        # --- synthesize remaining chunks in small batches
+        self._update(job_id, stage="synthesize")
+        ref = d / "ref.wav"
+        pending = db.execute(
+            "SELECT idx, text FROM chunks WHERE job_id=? AND nsamples IS NULL ORDER BY idx",
+            (job_id,)).fetchall()
+        sr = row["sr"] or 24000
+        for b in range(0, len(pending), self.batch_chunks):
+            if self._stop.is_set():
+                self._update(job_id, state="queued", owner=None)
+                return
+            batch = pending[b:b + self.batch_chunks]
+            t0 = time.perf_counter()
+            wavs, sr = synthesize_chunks(
+                params["engine"],
+                [r["text"] for r in batch],
+                voice=params.get("voice", "af_heart"),
+                speed=float(params.get("speed", 1.0)),
+                ref_wav=str(ref) if ref.exists() else None,
+                prompt_text=params.get("cosy_prompt", ""),
+                mode=params.get("cosy_mode", "cross"),
+                cache_dir=os.environ.get("TTS_CACHE_DIR", "cache"),
+            )
+            dt = time.perf_counter() - t0
+            for r, wav in zip(batch, wavs):
+                _write_chunk_wav(chunk_dir / f"{r['idx']:06d}.wav", wav, sr)
+            db.execute("BEGIN")
+            db.executemany("UPDATE chunks SET nsamples=? WHERE job_id=? AND idx=?",
+                           [(int(len(w)), job_id, r["idx"]) for r, w in zip(batch, wavs)])
+            db.execute(
+                "UPDATE jobs SET chunks_done=(SELECT COUNT(*) FROM chunks WHERE job_id=? AND nsamples IS NOT NULL),"
+                " synth_seconds=synth_seconds+?, synth_chunks=synth_chunks+?, sr=?, heartbeat=? WHERE id=?",
+                (job_id, dt, len(batch), sr, time.time(), job_id))
+            db.execute("COMMIT")
+
+        # --- align + package
+        rows = db.execute("SELECT idx, text, nsamples FROM chunks WHERE job_id=? ORDER BY idx",
+                          (job_id,)).fetchall()
+        self._update(job_id, stage="align")
+        srt = self._captions(rows, chunk_dir, sr, params.get("align", True))
+        self._update(job_id, stage="package")
+        with STAGE_SECONDS.time(stage="package"):
+            self._package(d, rows, chunk_dir, sr, srt)
+        shutil.rmtree(chunk_dir, ignore_errors=True)
+        self._update(job_id, state="done", stage="done", finished=time.time(), owner=None)
+
+    def _captions(self, rows, chunk_dir: Path, sr: int, align: bool) -> str:
+        from app.utils.make_captions import build_srt, wants_mfa
+        from app.utils.srt import srt_from_durations
+
+        chunks = [r["text"] for r in rows]
+        if wants_mfa(chunks, align):
+            wavs = [_read_chunk_wav(chunk_dir / f"{r['idx']:06d}.wav") for r in rows]
+            return build_srt(chunks, wavs, sr, align=True)
+        return srt_from_durations(chunks, [int(r["nsamples"] / sr * 1000) for r in rows])
+
+    def _package(self, d: Path, rows, chunk_dir: Path, sr: int, srt: str) -> None:
+        from app.utils.make_captions import srt_text_to_vtt
+
+        fd, tmp = tempfile.mkstemp(dir=str(d), suffix=".zip.tmp")
+        os.close(fd)
+        total = sum(int(r["nsamples"]) for r in rows)
+        with zipfile.ZipFile(tmp, "w", zipfile.ZIP_STORED) as zf:
+            # PCM does not deflate meaningfully; store it and stream chunk frames straight in
+            with zf.open("audio.wav", "w", force_zip64=True) as entry:
+                with wave.open(entry, "wb") as w:
+                    w.setnchannels(1)
+                    w.setsampwidth(2)
+                    w.setframerate(sr)
+                    w.setnframes(total)
+                    for r in rows:
+                        with wave.open(str(chunk_dir / f"{r['idx']:06d}.wav"), "rb") as cw:
+                            w.writeframesraw(cw.readframes(cw.getnframes()))
+            zf.writestr("captions.srt", srt, compress_type=zipfile.ZIP_DEFLATED)
+            zf.writestr("captions.vtt", srt_text_to_vtt(srt), compress_type=zipfile.ZIP_DEFLATED)
+        os.replace(tmp, d / "result.zip")
+
+
+def _write_chunk_wav(path: Path, audio: np.ndarray, sr: int) -> None:
+    """Atomic per-chunk WAV write (temp file + rename)."""
+    tmp = path.with_suffix(".tmp")
+    a16 = (np.clip(audio, -1, 1) * 32767).astype("<i2")
+    with wave.open(str(tmp), "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(sr)
+        w.writeframes(a16.tobytes())
+    os.replace(tmp, path)
+
+
+def _read_chunk_wav(path: Path) -> np.ndarray:
+    with wave.open(str(path), "rb") as w:
+        frames = w.readframes(w.getnframes())
+    return np.frombuffer(frames, dtype="<i2").astype(np.float32) / 32767.0
@@ -0,0 +1,324 @@
+# app/services/kokoro_batcher.py
+from __future__ import annotations
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import torch
+from torch.nn.utils.rnn import pack_padded_sequence, pad_packed_sequence
+
+from app.services.kokoro_pool import KokoroPool, get_kokoro_pool
+from app.services.metrics import observe_synthesis
+from app.services.models import get_kokoro, get_kokoro_g2p
+
+_BATCHER = None
+_BATCHER_LOCK = threading.Lock()
+
+
+class _Item:
+    __slots__ = ("phonemes", "ref_s", "speed", "future")
+
+    def __init__(self, phonemes: str, ref_s: torch.Tensor, speed: float):
+        self.phonemes = phonemes
+        self.ref_s = ref_s
+        self.speed = speed
+        self.future: Future = Future()
+
+
+def _pad_groups(frames: List[int], max_pad: float) -> List[List[int]]:
+    """Group item indices so that, within a group, the longest is at most (1 + max_pad) x the shortest."""
+    order = sorted(range(len(frames)), key=lambda i: frames[i])
+    groups: List[List[int]] = []
+    for i in order:
+        if groups and frames[i] <= frames[groups[-1][0]] * (1.0 + max_pad):
+            groups[-1].append(i)
+        else:
+            groups.append([i])
+    return groups
+
+
+@torch.no_grad()
+def forward_batch(model, phonemes: List[str], ref_s: torch.Tensor, speed: torch.Tensor,
+                  *, max_pad: float = 0.0) -> Iterator[Tuple[int, torch.Tensor]]:
+    """
+    Padded batch version of KModel.forward_with_tokens. Yields (index, audio)
+    as each length group is decoded, shortest first, so a short segment (e.g.
+    the first chunk of a live stream) is not held back by longer ones.
+
+    The token-level stages (ALBERT, duration predictor, text encoder) take
+    length masks, so all items run as one batch. The frame-level stages
+    (F0/N predictor, decoder) normalize over time (InstanceNorm/AdaIN), so
+    zero padding would change a segment's audio depending on what it was
+    batched with. By default (`max_pad=0`) they are batched only across items
+    with equal frame counts, which matches the per-item computation; a
+    positive `max_pad` also mixes items within that fraction of each other's
+    length, trading exactness for bigger decoder batches.
+
+    In practice different texts almost never share a frame count, so with
+    `max_pad=0` the decoder - most of the cost - runs one segment at a time
+    and a batch only shares the token-level stages. On CPU that measures on
+    par with unbatched throughput, and padded decoder batches slower, not
+    faster (benchmark_tts.py --clients 8,16,32).
+    """
+    dev = model.device
+    vocab = model.vocab
+    ids = [[0, *(vocab[p] for p in ps if p in vocab), 0] for ps in phonemes]
+    B = len(ids)
+    lengths = torch.tensor([len(x) for x in ids], dtype=torch.long, device=dev)
+    T = int(lengths.max())
+    input_ids = torch.zeros((B, T), dtype=torch.long, device=dev)
+    for i, x in enumerate(ids):
+        input_ids[i, :len(x)] = torch.tensor(x, dtype=torch.long, device=dev)
+    text_mask = torch.arange(T, device=dev).unsqueeze(0) >= lengths.unsqueeze(1)  # True = padding
+
+    bert_dur = model.bert(input_ids, attention_mask=(~text_mask).int())
+    d_en = model.bert_encoder(bert_dur).transpose(-1, -2)
+    s = ref_s[:, 128:]
+    d = model.predictor.text_encoder(d_en, s, lengths, text_mask)
+    packed = pack_padded_sequence(d, lengths.cpu(), batch_first=True, enforce_sorted=False)
+    x, _ = model.predictor.lstm(packed)
+    x, _ = pad_packed_sequence(x, batch_first=True, total_length=T)
+    duration = torch.sigmoid(model.predictor.duration_proj(x)).sum(dim=-1) / speed.view(B, 1)
+    pred_dur = torch.round(duration).clamp(min=1).long().masked_fill(text_mask, 0)  # [B, T]
+    frames = pred_dur.sum(dim=-1).tolist()
+    t_en = model.text_encoder(input_ids, lengths, text_mask)
+
+    for group in _pad_groups(frames, max_pad):
+        F = max(frames[i] for i in group)
+        aln = torch.zeros((len(group), T, F), device=dev)
+        for j, i in enumerate(group):
+            idx = torch.repeat_interleave(torch.arange(T, device=dev), pred_dur[i])
+            aln[j, idx, torch.arange(idx.shape[0], device=dev)] = 1
+        g = torch.tensor(group, device=dev)
+        en = d[g].transpose(-1, -2) @ aln
+        F0_pred, N_pred = model.predictor.F0Ntrain(en, s[g])
+        asr = t_en[g] @ aln
+        audio = model.decoder(asr, F0_pred, N_pred, ref_s[g, :128]).reshape(len(group), -1)
+        hop = audio.shape[-1] // F
+        for j, i in enumerate(group):
+            yield i, audio[j, :frames[i] * hop]
+
+
+class KokoroBatcher:
+    """
+    Cross-request micro-batching for Kokoro.
+
+    Callers do G2P in their own thread and submit phoneme segments; each
+    worker waits up to `window_ms` (or until `max_batch` segments are pending)
+    after the first arrival, checks a model replica out of the pool and runs
+    everything collected as one padded batch on it. There is one worker per
+    replica, so while one batch runs the next is already being collected.
+    Each segment's Future receives its own float32 audio, so full renders and
+    live streams share batches.
+    """
+
+    def __init__(self, *, window_ms: float = 10.0, max_batch: int = 16, max_pad: float = 0.0,
+                 pool: Optional[KokoroPool] = None):
+        self.window = max(0.0, float(window_ms)) / 1000.0
+        self.max_batch = max(1, int(max_batch))
+        self.max_pad = float(max_pad)
+        self.pool = pool or get_kokoro_pool()
+        self._q: "queue.Queue[Optional[_Item]]" = queue.Queue()
+        self._packs: Dict[str, torch.Tensor] = {}
+        self._batched = True  # flips off if the installed kokoro doesn't match forward_batch
+        self._stats_lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+        self.max_seen = 0
+        self._threads = [threading.Thread(target=self._loop, name=f"kokoro-batcher-{i}", daemon=True)
+                         for i in range(len(self.pool))]
+        for t in self._threads:
+            t.start()
+
+    # ---------------- caller side ----------------
+
+    def _pack(self, pipe, voice: str) -> torch.Tensor:
+        pack = self._packs.get(voice)
+        if pack is None:
+            pack = pipe.load_voice(voice).to(pipe.model.device)
+            self._packs[voice] = pack
+        return pack
+
+    def submit_text(self, text: str, *, voice: str, speed: float, lang_code: str = "a") -> List[Future]:
+        """G2P `text` here, then queue each phoneme segment. Returns one Future per segment."""
+        pipe = get_kokoro(lang_code=lang_code)
+        pack = self._pack(pipe, voice)
+        futures = []
+        for _gs, ps, _ in get_kokoro_g2p(lang_code)(text, split_pattern=r"\n+"):
+            if not ps:
+                continue
+            item = _Item(ps, pack[len(ps) - 1], float(speed))
+            self._q.put(item)
+            futures.append(item.future)
+        return futures
+
+    def synthesize(self, chunks: List[str], *, voice: str, speed: float, lang_code: str = "a") -> List[np.ndarray]:
+        """Submit every chunk up front (so they can share batches), then gather per chunk."""
+        return list(self.submit_all(chunks, voice=voice, speed=speed, lang_code=lang_code))
+
+    def submit_all(self, chunks: List[str], *, voice: str, speed: float, lang_code: str = "a") -> Iterator[np.ndarray]:
+        """Queue every chunk now; returns an iterator over their audio in order (closing it cancels the rest)."""
+        pending = [self.submit_text(t, voice=voice, speed=speed, lang_code=lang_code) for t in chunks]
+        return _in_order(pending)
+
+    def stream(self, chunks: List[str], *, voice: str, speed: float, lang_code: str = "a",
+               lookahead: int = 2) -> Iterator[np.ndarray]:
+        """Yield audio per chunk in order, keeping `lookahead` chunks queued ahead of the reader."""
+        pending: List[List[Future]] = []
+        it = iter(chunks)
+        for txt in it:
+            pending.append(self.submit_text(txt, voice=voice, speed=speed, lang_code=lang_code))
+            if len(pending) > lookahead:
+                break
+        try:
+            while pending:
+                yield _join(pending.pop(0))
+                nxt = next(it, None)
+                if nxt is not None:
+                    pending.append(self.submit_text(nxt, voice=voice, speed=speed, lang_code=lang_code))
+        finally:
+            for futs in pending:  # reader went away: drop work that hasn't started
+                for f in futs:
+                    f.cancel()
+
+    # ---------------- worker side ----------------
+
+    def _loop(self) -> None:
+        while True:
+            first = self._q.get()
+            if first is None:  # close()
+                return
+            batch = [first]
+            deadline = time.perf_counter() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._q.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._q.put(None)  # leave it for the top of a loop
+                    break
+                batch.append(item)
+            batch = [it for it in batch if it.future.set_running_or_notify_cancel()]
+            if batch:
+                start = time.perf_counter()
+                with self.pool.checkout() as replica:
+                    replica.run(self._run, batch, replica.model)
+                audio = sum(len(it.future.result()) for it in batch if it.future.exception() is None)
+                observe_synthesis("kokoro", time.perf_counter() - start, len(batch), audio / 24000)
+
+    def _run(self, batch: List[_Item], model) -> None:
+        with self._stats_lock:
+            self.batches += 1
+            self.items += len(batch)
+            self.max_seen = max(self.max_seen, len(batch))
+        if self._batched and len(batch) > 1:
+            try:
+                ref_s = torch.cat([it.ref_s for it in batch], dim=0)
+                speed = torch.tensor([it.speed for it in batch], dtype=torch.float32, device=model.device)
+                for i, audio in forward_batch(model, [it.phonemes for it in batch], ref_s, speed,
+                                              max_pad=self.max_pad):
+                    batch[i].future.set_result(_to_numpy(audio))
+                return
+            except (AttributeError, TypeError, KeyError) as e:
+                self._batched = False
+                logging.warning(f"Kokoro batched forward unavailable ({e}); running per segment")
+            except Exception as e:
+                logging.warning(f"Kokoro batch of {len(batch)} failed ({e}); retrying per segment")
+            batch = [it for it in batch if not it.future.done()]
+        for it in batch:
+            try:
+                with torch.no_grad():
+                    it.future.set_result(_to_numpy(model(it.phonemes, it.ref_s, it.speed)))
+            except Exception as e:
+                it.future.set_exception(e)
+
+    def close(self) -> None:
+        """Finish what is queued, stop the workers and fail anything submitted after that."""
+        for _ in self._threads:
+            self._q.put(None)
+        for t in self._threads:
+            t.join()
+        while True:
+            try:
+                item = self._q.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None and item.future.set_running_or_notify_cancel():
+                item.future.set_exception(RuntimeError("Kokoro was unloaded"))
+        self._packs.clear()
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "segments": self.items,
+            "avg_batch": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "max_batch_seen": self.max_seen,
+            "pending": self._q.qsize(),
+            "batched_forward": self._batched,
+            "pool": self.pool.stats(),
+        }
+
+
+def _to_numpy(audio: torch.Tensor) -> np.ndarray:
+    return audio.detach().float().cpu().numpy().reshape(-1).astype(np.float32, copy=False)
+
+
+def _join(futures: List[Future]) -> np.ndarray:
+    parts = [f.result() for f in futures]
+    if not parts:
+        return np.zeros(0, dtype=np.float32)
+    return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+
+def _in_order(pending: List[List[Future]]) -> Iterator[np.ndarray]:
+    try:
+        while pending:
+            yield _join(pending.pop(0))
+    finally:
+        for futs in pending:
+            for f in futs:
+                f.cancel()
+
+
+def get_kokoro_batcher() -> Optional[KokoroBatcher]:
+    """Process-wide batcher, or None when KOKORO_BATCHING=0."""
+    global _BATCHER
+    if os.environ.get("KOKORO_BATCHING", "1").lower() in ("0", "false", "no", "off"):
+        return None
+    batcher = _BATCHER
+    if batcher is not None:
+        return batcher
+    pool = get_kokoro_pool()  # outside the lock: it may wait for the model manager to (re)load Kokoro
+    with _BATCHER_LOCK:
+        if _BATCHER is None:
+            _BATCHER = KokoroBatcher(
+                window_ms=float(os.environ.get("KOKORO_BATCH_WINDOW_MS", "10")),
+                max_batch=int(os.environ.get("KOKORO_BATCH_MAX", "16")),
+                max_pad=float(os.environ.get("KOKORO_BATCH_MAX_PAD", "0")),
+                pool=pool,
+            )
+        return _BATCHER
+
+
+def batcher_stats() -> Optional[dict]:
+    """Stats of the batcher if it is running (never loads the model)."""
+    batcher = _BATCHER
+    return batcher.stats() if batcher is not None else None
+
+
+def close_kokoro_batcher() -> None:
+    """Stop the process-wide batcher; the next get_kokoro_batcher() builds a fresh one."""
+    global _BATCHER
+    with _BATCHER_LOCK:
+        batcher, _BATCHER = _BATCHER, None
+    if batcher is not None:
+        batcher.close()
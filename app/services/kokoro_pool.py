@@ -0,0 +1,207 @@
+# app/services/kokoro_pool.py
+from __future__ import annotations
+import copy
+import logging
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Iterator, List, Optional, Tuple
+
+import torch
+
+from app.services.lifecycle import MODELS, ModelSpec
+from app.services.models import KOKORO_REGISTRY, get_kokoro, kokoro_loaded, quantization_info
+
+_POOL = None
+_POOL_LOCK = threading.Lock()
+
+# Kokoro's matmuls are small; beyond ~4 intra-op threads a replica gains little
+DEFAULT_THREADS_PER_REPLICA = 4
+MAX_AUTO_REPLICAS = 8
+
+
+def _usable_cores() -> List[int]:
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def _env_count(name: str) -> Optional[int]:
+    v = os.environ.get(name, "auto").strip().lower()
+    return None if v in ("", "auto") else max(1, int(v))
+
+
+def pool_shape(n_cores: int, *, on_gpu: bool, replicas: Optional[int] = None,
+               threads: Optional[int] = None) -> Tuple[int, int]:
+    """(replicas, intra-op threads per replica); unset values are derived from the core count."""
+    if on_gpu:
+        return replicas or 1, threads or min(8, n_cores)
+    if replicas is None:
+        threads = threads or DEFAULT_THREADS_PER_REPLICA
+        replicas = max(1, min(MAX_AUTO_REPLICAS, n_cores // threads))
+    elif threads is None:
+        threads = max(1, n_cores // replicas)
+    return replicas, threads
+
+
+def _clone_model(model):
+    """
+    Independent copy of a loaded KModel. The decoder uses the old-style
+    weight_norm, whose derived `weight` tensors are not graph leaves, and
+    deepcopy refuses those; recomputing them without grad first makes them
+    plain tensors (every forward recomputes them anyway).
+    """
+    from torch.nn.utils.weight_norm import WeightNorm
+
+    with torch.no_grad():
+        for module in model.modules():
+            for hook in module._forward_pre_hooks.values():
+                if isinstance(hook, WeightNorm):
+                    setattr(module, hook.name, hook.compute_weight(module))
+    return copy.deepcopy(model).eval()
+
+
+class KokoroReplica:
+    """
+    One copy of the Kokoro model with its own worker thread. The thread is
+    pinned to `cores` (Linux affinity is per thread, and the OpenMP team it
+    spawns inherits it) and sets its own intra-op thread count, so replicas
+    do not compete for the same cores.
+    """
+
+    def __init__(self, index: int, model, *, threads: int, cores: Optional[List[int]]):
+        self.index = index
+        self.model = model
+        self.threads = threads
+        self.cores = cores
+        self._exec = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"kokoro-r{index}", initializer=self._pin)
+
+    def _pin(self) -> None:
+        if self.cores and hasattr(os, "sched_setaffinity"):
+            try:
+                os.sched_setaffinity(0, self.cores)  # 0 = the calling thread on Linux
+            except OSError as e:
+                logging.warning(f"Kokoro replica {self.index}: could not pin to cores {self.cores}: {e}")
+        torch.set_num_threads(self.threads)
+
+    def run(self, fn: Callable, *args, **kwargs):
+        """Run `fn` on this replica's pinned thread and wait for the result."""
+        return self._exec.submit(fn, *args, **kwargs).result()
+
+    def close(self) -> None:
+        self._exec.shutdown(wait=False)
+        self.model = None
+
+    def pipeline(self, lang_code: str = "a"):
+        """The registry's pipeline for `lang_code`, re-pointed at this replica's model (G2P is shared)."""
+        pipe = copy.copy(get_kokoro(lang_code=lang_code))
+        pipe.model = self.model
+        return pipe
+
+
+class KokoroPool:
+    """
+    N Kokoro replicas, checked out one request (or batch) at a time.
+
+    Replica 0 wraps the registry's model for the default repo; the others
+    are copies of it (see _clone_model), so they load no weights from disk. On CPU the usable cores are
+    split into contiguous slices, one per replica, for near-linear chunk
+    throughput across replicas instead of one oversubscribed model.
+    """
+
+    def __init__(self, replicas: Optional[int] = None, threads: Optional[int] = None, *, pin: bool = True):
+        base = KOKORO_REGISTRY.model()
+        on_gpu = getattr(getattr(base, "device", None), "type", "cpu") == "cuda"
+        cores = _usable_cores()
+        n, t = pool_shape(len(cores), on_gpu=on_gpu, replicas=replicas, threads=threads)
+        pin = pin and not on_gpu and hasattr(os, "sched_setaffinity")
+        if pin and n * t > len(cores):
+            logging.warning(f"Kokoro pool: {n} replicas x {t} threads exceeds {len(cores)} cores; not pinning")
+            pin = False
+        self.threads = t
+        self.replicas: List[KokoroReplica] = []
+        for i in range(n):
+            model = base if i == 0 else _clone_model(base)
+            self.replicas.append(KokoroReplica(i, model, threads=t, cores=cores[i * t:(i + 1) * t] if pin else None))
+        self._free: "queue.Queue[KokoroReplica]" = queue.Queue()
+        for r in self.replicas:
+            self._free.put(r)
+        logging.info(f"Kokoro pool: {n} replica(s) x {t} thread(s){' pinned' if pin else ''}")
+
+    def __len__(self) -> int:
+        return len(self.replicas)
+
+    @contextmanager
+    def checkout(self) -> Iterator[KokoroReplica]:
+        """Borrow a replica for the duration of the block (waits while all are busy)."""
+        replica = self._free.get()
+        try:
+            yield replica
+        finally:
+            self._free.put(replica)
+
+    def close(self) -> None:
+        """Stop the replica threads and drop the model copies (work already submitted still finishes)."""
+        for r in self.replicas:
+            r.close()
+
+    def stats(self) -> dict:
+        return {
+            "replicas": len(self.replicas),
+            "threads_per_replica": self.threads,
+            "busy": len(self.replicas) - self._free.qsize(),
+            "cores": [r.cores for r in self.replicas],
+        }
+
+
+def get_kokoro_pool() -> KokoroPool:
+    """Process-wide replica pool, shaped by KOKORO_REPLICAS / KOKORO_THREADS_PER_REPLICA.
+    Loads Kokoro through the model manager if it is not resident."""
+    pool = _POOL
+    if pool is not None:
+        MODELS.touch("kokoro")
+        return pool
+    return MODELS.ensure("kokoro")
+
+
+def _load_pool() -> KokoroPool:
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = KokoroPool(
+                replicas=_env_count("KOKORO_REPLICAS"),
+                threads=_env_count("KOKORO_THREADS_PER_REPLICA"),
+                pin=os.environ.get("KOKORO_PIN_CORES", "1").lower() not in ("0", "false", "no", "off"),
+            )
+        return _POOL
+
+
+def _unload_pool() -> None:
+    """Drop the batcher, the replicas and every registry pipeline, so the weights can be freed."""
+    global _POOL
+    from app.services.kokoro_batcher import close_kokoro_batcher
+    close_kokoro_batcher()
+    with _POOL_LOCK:
+        pool, _POOL = _POOL, None
+    if pool is not None:
+        pool.close()
+    KOKORO_REGISTRY.clear()
+
+
+def _warm_pool() -> None:
+    from app.utils.synthesize import synthesize_kokoro_chunks
+    synthesize_kokoro_chunks(["test"], voice="af_heart", speed=1.0)
+
+
+def pool_stats() -> Optional[dict]:
+    """Stats of the pool if it has been created (never loads the model)."""
+    pool = _POOL
+    return pool.stats() if pool is not None else None
+
+
+MODELS.register(ModelSpec(
+    "kokoro", load=_load_pool, unload=_unload_pool, warm=_warm_pool,
+    is_loaded=lambda: _POOL is not None or kokoro_loaded(), info=lambda: quantization_info("kokoro"),
+))
@@ -0,0 +1,311 @@
+# app/services/lifecycle.py
+"""
+Model lifecycle: load on demand, warm, and unload idle models.
+
+Each engine registers a ModelSpec (load / unload / warm / is_loaded). The
+manager records per model its last use, resident size (RSS growth during the
+load, plus CUDA allocations) and warm state. Callers that need a model go
+through ensure(), so concurrent requests for an unloaded model wait on one
+shared load Future instead of loading it twice; code that is running on a
+model holds a lease(), and a leased model is never unloaded.
+
+A reaper thread unloads models idle longer than `idle_ttl`, and - when the
+process RSS exceeds `rss_limit` - unloads idle models least-recently-used
+first until it drops below the limit.
+"""
+from __future__ import annotations
+import functools
+import gc
+import inspect
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, Optional
+
+
+def _rss_bytes() -> int:
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except Exception:
+        return 0
+
+
+def _cuda_bytes() -> int:
+    try:
+        import torch
+        return torch.cuda.memory_allocated() if torch.cuda.is_available() else 0
+    except Exception:
+        return 0
+
+
+def _release_memory() -> None:
+    gc.collect()
+    try:
+        import torch
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+    except Exception:
+        pass
+
+
+class ModelBusy(RuntimeError):
+    """Unload refused: the model is leased by running requests."""
+
+
+class ModelSpec:
+    def __init__(self, name: str, *, load: Callable, unload: Callable[[], None],
+                 is_loaded: Callable[[], bool], warm: Optional[Callable[[], None]] = None,
+                 info: Optional[Callable[[], dict]] = None):
+        self.name = name
+        self.load = load
+        self.unload = unload
+        self.is_loaded = is_loaded
+        self.warm = warm
+        self.info = info  # extra engine-specific status fields
+
+
+class _State:
+    def __init__(self, spec: ModelSpec):
+        self.spec = spec
+        self.loading: Optional[Future] = None
+        self.unloading = False
+        self.in_use = 0
+        self.warm = False
+        self.last_used = 0.0
+        self.loaded_at: Optional[float] = None
+        self.load_seconds: Optional[float] = None
+        self.resident_bytes = 0
+        self.loads = 0
+        self.unloads = 0
+
+
+class ModelManager:
+    def __init__(self, *, idle_ttl: float = 0.0, rss_limit: int = 0, check_every: float = 30.0):
+        self.idle_ttl = float(idle_ttl)
+        self.rss_limit = int(rss_limit)
+        self.check_every = max(1.0, float(check_every))
+        self._models: Dict[str, _State] = {}
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def register(self, spec: ModelSpec) -> None:
+        with self._cond:
+            self._models[spec.name] = _State(spec)
+
+    def _state(self, name: str) -> _State:
+        st = self._models.get(name)
+        if st is None:
+            raise KeyError(f"unknown model '{name}'")
+        return st
+
+    def names(self) -> Iterable[str]:
+        return list(self._models)
+
+    # ---------------- use ----------------
+
+    def touch(self, name: str) -> None:
+        st = self._models.get(name)
+        if st is not None:
+            st.last_used = time.monotonic()
+
+    def ensure(self, name: str, *args):
+        """Return the loaded model, loading it if needed; concurrent callers share one load."""
+        st = self._state(name)
+        with self._cond:
+            while st.unloading:
+                self._cond.wait()
+            st.last_used = time.monotonic()
+            fut = st.loading
+            leader = fut is None
+            if leader:
+                fut = st.loading = Future()
+        if not leader:
+            return fut.result()
+        rss0, cuda0 = _rss_bytes(), _cuda_bytes()
+        start = time.perf_counter()
+        try:
+            result = st.spec.load(*args)
+        except BaseException as e:
+            with self._cond:
+                st.loading = None
+                self._cond.notify_all()
+            fut.set_exception(e)
+            raise
+        with self._cond:
+            if st.loaded_at is None:
+                st.loads += 1
+                st.loaded_at = time.time()
+                st.load_seconds = round(time.perf_counter() - start, 3)
+                st.resident_bytes = max(0, _rss_bytes() - rss0) + max(0, _cuda_bytes() - cuda0)
+            st.loading = None
+            self._cond.notify_all()
+        fut.set_result(result)
+        return result
+
+    @contextmanager
+    def lease(self, name: str):
+        """Mark the model in use for the block (it will not be unloaded meanwhile)."""
+        st = self._state(name)
+        with self._cond:
+            while st.unloading:
+                self._cond.wait()
+            st.in_use += 1
+            st.last_used = time.monotonic()
+        try:
+            yield
+        finally:
+            with self._cond:
+                st.in_use -= 1
+                st.last_used = time.monotonic()
+
+    def leased(self, name: str, it: Iterable) -> Iterator:
+        """Iterate `it` holding a lease for as long as the iteration lasts."""
+        with self.lease(name):
+            yield from it
+
+    # ---------------- admin ----------------
+
+    def load(self, name: str, *, warm: bool = False) -> dict:
+        self.ensure(name)
+        if warm:
+            self.warm(name)
+        return self.status(name)
+
+    def warm(self, name: str) -> dict:
+        st = self._state(name)
+        if st.spec.warm is not None:
+            with self.lease(name):
+                st.spec.warm()
+        st.warm = True
+        return self.status(name)
+
+    def unload(self, name: str, *, force: bool = False) -> dict:
+        """Drop the model's references and free memory. Raises ModelBusy while leased (unless `force`)."""
+        st = self._state(name)
+        with self._cond:
+            while st.loading is not None or st.unloading:  # let a load in progress finish first
+                self._cond.wait()
+            if st.in_use and not force:
+                raise ModelBusy(f"{name} is in use by {st.in_use} request(s)")
+            if not st.spec.is_loaded():
+                return self._status(st)
+            st.unloading = True
+        try:
+            rss0 = _rss_bytes()
+            st.spec.unload()
+            _release_memory()
+            logging.info(f"Unloaded {name} (freed ~{max(0, rss0 - _rss_bytes()) / 2**20:.0f} MB RSS)")
+        finally:
+            with self._cond:
+                st.unloading = False
+                st.warm = False
+                st.loaded_at = None
+                st.resident_bytes = 0
+                st.unloads += 1
+                self._cond.notify_all()
+        return self.status(name)
+
+    def _status(self, st: _State) -> dict:
+        loaded = bool(st.spec.is_loaded())
+        return {
+            "name": st.spec.name,
+            "state": "loading" if st.loading is not None else "unloading" if st.unloading
+            else "loaded" if loaded else "unloaded",
+            "warm": st.warm and loaded,
+            "in_use": st.in_use,
+            "idle_seconds": round(time.monotonic() - st.last_used, 1) if st.last_used else None,
+            "resident_bytes": st.resident_bytes if loaded else 0,
+            "load_seconds": st.load_seconds,
+            "loads": st.loads,
+            "unloads": st.unloads,
+            **(st.spec.info() if st.spec.info is not None else {}),
+        }
+
+    def status(self, name: Optional[str] = None):
+        with self._cond:
+            if name is not None:
+                return self._status(self._state(name))
+            return [self._status(st) for st in self._models.values()]
+
+    # ---------------- reaper ----------------
+
+    def start(self) -> None:
+        if self._thread is not None or not (self.idle_ttl > 0 or self.rss_limit > 0):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._reap_loop, name="model-reaper", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread = None
+
+    def _idle(self) -> list:
+        """Loaded, unleased models, least recently used first."""
+        with self._cond:
+            states = [st for st in self._models.values()
+                      if not st.in_use and st.loading is None and st.spec.is_loaded()]
+        return sorted(states, key=lambda st: st.last_used)
+
+    def reap(self) -> list:
+        """One pass of TTL and memory-pressure unloading. Returns the models unloaded."""
+        unloaded = []
+        now = time.monotonic()
+        for st in self._idle():
+            if self.idle_ttl > 0 and now - st.last_used >= self.idle_ttl:
+                logging.info(f"{st.spec.name} idle for {now - st.last_used:.0f}s; unloading")
+                self._try_unload(st, unloaded)
+        if self.rss_limit > 0:
+            for st in self._idle():
+                if _rss_bytes() <= self.rss_limit:
+                    break
+                logging.warning(f"RSS {_rss_bytes() / 2**20:.0f} MB over limit; unloading {st.spec.name}")
+                self._try_unload(st, unloaded)
+        return unloaded
+
+    def _try_unload(self, st: _State, unloaded: list) -> None:
+        try:
+            self.unload(st.spec.name)
+            unloaded.append(st.spec.name)
+        except ModelBusy:
+            pass  # picked up again just now
+        except Exception as e:
+            logging.warning(f"Unloading {st.spec.name} failed: {e}")
+
+    def _reap_loop(self) -> None:
+        while not self._stop.wait(self.check_every):
+            self.reap()
+
+
+def uses_model(name: str):
+    """Decorator: hold a lease on `name` while the function (or generator) runs."""
+    def deco(fn):
+        if inspect.isgeneratorfunction(fn):
+            @functools.wraps(fn)
+            def gen(*args, **kwargs):
+                with MODELS.lease(name):
+                    yield from fn(*args, **kwargs)
+            return gen
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with MODELS.lease(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return deco
+
+
+def _env_float(name: str, default: str) -> float:
+    import os
+    return float(os.environ.get(name, default) or 0)
+
+
+MODELS = ModelManager(
+    idle_ttl=_env_float("TTS_MODEL_IDLE_TTL", "0"),
+    rss_limit=int(_env_float("TTS_MODEL_RSS_LIMIT_MB", "0") * 1024 * 1024),
+    check_every=_env_float("TTS_MODEL_CHECK_SECONDS", "30"),
+)
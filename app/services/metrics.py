@@ -0,0 +1,272 @@
+# app/services/metrics.py
+"""
+Minimal in-process metrics with Prometheus text exposition (no client library,
+no push gateway). Each uvicorn worker keeps its own registry, so scrape every
+worker (or run one) when aggregating.
+"""
+from __future__ import annotations
+import bisect
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import AsyncIterable, AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+_REGISTRY: List["_Metric"] = []
+_REGISTRY_LOCK = threading.Lock()
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+RTF_BUCKETS = (0.02, 0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0, 10.0)
+
+
+def _escape(v: str) -> str:
+    return v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _fmt_value(v: float) -> str:
+    if math.isinf(v):
+        return "+Inf" if v > 0 else "-Inf"
+    if v == int(v) and abs(v) < 1e15:
+        return str(int(v))
+    return repr(float(v))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        with _REGISTRY_LOCK:
+            _REGISTRY.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def _samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        head = f"# HELP {self.name} {self.documentation}\n# TYPE {self.name} {self.kind}\n"
+        return head + "".join(line + "\n" for line in self._samples())
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for key, v in items:
+            yield f"{self.name}{_fmt_labels(self.labelnames, key)} {_fmt_value(v)}"
+
+
+class Gauge(_Metric):
+    """Set directly, or computed at scrape time by `fn` (a number, or {label-tuple: number})."""
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames=(), fn: Optional[Callable] = None):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._fn = fn
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def _samples(self):
+        if self._fn is not None:
+            try:
+                got = self._fn()
+            except Exception:
+                return
+            items = got.items() if isinstance(got, dict) else [((), got)]
+        else:
+            with self._lock:
+                items = list(self._values.items())
+        for key, v in items:
+            key = key if isinstance(key, tuple) else (key,)
+            yield f"{self.name}{_fmt_labels(self.labelnames, key)} {_fmt_value(float(v))}"
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._data: Dict[Tuple[str, ...], list] = {}  # key -> [bucket counts..., sum, count]
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            d = self._data.get(key)
+            if d is None:
+                d = self._data[key] = [0] * len(self.buckets) + [0.0, 0]
+            if i < len(self.buckets):
+                d[i] += 1
+            d[-2] += value
+            d[-1] += 1
+
+    def mean(self, **labels) -> Optional[float]:
+        """Mean of all observations for these labels, or None if there are none yet."""
+        with self._lock:
+            d = self._data.get(self._key(labels))
+            return d[-2] / d[-1] if d and d[-1] else None
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _samples(self):
+        with self._lock:
+            items = [(k, list(d)) for k, d in self._data.items()]
+        for key, d in items:
+            cum = 0
+            for b, n in zip(self.buckets, d):
+                cum += n
+                le = 'le="%s"' % _fmt_value(b)
+                yield f"{self.name}_bucket{_fmt_labels(self.labelnames, key, le)} {cum}"
+            le = 'le="+Inf"'
+            yield f"{self.name}_bucket{_fmt_labels(self.labelnames, key, le)} {d[-1]}"
+            yield f"{self.name}_sum{_fmt_labels(self.labelnames, key)} {_fmt_value(d[-2])}"
+            yield f"{self.name}_count{_fmt_labels(self.labelnames, key)} {d[-1]}"
+
+
+def timed_iter(it: Iterable, hist: Histogram, **labels) -> Iterator:
+    """Pass `it` through, observing only the time spent producing items (not time the consumer holds them)."""
+    it = iter(it)
+    spent = 0.0
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(it)
+            except StopIteration:
+                spent += time.perf_counter() - start
+                break
+            spent += time.perf_counter() - start
+            yield item
+    finally:
+        hist.observe(spent, **labels)
+
+
+def first_byte_iter(it: Iterable, hist: Histogram, start: float, **labels) -> Iterator:
+    """Pass `it` through, observing the delay from `start` (perf_counter) to its first item."""
+    first = True
+    for item in it:
+        if first:
+            hist.observe(time.perf_counter() - start, **labels)
+            first = False
+        yield item
+
+
+async def afirst_byte_iter(it: AsyncIterable, hist: Histogram, start: float, **labels) -> AsyncIterator:
+    """Async counterpart of first_byte_iter."""
+    first = True
+    async for item in it:
+        if first:
+            hist.observe(time.perf_counter() - start, **labels)
+            first = False
+        yield item
+
+
+def render_latest() -> str:
+    with _REGISTRY_LOCK:
+        metrics = list(_REGISTRY)
+    return "".join(m.render() for m in metrics)
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# ---------------- Shared metrics ----------------
+
+STAGE_SECONDS = Histogram(
+    "tts_stage_seconds",
+    "Wall time per pipeline stage (extract_text, split_sentences, concat, mfa_align, captions, package).",
+    ["stage"])
+CHUNK_SYNTH_SECONDS = Histogram(
+    "tts_chunk_synthesis_seconds",
+    "Synthesis time per chunk (amortized over each synthesize call).",
+    ["engine"])
+REALTIME_FACTOR = Histogram(
+    "tts_realtime_factor",
+    "Synthesis seconds per second of audio produced (lower is faster).",
+    ["engine"], buckets=RTF_BUCKETS)
+STREAM_TTFB_SECONDS = Histogram(
+    "tts_stream_ttfb_seconds",
+    "Time from request to first audio byte on streaming endpoints.",
+    ["endpoint", "engine"])
+REQUESTS = Counter(
+    "tts_requests_total",
+    "Synthesis requests by endpoint and (resolved) engine.",
+    ["endpoint", "engine"])
+REQUEST_CHUNKS = Histogram(
+    "tts_request_chunks",
+    "Text chunks per synthesis request.",
+    ["endpoint"], buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 4096))
+CACHE_REQUESTS = Counter(
+    "tts_cache_requests_total",
+    "Cache lookups by cache and result (hit/miss).",
+    ["cache", "result"])
+MODEL_LOAD_SECONDS = Gauge(
+    "tts_model_load_seconds",
+    "Time the last load of each model took.",
+    ["model"])
+
+
+def _hit_ratios() -> Dict[Tuple[str, ...], float]:
+    with CACHE_REQUESTS._lock:
+        values = dict(CACHE_REQUESTS._values)
+    out = {}
+    for cache in {k[0] for k in values}:
+        hits = values.get((cache, "hit"), 0.0)
+        total = hits + values.get((cache, "miss"), 0.0)
+        if total:
+            out[(cache,)] = hits / total
+    return out
+
+
+CACHE_HIT_RATIO = Gauge(
+    "tts_cache_hit_ratio",
+    "Hits / lookups since start, per cache.",
+    ["cache"], fn=_hit_ratios)
+
+
+def observe_synthesis(engine: str, seconds: float, n_chunks: int, audio_seconds: float) -> None:
+    if n_chunks > 0:
+        per_chunk = seconds / n_chunks
+        for _ in range(n_chunks):
+            CHUNK_SYNTH_SECONDS.observe(per_chunk, engine=engine)
+    if audio_seconds > 0:
+        REALTIME_FACTOR.observe(seconds / audio_seconds, engine=engine)
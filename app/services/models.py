@@ -10,13 +10,25 @@ from pathlib import Path
 from typing import Optional
 from functools import lru_cache
 import hashlib
+import copy
 
-__all__ = ["get_kokoro", "get_cosyvoice2", "preload_models", "get_recommended_engine"]
+from app.services.lifecycle import MODELS, ModelSpec
+from app.services.metrics import MODEL_LOAD_SECONDS
+from app.utils.quantize import cache_path as quantized_cache_path, load_or_quantize, parse_mode
+
+__all__ = ["get_kokoro", "get_kokoro_g2p", "kokoro_loaded", "get_cosyvoice2", "cosyvoice2_model_id", "model_fingerprint", "preload_models",
+           "get_recommended_engine", "quantization", "set_quantization"]
 
 _COSYVOICE2_SINGLETON = None
+_COSYVOICE2_ID = None
 _cosy_lock = threading.Lock()
-_KOKORO = None
-_KOKORO_LOCK = threading.Lock()
+
+# Opt-in dynamic int8 quantization per engine (CPU only), and what each loaded model actually runs
+_QUANTIZE = {
+    "kokoro": parse_mode(os.environ.get("KOKORO_QUANTIZE")),
+    "cosyvoice2": parse_mode(os.environ.get("COSY_QUANTIZE")),
+}
+_QUANT_APPLIED: dict = {}
 
 # Add synthesis cache
 _SYNTHESIS_CACHE = {}
@@ -179,35 +191,271 @@ def _pick_device_and_dtype(force_device: str | None = None, force_dtype: str | N
 # ---------- Kokoro (hexgrad/Kokoro-82M) ----------
 
 
+def _default_kokoro_repo() -> str:
+    return os.environ.get("KOKORO_REPO", "hexgrad/Kokoro-82M")
+
+
+def _rss_bytes() -> int:
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except Exception:
+        return 0
+
+
+def quantization(engine: str) -> str:
+    """Quantization mode the engine's next load will use ("none" or "int8")."""
+    return _QUANTIZE[engine]
+
+
+def set_quantization(engine: str, mode: str) -> None:
+    """Change the engine's quantization mode; takes effect the next time it is loaded."""
+    _QUANTIZE[engine] = parse_mode(mode)
+
+
+def quantization_info(engine: str) -> dict:
+    return {"quantize": _QUANTIZE[engine], "precision": _QUANT_APPLIED.get(engine)}
+
+
+def model_precision(engine: str) -> str:
+    """Precision the engine runs at: what the loaded model uses, else what the next load will use."""
+    return _QUANT_APPLIED.get(engine) or _QUANTIZE[engine]
+
+
+def model_fingerprint(engine: str, repo_id: Optional[str] = None) -> str:
+    """
+    Model identity plus precision, for keying cached audio: output from a
+    different checkpoint or quantization must never be served for another.
+    Does not load the model.
+    """
+    if engine == "cosyvoice2":
+        ident = cosyvoice2_model_id()
+    else:
+        try:
+            from importlib.metadata import version
+            kokoro_version = version("kokoro")
+        except Exception:
+            kokoro_version = "unknown"
+        ident = f"{repo_id or _default_kokoro_repo()}@{kokoro_version}"
+    return f"{ident}|{model_precision(engine)}"
+
+
+def _module_nbytes(model) -> int:
+    """Bytes of a module's tensors, counting int8 packed Linear weights too (not plain parameters)."""
+    total = 0
+    for v in model.state_dict().values():
+        for t in (v if isinstance(v, tuple) else (v,)):
+            if isinstance(t, torch.Tensor):
+                total += t.numel() * t.element_size()
+    return total
+
+
+def _load_kokoro_model(repo_id: str):
+    from kokoro import KModel
+
+    if _QUANTIZE["kokoro"] == "int8":
+        if torch.cuda.is_available() and "970" not in torch.cuda.get_device_name(0).lower():
+            logging.warning("KOKORO_QUANTIZE=int8 is for CPU inference; keeping Kokoro float32 on the GPU")
+        else:
+            import kokoro
+            path = quantized_cache_path("kokoro", repo_id, getattr(kokoro, "__version__", ""), "int8")
+            model = load_or_quantize(lambda: KModel(repo_id=repo_id).eval(), path, label=f"Kokoro {repo_id}")
+            _QUANT_APPLIED["kokoro"] = "int8"
+            return model
+
+    _QUANT_APPLIED["kokoro"] = "none"
+    model = KModel(repo_id=repo_id).eval()
+    # Move to GPU if available and not GTX 970
+    if torch.cuda.is_available():
+        gpu_name = torch.cuda.get_device_name(0).lower()
+        if "970" not in gpu_name:  # Don't use GPU for GTX 970
+            try:
+                model = model.cuda()
+                torch.cuda.empty_cache()  # Clear cache after loading
+                logging.info("Kokoro moved to GPU")
+            except Exception as e:
+                logging.warning(f"Failed to move Kokoro to GPU: {e}")
+        else:
+            logging.info("GTX 970 detected - keeping Kokoro on CPU for stability")
+    return model
+
+
+class _Entry:
+    __slots__ = ("value", "nbytes", "last_used", "lock")
+
+    def __init__(self):
+        self.value = None
+        self.nbytes = 0
+        self.last_used = time.monotonic()
+        self.lock = threading.Lock()
+
+
+class KokoroRegistry:
+    """
+    Kokoro pipelines per (repo_id, lang_code), built on first use.
+
+    Model weights are loaded once per repo and shared by every language's
+    pipeline; only the language's G2P is per pipeline, so adding a language
+    costs its G2P, not another model. Entries record their size (weights are
+    counted exactly, G2P by the RSS growth while it was built) and last use.
+    When the total passes `max_bytes`, pipelines idle for at least
+    `min_idle` seconds are dropped least-recently-used first, then models no
+    pipeline uses any more. The default repo's model is never dropped: the
+    replica pool and the batcher run on it.
+    """
+
+    def __init__(self, max_bytes: int, *, min_idle: float = 600.0):
+        self.max_bytes = int(max_bytes)
+        self.min_idle = float(min_idle)
+        self._lock = threading.Lock()
+        self._models: dict = {}  # repo_id -> _Entry(KModel)
+        self._pipes: dict = {}  # (repo_id, lang_code) -> _Entry(KPipeline)
+        self.evictions = 0
+
+    def _entry(self, table: dict, key) -> _Entry:
+        with self._lock:
+            entry = table.get(key)
+            if entry is None:
+                entry = table[key] = _Entry()
+            entry.last_used = time.monotonic()
+            return entry
+
+    def model(self, repo_id: Optional[str] = None):
+        repo_id = repo_id or _default_kokoro_repo()
+        entry = self._entry(self._models, repo_id)
+        with entry.lock:
+            if entry.value is None:
+                logging.info(f"Loading Kokoro model {repo_id}...")
+                start = time.time()
+                entry.value = _load_kokoro_model(repo_id)
+                entry.nbytes = _module_nbytes(entry.value)
+                MODEL_LOAD_SECONDS.set(time.time() - start, model="kokoro")
+                logging.info(f"Kokoro loaded in {time.time() - start:.2f}s")
+                self._trim()
+            return entry.value
+
+    def pipeline(self, repo_id: Optional[str] = None, lang_code: str = "a"):
+        """The KPipeline for (repo_id, lang_code), sharing the repo's model."""
+        repo_id = repo_id or _default_kokoro_repo()
+        entry = self._entry(self._pipes, (repo_id, lang_code))
+        with entry.lock:
+            if entry.value is None:
+                from kokoro import KPipeline
+                model = self.model(repo_id)
+                before = _rss_bytes()
+                entry.value = KPipeline(lang_code=lang_code, repo_id=repo_id, model=model)
+                entry.nbytes = max(0, _rss_bytes() - before)
+                logging.info(f"Kokoro pipeline '{lang_code}' ready (~{entry.nbytes / 2**20:.0f} MB G2P)")
+            pipe = entry.value
+        with self._lock:
+            model_entry = self._models.get(repo_id)
+            if model_entry is not None:
+                model_entry.last_used = entry.last_used
+        self._trim()
+        return pipe
+
+    def g2p(self, lang_code: str = "a", repo_id: Optional[str] = None):
+        """Model-less view of the language's pipeline: G2P and segmentation only, no synthesis."""
+        view = copy.copy(self.pipeline(repo_id, lang_code))
+        view.model = False
+        return view
+
+    def loaded(self) -> bool:
+        with self._lock:
+            return any(e.value is not None for e in self._models.values())
+
+    def clear(self) -> None:
+        """Forget every model and pipeline (they are rebuilt on next use)."""
+        with self._lock:
+            self._models.clear()
+            self._pipes.clear()
+        _QUANT_APPLIED.pop("kokoro", None)
+
+    def _trim(self) -> None:
+        """Drop idle entries, least recently used first, until under budget."""
+        now = time.monotonic()
+        pinned = _default_kokoro_repo()
+        with self._lock:
+            total = sum(e.nbytes for e in (*self._models.values(), *self._pipes.values()))
+            if total <= self.max_bytes:
+                return
+            for key, entry in sorted(self._pipes.items(), key=lambda kv: kv[1].last_used):
+                if total <= self.max_bytes:
+                    break
+                if entry.value is not None and now - entry.last_used >= self.min_idle:
+                    del self._pipes[key]
+                    total -= entry.nbytes
+                    self.evictions += 1
+                    logging.info(f"Kokoro registry: evicted idle pipeline {key}")
+            in_use = {repo for repo, _lang in self._pipes}
+            for repo, entry in sorted(self._models.items(), key=lambda kv: kv[1].last_used):
+                if total <= self.max_bytes:
+                    break
+                if (entry.value is not None and repo != pinned and repo not in in_use
+                        and now - entry.last_used >= self.min_idle):
+                    del self._models[repo]
+                    total -= entry.nbytes
+                    self.evictions += 1
+                    logging.info(f"Kokoro registry: evicted idle model {repo}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = [*self._models.values(), *self._pipes.values()]
+            return {
+                "models": sorted(k for k, e in self._models.items() if e.value is not None),
+                "pipelines": sorted(f"{r}:{l}" for (r, l), e in self._pipes.items() if e.value is not None),
+                "bytes": sum(e.nbytes for e in entries),
+                "max_bytes": self.max_bytes,
+                "evictions": self.evictions,
+            }
+
+
+KOKORO_REGISTRY = KokoroRegistry(
+    int(float(os.environ.get("KOKORO_REGISTRY_MB", "4096")) * 1024 * 1024),
+    min_idle=float(os.environ.get("KOKORO_IDLE_SECONDS", "600")),
+)
+
+
 def get_kokoro(*, repo_id: Optional[str] = None, lang_code: str = "a"):
-    """Process-level, thread-safe singleton for Kokoro's KPipeline."""
-    global _KOKORO
-    with _KOKORO_LOCK:
-        if _KOKORO is None:
-            logging.info("Loading Kokoro model...")
-            start = time.time()
-            from kokoro import KPipeline
-            if repo_id is None:
-                repo_id = os.environ.get("KOKORO_REPO", "hexgrad/Kokoro-82M")
-
-            # Ensure model is on correct device
-            _KOKORO = KPipeline(lang_code=lang_code, repo_id=repo_id)
-
-            # Move to GPU if available and not GTX 970
-            if torch.cuda.is_available() and hasattr(_KOKORO, 'model'):
-                gpu_name = torch.cuda.get_device_name(0).lower()
-                if "970" not in gpu_name:  # Don't use GPU for GTX 970
-                    try:
-                        _KOKORO.model = _KOKORO.model.cuda()
-                        torch.cuda.empty_cache()  # Clear cache after loading
-                        logging.info("Kokoro moved to GPU")
-                    except Exception as e:
-                        logging.warning(f"Failed to move Kokoro to GPU: {e}")
-                else:
-                    logging.info("GTX 970 detected - keeping Kokoro on CPU for stability")
-
-            logging.info(f"Kokoro loaded in {time.time() - start:.2f}s")
-        return _KOKORO
+    """Thread-safe KPipeline for (repo_id, lang_code); see KokoroRegistry."""
+    return KOKORO_REGISTRY.pipeline(repo_id, lang_code)
+
+
+def get_kokoro_g2p(lang_code: str = "a"):
+    """Model-less KPipeline (G2P + segmentation only) for a language, sharing the registry's G2P."""
+    return KOKORO_REGISTRY.g2p(lang_code)
+
+
+def kokoro_loaded() -> bool:
+    return KOKORO_REGISTRY.loaded()
+
+_KOKORO_VOICES: dict = {}  # repo -> sorted voice names
+
+
+def kokoro_voices(repo_id: Optional[str] = None) -> list:
+    """
+    Voice names published in the Kokoro repo (voices/*.pt), read from the
+    Hub listing or, offline, the local snapshot - never by loading a model.
+    """
+    repo = repo_id or _default_kokoro_repo()
+    voices = _KOKORO_VOICES.get(repo)
+    if voices is not None:
+        return voices
+    try:
+        from huggingface_hub import list_repo_files
+        files = list_repo_files(repo)
+    except Exception:
+        try:
+            from huggingface_hub import snapshot_download
+            root = Path(snapshot_download(repo, allow_patterns=["voices/*"], local_files_only=True))
+            files = [p.relative_to(root).as_posix() for p in root.glob("voices/*.pt")]
+        except Exception as e:
+            logging.debug(f"Kokoro voice listing unavailable: {e}")
+            return ["af_heart"]  # not cached: try the Hub again next time
+    voices = sorted(Path(f).stem for f in files if f.startswith("voices/") and f.endswith(".pt")) or ["af_heart"]
+    _KOKORO_VOICES[repo] = voices
+    return voices
+
 
 # ---------- CosyVoice2 ----------
 
@@ -267,11 +515,17 @@ def _decide_cosy_policy() -> tuple[bool, bool]:
 
 
 def get_cosyvoice2(force_device: str | None = None, force_dtype: str | None = None):
-    """Optimized CosyVoice2 singleton with better GPU support"""
-    global _COSYVOICE2_SINGLETON
-    if _COSYVOICE2_SINGLETON is not None:
-        return _COSYVOICE2_SINGLETON
+    """Optimized CosyVoice2 singleton with better GPU support.
+    Loads through the model manager when it is not resident (e.g. after an idle unload)."""
+    cv = _COSYVOICE2_SINGLETON
+    if cv is not None:
+        MODELS.touch("cosyvoice2")
+        return cv
+    return MODELS.ensure("cosyvoice2", force_device, force_dtype)
+
 
+def _load_cosyvoice2(force_device: str | None = None, force_dtype: str | None = None):
+    global _COSYVOICE2_SINGLETON
     with _cosy_lock:
         if _COSYVOICE2_SINGLETON is not None:
             return _COSYVOICE2_SINGLETON
@@ -334,17 +588,86 @@ def get_cosyvoice2(force_device: str | None = None, force_dtype: str | None = No
             except TypeError:
                 cv = CosyVoice2(model_dir)
 
+        if _QUANTIZE["cosyvoice2"] == "int8":
+            if device == "cpu":
+                _quantize_cosyvoice2(cv)
+            else:
+                logging.warning(f"COSY_QUANTIZE=int8 is for CPU inference; keeping CosyVoice2 float on {device}")
+        _QUANT_APPLIED["cosyvoice2"] = "int8" if getattr(cv, "_int8_parts", None) else "none"
+
         _COSYVOICE2_SINGLETON = cv
 
         # Clear cache after loading
         if device == "cuda" and torch.cuda.is_available():
             torch.cuda.empty_cache()
 
+        MODEL_LOAD_SECONDS.set(time.time() - start, model="cosyvoice2")
         logging.info(
             f"CosyVoice2 loaded in {time.time() - start:.2f}s on {device}")
         return cv
 
 
+def _quantize_cosyvoice2(cv) -> None:
+    """Swap the LLM and flow modules for int8 dynamic-quantized copies (cached on disk)."""
+    inner = getattr(cv, "model", None)
+    done = []
+    for part in ("llm", "flow"):
+        module = getattr(inner, part, None)
+        if not isinstance(module, torch.nn.Module):
+            logging.warning(f"CosyVoice2 has no '{part}' module to quantize")
+            continue
+        path = quantized_cache_path("cosyvoice2", cosyvoice2_model_id(), part, "int8")
+        try:
+            setattr(inner, part, load_or_quantize(lambda m=module: m, path, label=f"CosyVoice2 {part}"))
+            done.append(part)
+        except Exception as e:  # e.g. TorchScript submodules from load_jit
+            logging.warning(f"CosyVoice2 {part}: int8 quantization failed ({e}); keeping float")
+    cv._int8_parts = done
+
+
+def _unload_cosyvoice2() -> None:
+    global _COSYVOICE2_SINGLETON
+    with _cosy_lock:
+        _COSYVOICE2_SINGLETON = None
+        _QUANT_APPLIED.pop("cosyvoice2", None)
+
+
+def _warm_cosyvoice2() -> None:
+    cv = get_cosyvoice2()
+    # Warm up with a dummy inference to initialize CUDA kernels
+    ref_dummy = torch.zeros(1, 16000, dtype=torch.float32)
+    try:
+        result = cv.inference_cross_lingual("test", ref_dummy, stream=False)
+        for _ in (result if inspect.isgenerator(result) else ()):
+            pass
+        logging.info("CosyVoice2 warmed up successfully")
+    except Exception as warmup_e:
+        logging.warning(f"CosyVoice2 warmup failed: {warmup_e}")
+
+
+MODELS.register(ModelSpec(
+    "cosyvoice2", load=_load_cosyvoice2, unload=_unload_cosyvoice2, warm=_warm_cosyvoice2,
+    is_loaded=lambda: _COSYVOICE2_SINGLETON is not None, info=lambda: quantization_info("cosyvoice2"),
+))
+
+
+def cosyvoice2_model_id() -> str:
+    """
+    Stable identity of the CosyVoice2 checkpoint (model dir + config stamp), used
+    to key on-disk audio caches. Does not load the model.
+    """
+    global _COSYVOICE2_ID
+    if _COSYVOICE2_ID is None:
+        try:
+            model_dir = _find_cosy_model_dir(_find_cosy_root())
+            st = (model_dir / "cosyvoice2.yaml").stat()
+            ident = f"{model_dir}|{st.st_size}|{int(st.st_mtime)}"
+        except (FileNotFoundError, StopIteration):
+            ident = "cosyvoice2|unknown"
+        _COSYVOICE2_ID = hashlib.sha1(ident.encode("utf-8")).hexdigest()[:16]
+    return _COSYVOICE2_ID
+
+
 def get_recommended_engine() -> str:
     """
     Automatically detect system capabilities and recommend the best TTS engine.
@@ -403,21 +726,17 @@ def get_recommended_engine() -> str:
         return "kokoro"
 
 
-def preload_models():
-    """Preload all models at startup - call this in your startup event"""
+def preload_models(skip=()):
+    """Preload all models at startup - call this in your startup event.
+    Engines in `skip` (served by worker processes) are not loaded here."""
     logging.info("Preloading TTS models...")
     start = time.time()
 
-    # Load models in parallel
-    threads = []
-
     def load_kokoro():
         try:
-            get_kokoro()
-            # Warm up with a dummy inference
-            from app.utils.synthesize import synthesize_kokoro_chunks
-            chunks = ["test"]
-            synthesize_kokoro_chunks(chunks, voice="af_heart", speed=1.0)
+            import app.services.kokoro_pool  # noqa: F401  (registers the "kokoro" model)
+            # build the replicas up front, not on the first request, and warm up with a dummy inference
+            MODELS.load("kokoro", warm=True)
         except Exception as e:
             logging.error(f"Failed to preload Kokoro: {e}")
 
@@ -441,29 +760,19 @@ def preload_models():
             if cosy_path not in sys.path:
                 sys.path.insert(0, cosy_path)
             
-            cv = get_cosyvoice2()
+            MODELS.load("cosyvoice2", warm=True)
             logging.info("CosyVoice2 loaded successfully in preload")
-            
-            # Warm up with a dummy inference to initialize CUDA kernels
-            ref_dummy = torch.zeros(1, 16000, dtype=torch.float32)
-            try:
-                # Quick warmup inference
-                cv.inference_cross_lingual("test", ref_dummy, stream=False)
-                logging.info("CosyVoice2 warmed up successfully")
-            except Exception as warmup_e:
-                logging.warning(f"CosyVoice2 warmup failed: {warmup_e}")
         except Exception as e:
             logging.warning(f"CosyVoice2 preload had issues: {e}")
             logging.info("CosyVoice2 will initialize on first request instead")
 
-    t1 = threading.Thread(target=load_kokoro)
-    t2 = threading.Thread(target=load_cosy)
-
-    t1.start()
-    t2.start()
-
-    t1.join()
-    t2.join()
+    # Load models in parallel
+    threads = [threading.Thread(target=fn) for engine, fn in (("kokoro", load_kokoro), ("cosyvoice2", load_cosy))
+               if engine not in skip]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
 
     logging.info(f"All models preloaded in {time.time() - start:.2f}s")
 
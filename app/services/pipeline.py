@@ -0,0 +1,284 @@
+# app/services/pipeline.py
+from __future__ import annotations
+import os
+import queue
+import tempfile
+import threading
+import weakref
+from contextlib import closing
+from typing import Callable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.services.metrics import STAGE_SECONDS
+from app.utils.align_subtitles import mfa_align_chunk_bounds, srt_from_bounds
+from app.utils.make_captions import wants_mfa
+from app.utils.synthesize import iter_synthesized_chunks
+from app.utils.zipstream import WavSpool, file_blocks, wav_header
+
+_STOP = object()
+
+
+def _unlink(path: str) -> None:
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+
+class _Stage:
+    """One consumer thread with a bounded inbox. The first error is kept and re-raised by join()."""
+
+    def __init__(self, name: str, fn: Callable, maxsize: int = 4):
+        self._fn = fn
+        self._q: "queue.Queue" = queue.Queue(maxsize)
+        self._error: Optional[BaseException] = None
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            item = self._q.get()
+            if item is _STOP:
+                return
+            if self._error is None:
+                try:
+                    self._fn(item)
+                except BaseException as e:
+                    self._error = e
+
+    def put(self, item) -> None:
+        if self._error is not None:
+            raise self._error
+        self._q.put(item)
+
+    def join(self, *, raise_error: bool = True) -> None:
+        if self._thread.is_alive():
+            self._q.put(_STOP)
+            self._thread.join()
+        if raise_error and self._error is not None:
+            raise self._error
+
+
+class _Captioner:
+    """
+    Caption stage. With MFA, chunks are aligned as they arrive: once at least
+    `prefix_chars` of text is waiting and synthesis is still running, that
+    prefix is aligned while the tail synthesizes; whatever is left when
+    synthesis ends is aligned in one last pass. Without MFA, each chunk's cue
+    simply spans its duration.
+    """
+
+    def __init__(self, chunks: Sequence[str], *, use_mfa: bool, prefix_chars: int,
+                 synth_done: threading.Event):
+        self.chunks = list(chunks)
+        self.use_mfa = use_mfa
+        self.prefix_chars = max(1, int(prefix_chars))
+        self.synth_done = synth_done
+        self.durations: List[float] = []
+        self.bounds: List[Tuple[float, float]] = []
+        self.passes = 0
+        self._pending: List[Tuple[str, np.ndarray]] = []
+        self._sr = 0
+
+    def add(self, item) -> None:
+        texts, wavs, sr = item
+        self._sr = sr
+        for txt, wav in zip(texts, wavs):
+            dur = len(wav) / sr
+            self.durations.append(dur)
+            if self.use_mfa:
+                self._pending.append((txt, wav))
+            else:
+                self.bounds.append((0.0, dur))
+        # Once synthesis is over, the rest is cheaper to align in one pass (MFA pays its startup per pass)
+        if (self._pending and not self.synth_done.is_set()
+                and sum(len(t) for t, _ in self._pending) >= self.prefix_chars):
+            self._align()
+
+    def _align(self) -> None:
+        texts = [t for t, _ in self._pending]
+        wavs = [w for _, w in self._pending]
+        self._pending = []
+        self.passes += 1
+        try:
+            num_cores = min(os.cpu_count() or 4, 8)
+            spans = mfa_align_chunk_bounds(texts, wavs, self._sr, num_jobs=num_cores, single_speaker=True)
+        except Exception as e:
+            print(f"MFA alignment failed ({e}), using duration-based timing for {len(texts)} chunks")
+            spans = [(0.0, len(w) / self._sr) for w in wavs]
+        self.bounds.extend(spans)
+
+    def finish(self) -> str:
+        if self._pending:
+            self._align()
+        with STAGE_SECONDS.time(stage="captions"):
+            return srt_from_bounds(self.chunks, self.durations, self.bounds)
+
+
+class RenderResult:
+    """
+    A render in progress or finished: chunk texts, the spooled audio.wav and,
+    once alignment is done, the captions. audio_blocks() follows the spool as
+    chunks land, so a response can start before synthesis ends. The spool
+    file is removed once the last reference (e.g. the last ZIP stream
+    reading it) goes away.
+    """
+
+    def __init__(self, chunks: List[str], wav_path: str):
+        self.chunks = chunks
+        self.wav_path = wav_path
+        self.sr = 0
+        self.nsamples = 0
+        self.srt = ""
+        self.error: Optional[BaseException] = None
+        self.audio_done = False
+        self.done = False
+        self._cond = threading.Condition()
+        weakref.finalize(self, _unlink, wav_path)
+
+    # ---------------- producer side ----------------
+
+    def _wrote(self, sr: int, nsamples: int) -> None:
+        with self._cond:
+            self.sr, self.nsamples = sr, nsamples
+            self._cond.notify_all()
+
+    def _audio_finished(self) -> None:
+        with self._cond:
+            self.audio_done = True
+            self._cond.notify_all()
+
+    def _finished(self, srt: str = "", error: Optional[BaseException] = None) -> None:
+        with self._cond:
+            self.srt, self.error = srt, error
+            self.audio_done = self.done = True
+            self._cond.notify_all()
+
+    # ---------------- reader side ----------------
+
+    @property
+    def wav_bytes(self) -> int:
+        return 44 + 2 * self.nsamples
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until audio and captions are done (re-raising a render error); False on timeout."""
+        with self._cond:
+            self._cond.wait_for(lambda: self.done, timeout)
+            if self.error is not None:
+                raise self.error
+            return self.done
+
+    def wait_started(self) -> None:
+        """Block until the first audio is on disk (or the render ended), re-raising a render error."""
+        with self._cond:
+            self._cond.wait_for(lambda: self.nsamples > 0 or self.audio_done)
+            if self.error is not None:
+                raise self.error
+
+    def audio_blocks(self, block_size: int = 1 << 20):
+        """
+        The WAV file's bytes. A finished render is read with its final header;
+        a live one gets the streaming header (unknown size, as on the live
+        endpoints) and then its samples as the writer appends them.
+        """
+        # A generator method, so a pending stream keeps the spool file alive.
+        self.wait_started()
+        with self._cond:
+            live = not self.audio_done
+        if not live:
+            yield from file_blocks(self.wav_path, block_size)
+            return
+        yield wav_header(self.sr, None)
+        pos = 44
+        with open(self.wav_path, "rb") as f:
+            while True:
+                with self._cond:
+                    self._cond.wait_for(lambda: self.wav_bytes > pos or self.audio_done)
+                    if self.error is not None:
+                        raise self.error
+                    end, finished = self.wav_bytes, self.audio_done
+                while pos < end:
+                    f.seek(pos)
+                    data = f.read(min(block_size, end - pos))
+                    if not data:
+                        raise OSError(f"render spool truncated at byte {pos} of {end}")
+                    pos += len(data)
+                    yield data
+                if finished:
+                    return
+
+
+def start_render(
+    engine: str,
+    chunks: List[str],
+    *,
+    align: bool = True,
+    spool_dir: Optional[str] = None,
+    synth_chunks: int = 4,
+    align_prefix_chars: int = 200,
+    **synth_kwargs,
+) -> RenderResult:
+    """
+    Start synthesize → (write WAV ‖ align captions) as a staged pipeline on
+    a background thread and return its RenderResult right away.
+
+    Synthesized chunks arrive in order, `synth_chunks` at a time (with the
+    Kokoro batcher, every chunk is queued up front and each group is handed
+    on as soon as its own audio is ready). Each group goes to a WAV writer
+    stage, which readers of the result follow, and to a caption stage that
+    aligns a prefix of at least `align_prefix_chars` while the tail is still
+    synthesizing (see _Captioner). Captions are ready last.
+    """
+    use_mfa = wants_mfa(chunks, align)
+    if align and not use_mfa:
+        print(f"Skipping MFA alignment for long text ({sum(len(c) for c in chunks)} chars). Using simple timing.")
+
+    fd, path = tempfile.mkstemp(prefix="render_", suffix=".wav", dir=spool_dir)
+    os.close(fd)
+    result = RenderResult(chunks, path)
+    synth_done = threading.Event()
+    captioner = _Captioner(chunks, use_mfa=use_mfa, prefix_chars=align_prefix_chars, synth_done=synth_done)
+    threading.Thread(
+        target=_run_pipeline, name="tts-render", daemon=True,
+        args=(result, captioner, synth_done, engine, chunks, synth_chunks, synth_kwargs),
+    ).start()
+    return result
+
+
+def _run_pipeline(result: RenderResult, captioner: _Captioner, synth_done: threading.Event,
+                  engine: str, chunks: List[str], synth_chunks: int, synth_kwargs: dict) -> None:
+    spool = WavSpool(result.wav_path)
+
+    def _write(item) -> None:
+        _texts, wavs, sr = item
+        for wav in wavs:
+            spool.append(wav, sr)
+        spool.flush()
+        result._wrote(spool.sr, spool.nsamples)
+
+    writer = _Stage("tts-wav-writer", _write)
+    captions = _Stage("tts-captions", captioner.add, maxsize=0)  # unbounded: an MFA pass must not stall the writer
+    stages = (writer, captions)
+    try:
+        try:
+            with closing(iter_synthesized_chunks(engine, chunks, group=synth_chunks, **synth_kwargs)) as synth:
+                for item in synth:  # closing cancels queued synthesis if a stage fails
+                    writer.put(item)
+                    captions.put(item)
+        finally:
+            synth_done.set()
+        writer.join()
+        spool.close()
+        result._wrote(spool.sr, spool.nsamples)
+        result._audio_finished()
+        captions.join()
+        srt = captioner.finish()
+    except BaseException as e:
+        for stage in stages:
+            stage.join(raise_error=False)
+        spool.close()
+        _unlink(result.wav_path)
+        result._finished(error=e)
+        return
+    result._finished(srt)
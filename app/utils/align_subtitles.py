@@ -4,7 +4,9 @@ import subprocess
 import tempfile
 import wave
 from pathlib import Path
-from typing import List, Sequence
+from typing import List, Sequence, Tuple
+
+from app.services.metrics import STAGE_SECONDS
 
 
 def _write_wav(path: str, audio, sr: int) -> None:
@@ -70,11 +72,10 @@ def _mfa_cmd(conda_env: str = "aligner") -> List[str]:
     return [str(mfa)]
 
 
-def mfa_align_chunks_to_srt(
+def mfa_align_chunk_bounds(
     chunks: Sequence[str],
     wavs: Sequence,
     sr: int,
-    out_srt: str,
     dict_name: str = "english_us_arpa",
     acoustic_name: str = "english_mfa",
     *,
@@ -82,19 +83,26 @@ def mfa_align_chunks_to_srt(
     single_speaker: bool = True,
     conda_env: str = "aligner",
     verbose: bool = False,
-) -> None:
+) -> List[Tuple[float, float]]:
+    """Speech (start, end) in seconds within each chunk's own audio."""
     assert len(chunks) == len(wavs), "chunks and wavs length mismatch"
+    with STAGE_SECONDS.time(stage="mfa_align"):
+        return _mfa_align_chunk_bounds(
+            chunks, wavs, sr, dict_name, acoustic_name,
+            num_jobs=num_jobs, single_speaker=single_speaker, conda_env=conda_env, verbose=verbose)
+
+
+def _mfa_align_chunk_bounds(chunks, wavs, sr, dict_name, acoustic_name, *,
+                            num_jobs, single_speaker, conda_env, verbose) -> List[Tuple[float, float]]:
 
     tmp = Path(tempfile.mkdtemp(prefix="mfa_"))
     corpus = tmp / "corpus"
     aligned = tmp / "aligned"
     corpus.mkdir(parents=True, exist_ok=True)
 
-    durations = []
     for i, (txt, wav) in enumerate(zip(chunks, wavs), 1):
         _write_wav(str(corpus / f"utt_{i:04}.wav"), wav, sr)
         (corpus / f"utt_{i:04}.lab").write_text(txt, encoding="utf-8")
-        durations.append(len(wav) / sr)
 
     cmd = _mfa_cmd(conda_env) + [
         "align",
@@ -134,16 +142,38 @@ def mfa_align_chunks_to_srt(
             return float(words[0].minTime), float(words[-1].maxTime)
         return float(tier.minTime), float(tier.maxTime)
 
-    entries, offset = [], 0.0
-    for i, chunk in enumerate(chunks, 1):
-        st, et = bounds(aligned / f"utt_{i:04}.TextGrid")
-        entries.append((offset + st, offset + et, chunk.strip()))
-        offset += durations[i - 1]
+    try:
+        return [bounds(aligned / f"utt_{i:04}.TextGrid") for i in range(1, len(chunks) + 1)]
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def srt_from_bounds(chunks: Sequence[str], durations: Sequence[float], bounds: Sequence[Tuple[float, float]]) -> str:
+    """SRT from per-chunk durations (seconds) and per-chunk speech bounds relative to each chunk."""
+    lines, offset = [], 0.0
+    for idx, (chunk, dur, (st, et)) in enumerate(zip(chunks, durations, bounds), 1):
+        lines.append(f"{idx}\n{_fmt_srt(offset + st)} --> {_fmt_srt(offset + et)}\n{chunk.strip()}\n\n")
+        offset += dur
+    return "".join(lines)
 
+
+def mfa_align_chunks_to_srt(
+    chunks: Sequence[str],
+    wavs: Sequence,
+    sr: int,
+    out_srt: str,
+    dict_name: str = "english_us_arpa",
+    acoustic_name: str = "english_mfa",
+    *,
+    num_jobs: int = 4,
+    single_speaker: bool = True,
+    conda_env: str = "aligner",
+    verbose: bool = False,
+) -> None:
+    spans = mfa_align_chunk_bounds(
+        chunks, wavs, sr, dict_name, acoustic_name,
+        num_jobs=num_jobs, single_speaker=single_speaker, conda_env=conda_env, verbose=verbose)
     out_path = Path(out_srt)
     out_path.parent.mkdir(parents=True, exist_ok=True)
     with open(out_path, "w", encoding="utf-8") as f:
-        for idx, (st, et, txt) in enumerate(entries, 1):
-            f.write(f"{idx}\n{_fmt_srt(st)} --> {_fmt_srt(et)}\n{txt}\n\n")
-
-    shutil.rmtree(tmp, ignore_errors=True)
+        f.write(srt_from_bounds(chunks, [len(w) / sr for w in wavs], spans))
@@ -0,0 +1,108 @@
+# app/utils/chunk_cache.py
+from __future__ import annotations
+import os
+import tempfile
+import threading
+import wave
+from typing import Optional
+
+import numpy as np
+
+
+class DiskChunkCache:
+    """
+    Per-chunk audio cache stored as 16-bit mono WAV files under `root`.
+
+    Files are sharded by the first two hex chars of the key, written to a temp
+    file and moved into place with os.replace() so concurrent writers (threads
+    or uvicorn workers) never expose a partial WAV. When the directory grows
+    past `max_bytes`, least-recently-used files (by mtime, refreshed on hit)
+    are removed until it drops to `low_water` of the cap.
+    """
+
+    def __init__(self, root: str, max_bytes: int, *, low_water: float = 0.9):
+        self.root = root
+        self.max_bytes = int(max_bytes)
+        self.low_water = float(low_water)
+        self._lock = threading.Lock()
+        self._size: Optional[int] = None  # lazily scanned
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], f"{key}.wav")
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        """Return cached float32 audio for `key`, or None on miss/corrupt entry."""
+        p = self.path(key)
+        try:
+            with wave.open(p, "rb") as w:
+                frames = w.readframes(w.getnframes())
+            os.utime(p, None)  # LRU bookkeeping
+        except (FileNotFoundError, EOFError, wave.Error):
+            return None
+        except OSError:
+            return None
+        return np.frombuffer(frames, dtype="<i2").astype(np.float32) / 32767.0
+
+    def put(self, key: str, audio: np.ndarray, sr: int) -> None:
+        p = self.path(key)
+        shard = os.path.dirname(p)
+        os.makedirs(shard, exist_ok=True)
+        a16 = (np.clip(audio, -1, 1) * 32767).astype("<i2")
+        fd, tmp = tempfile.mkstemp(dir=shard, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f, wave.open(f, "wb") as w:
+                w.setnchannels(1)
+                w.setsampwidth(2)
+                w.setframerate(sr)
+                w.writeframes(a16.tobytes())
+            os.replace(tmp, p)
+        except Exception:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+
+        with self._lock:
+            if self._size is None:
+                self._size = self._scan_size()
+            else:
+                self._size += 44 + a16.nbytes
+            over = self._size > self.max_bytes
+        if over:
+            self.evict()
+
+    def _iter_files(self):
+        for shard in os.scandir(self.root):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith(".wav"):
+                    try:
+                        st = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    yield entry.path, st.st_size, st.st_mtime
+
+    def _scan_size(self) -> int:
+        return sum(size for _, size, _ in self._iter_files())
+
+    def evict(self) -> int:
+        """Delete least-recently-used files until under the low-water mark. Returns files removed."""
+        with self._lock:
+            files = sorted(self._iter_files(), key=lambda f: f[2])
+            total = sum(size for _, size, _ in files)
+            target = int(self.max_bytes * self.low_water)
+            removed = 0
+            for path, size, _ in files:
+                if total <= target:
+                    break
+                try:
+                    os.unlink(path)
+                    removed += 1
+                except FileNotFoundError:
+                    pass  # another worker got there first
+                total -= size
+            self._size = total
+            return removed
@@ -0,0 +1,287 @@
+# app/utils/chunk_store.py
+from __future__ import annotations
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+try:
+    import fcntl  # POSIX
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+    import msvcrt
+
+
+@contextmanager
+def _file_lock(path: str):
+    """Exclusive cross-process lock on `path` (flock on POSIX, msvcrt on Windows)."""
+    with open(path, "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    time.sleep(0.05)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class PackedChunkStore:
+    """
+    Append-only pack-file store for 16-bit mono chunk audio.
+
+    Layout under `root`:
+        index.sqlite      key -> (pack, offset, nsamples, sr, last_used)
+        pack-000001.bin   raw little-endian int16 samples, appended back to back
+        .lock             serializes writers/compaction across uvicorn workers
+
+    Reads take no lock: the index is SQLite in WAL mode and pack files are
+    never modified in place, so a lookup always points at bytes that were
+    fsync'ed before the row was committed. Audio is returned as int16 views
+    into an np.memmap of the pack (no read() copy). Compaction rewrites live
+    entries into a fresh pack and unlinks the old one; readers that raced it
+    simply see a miss.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        max_bytes: int,
+        *,
+        pack_bytes: int = 256 * 1024 * 1024,
+        low_water: float = 0.8,
+        max_open_maps: int = 16,
+    ):
+        self.root = root
+        self.max_bytes = int(max_bytes)
+        self.pack_bytes = int(pack_bytes)
+        self.low_water = float(low_water)
+        self.max_open_maps = int(max_open_maps)
+        os.makedirs(root, exist_ok=True)
+        self._lock_path = os.path.join(root, ".lock")
+        self._local = threading.local()
+        self._maps: "OrderedDict[int, np.memmap]" = OrderedDict()
+        self._maps_lock = threading.Lock()
+        with _file_lock(self._lock_path):
+            db = self._db()
+            with db:
+                db.execute(
+                    "CREATE TABLE IF NOT EXISTS chunks ("
+                    " key TEXT PRIMARY KEY, pack INTEGER NOT NULL, offset INTEGER NOT NULL,"
+                    " nsamples INTEGER NOT NULL, sr INTEGER NOT NULL, last_used REAL NOT NULL)")
+                db.execute("CREATE INDEX IF NOT EXISTS chunks_lru ON chunks(last_used)")
+                db.execute("CREATE TABLE IF NOT EXISTS meta (k TEXT PRIMARY KEY, v INTEGER NOT NULL)")
+                db.execute("INSERT OR IGNORE INTO meta VALUES ('next_pack', 1)")
+                db.execute("INSERT OR IGNORE INTO meta VALUES ('live_bytes', 0)")
+
+    # ---------------- internals ----------------
+
+    def _db(self) -> sqlite3.Connection:
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(os.path.join(self.root, "index.sqlite"), timeout=30.0)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def _pack_path(self, pack: int) -> str:
+        return os.path.join(self.root, f"pack-{pack:06d}.bin")
+
+    def _meta(self, db: sqlite3.Connection, k: str) -> int:
+        return int(db.execute("SELECT v FROM meta WHERE k=?", (k,)).fetchone()[0])
+
+    def _map(self, pack: int, end: int) -> Optional[np.memmap]:
+        """Return a memmap of `pack` covering at least `end` samples (remapping if it grew)."""
+        with self._maps_lock:
+            mm = self._maps.get(pack)
+            if mm is not None and mm.shape[0] >= end:
+                self._maps.move_to_end(pack)
+                return mm
+            try:
+                mm = np.memmap(self._pack_path(pack), dtype="<i2", mode="r")
+            except (FileNotFoundError, ValueError):
+                self._maps.pop(pack, None)
+                return None
+            self._maps[pack] = mm
+            self._maps.move_to_end(pack)
+            while len(self._maps) > self.max_open_maps:
+                self._maps.popitem(last=False)
+            return mm if mm.shape[0] >= end else None
+
+    # ---------------- public API ----------------
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, Tuple[np.ndarray, int]]:
+        """Batched lookup. Returns {key: (int16 memmap view, sr)} for the keys present."""
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return {}
+        db = self._db()
+        rows = []
+        for i in range(0, len(keys), 500):  # stay under SQLITE_MAX_VARIABLE_NUMBER
+            part = keys[i:i + 500]
+            q = ",".join("?" * len(part))
+            rows += db.execute(
+                f"SELECT key, pack, offset, nsamples, sr FROM chunks WHERE key IN ({q})", part).fetchall()
+
+        out: Dict[str, Tuple[np.ndarray, int]] = {}
+        for key, pack, offset, n, sr in rows:
+            start = offset // 2
+            mm = self._map(pack, start + n)
+            if mm is not None:
+                out[key] = (mm[start:start + n], sr)
+
+        if out:
+            now = time.time()
+            hit = list(out)
+            try:
+                with db:
+                    for i in range(0, len(hit), 500):
+                        part = hit[i:i + 500]
+                        q = ",".join("?" * len(part))
+                        db.execute(f"UPDATE chunks SET last_used=? WHERE key IN ({q})", [now, *part])
+            except sqlite3.OperationalError:
+                pass  # LRU bookkeeping is best-effort under contention
+        return out
+
+    def get(self, key: str) -> Optional[Tuple[np.ndarray, int]]:
+        return self.get_many([key]).get(key)
+
+    def put_many(self, items: Iterable[Tuple[str, np.ndarray, int]]) -> int:
+        """Append float32 (or int16) chunks to the active pack. Returns number of new entries."""
+        items = list(items)
+        if not items:
+            return 0
+        with _file_lock(self._lock_path):
+            db = self._db()
+            known = set()
+            keys = [k for k, _, _ in items]
+            for i in range(0, len(keys), 500):
+                part = keys[i:i + 500]
+                q = ",".join("?" * len(part))
+                known.update(r[0] for r in db.execute(f"SELECT key FROM chunks WHERE key IN ({q})", part))
+
+            pack = self._meta(db, "next_pack") - 1
+            if pack < 1 or not os.path.exists(self._pack_path(pack)) \
+                    or os.path.getsize(self._pack_path(pack)) >= self.pack_bytes:
+                pack += 1
+                with db:
+                    db.execute("UPDATE meta SET v=? WHERE k='next_pack'", (pack + 1,))
+
+            rows = []
+            with open(self._pack_path(pack), "ab") as f:
+                f.seek(0, os.SEEK_END)
+                for key, audio, sr in items:
+                    if key in known:
+                        continue
+                    known.add(key)
+                    if audio.dtype != np.int16:
+                        audio = (np.clip(audio, -1, 1) * 32767).astype("<i2")
+                    offset = f.tell()
+                    f.write(np.ascontiguousarray(audio, dtype="<i2").tobytes())
+                    rows.append((key, pack, offset, int(audio.size), int(sr), time.time()))
+                f.flush()
+                os.fsync(f.fileno())
+
+            if rows:
+                with db:
+                    db.executemany("INSERT OR IGNORE INTO chunks VALUES (?,?,?,?,?,?)", rows)
+                    db.execute("UPDATE meta SET v=v+? WHERE k='live_bytes'",
+                               (sum(r[3] * 2 for r in rows),))
+            over = self._meta(db, "live_bytes") > self.max_bytes
+        if over:
+            self.compact()
+        return len(rows)
+
+    def compact(self, *, sparse_ratio: float = 0.5) -> dict:
+        """
+        Evict least-recently-used entries down to the low-water mark, then rewrite
+        packs whose live data fell below `sparse_ratio` of their file size.
+        """
+        evicted = rewritten = 0
+        with _file_lock(self._lock_path):
+            db = self._db()
+            live = self._meta(db, "live_bytes")
+            target = int(self.max_bytes * self.low_water)
+            if live > target:
+                drop: List[str] = []
+                freed = 0
+                for key, n in db.execute("SELECT key, nsamples FROM chunks ORDER BY last_used ASC"):
+                    if live - freed <= target:
+                        break
+                    drop.append(key)
+                    freed += n * 2
+                with db:
+                    for i in range(0, len(drop), 500):
+                        part = drop[i:i + 500]
+                        q = ",".join("?" * len(part))
+                        db.execute(f"DELETE FROM chunks WHERE key IN ({q})", part)
+                    db.execute("UPDATE meta SET v=v-? WHERE k='live_bytes'", (freed,))
+                evicted = len(drop)
+
+            live_by_pack = dict(db.execute("SELECT pack, SUM(nsamples) * 2 FROM chunks GROUP BY pack"))
+            sparse = []
+            for name in os.listdir(self.root):
+                if not (name.startswith("pack-") and name.endswith(".bin")):
+                    continue
+                pack = int(name[5:-4])
+                size = os.path.getsize(os.path.join(self.root, name))
+                if live_by_pack.get(pack, 0) < size * sparse_ratio:
+                    sparse.append(pack)
+
+            if sparse:
+                new_pack = self._meta(db, "next_pack")
+                moved = []
+                with open(self._pack_path(new_pack), "ab") as out:
+                    for pack in sparse:
+                        entries = db.execute(
+                            "SELECT key, offset, nsamples FROM chunks WHERE pack=? ORDER BY offset",
+                            (pack,)).fetchall()
+                        if not entries:
+                            continue
+                        src = np.memmap(self._pack_path(pack), dtype="<i2", mode="r")
+                        for key, offset, n in entries:
+                            moved.append((new_pack, out.tell(), key))
+                            out.write(src[offset // 2: offset // 2 + n].tobytes())
+                        del src
+                    out.flush()
+                    os.fsync(out.fileno())
+                with db:
+                    db.execute("UPDATE meta SET v=? WHERE k='next_pack'", (new_pack + 1,))
+                    db.executemany("UPDATE chunks SET pack=?, offset=? WHERE key=?", moved)
+                with self._maps_lock:
+                    for pack in sparse:
+                        self._maps.pop(pack, None)
+                for pack in sparse:
+                    try:
+                        os.unlink(self._pack_path(pack))
+                    except OSError:
+                        pass  # still mapped elsewhere (Windows); retried on next compaction
+                rewritten = len(sparse)
+        return {"evicted": evicted, "packs_rewritten": rewritten}
+
+    def stats(self) -> dict:
+        db = self._db()
+        count = db.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+        packs = [n for n in os.listdir(self.root) if n.startswith("pack-") and n.endswith(".bin")]
+        return {
+            "entries": int(count),
+            "live_bytes": self._meta(db, "live_bytes"),
+            "max_bytes": self.max_bytes,
+            "packs": len(packs),
+        }
@@ -1,14 +1,23 @@
-from typing import List
+import bisect
+import re
+from typing import List, Optional
 
+# Clause/phrase ends: cut right after the punctuation (never inside a word)
+_CLAUSE_END = re.compile(r"[,;:)—–](?=\s)")
 
-def split_sentences(text: str, max_chars: int = 240) -> List[str]:
+
+def _sentences(text: str) -> List[str]:
     import nltk
     try:
         nltk.data.find("tokenizers/punkt")
     except LookupError:
         nltk.download("punkt", quiet=True)
         nltk.download("punkt_tab", quiet=True)
-    sents = [s.strip() for s in nltk.sent_tokenize(text) if s.strip()]
+    return [s.strip() for s in nltk.sent_tokenize(text) if s.strip()]
+
+
+def split_sentences(text: str, max_chars: int = 240) -> List[str]:
+    sents = _sentences(text)
 
     chunks, buf = [], ""
     for s in sents:
@@ -22,3 +31,155 @@ def split_sentences(text: str, max_chars: int = 240) -> List[str]:
     if buf:
         chunks.append(buf)
     return chunks
+
+
+def _last_in(bounds: List[int], lo: int, hi: int) -> Optional[int]:
+    i = bisect.bisect_right(bounds, hi) - 1
+    return bounds[i] if i >= 0 and bounds[i] > lo else None
+
+
+def _first_in(bounds: List[int], lo: int, hi: int) -> Optional[int]:
+    i = bisect.bisect_right(bounds, lo)
+    return bounds[i] if i < len(bounds) and bounds[i] <= hi else None
+
+
+def split_for_streaming(
+    text: str,
+    max_chars: int = 240,
+    *,
+    first_chars: int = 48,
+    min_first_chars: int = 12,
+    growth: float = 2.0,
+    rtf: Optional[float] = None,
+    safety: float = 1.5,
+) -> List[str]:
+    """
+    Chunking for live streams: a tiny first chunk, then geometrically larger ones.
+
+    The first chunk ends at the earliest sentence or clause boundary after
+    `min_first_chars` (at most `first_chars`), so time-to-first-audio is the
+    cost of a short phrase. Chunk k may then grow to first_len * growth**k,
+    capped at `max_chars`. When the engine's realtime factor is known, chunk
+    k is also capped so it finishes before the audio already queued runs out:
+    synthesizing sequentially, no underrun requires
+        len_k <= len_0 + chars_before_k * (1 - r) / r,   r = rtf * safety
+    Later chunks prefer sentence ends, then clause ends, then word breaks.
+    """
+    sents = _sentences(text)
+    if not sents:
+        return []
+    joined = " ".join(sents)
+    n = len(joined)
+
+    sent_ends, pos = [], 0
+    for s in sents:
+        pos += len(s)
+        sent_ends.append(pos)
+        pos += 1
+    clause_ends = sorted(set(m.end() for m in _CLAUSE_END.finditer(joined)) | set(sent_ends))
+    word_ends = [m.start() for m in re.finditer(r"\s", joined)] + [n]
+
+    r = rtf * safety if rtf else None
+    chunks: List[str] = []
+    start = 0
+    first_len = 0
+    done = 0  # characters already emitted
+    while start < n:
+        if not chunks:
+            lo, hi = start + min_first_chars, start + max(first_chars, min_first_chars)
+            end = _first_in(clause_ends, lo - 1, hi) or _last_in(word_ends, start, hi)
+        else:
+            target = min(max_chars, first_len * growth ** len(chunks))
+            if r is not None and r < 1.0:
+                target = min(target, first_len + done * (1.0 - r) / r)
+            target = int(max(target, min(first_len, max_chars)))
+            hi = start + target
+            if hi >= n:
+                end = n
+            else:
+                lo = start + target // 2
+                end = (_last_in(sent_ends, lo, hi) or _last_in(clause_ends, lo, hi)
+                       or _last_in(word_ends, start, hi))
+        if end is None:  # one very long word: take it whole
+            end = _first_in(word_ends, start, n) or n
+        piece = joined[start:end].strip()
+        if piece:
+            chunks.append(piece)
+            if len(chunks) == 1:
+                first_len = max(len(piece), 1)
+            done += len(piece)
+        start = end
+        while start < n and joined[start].isspace():
+            start += 1
+    return chunks
+
+
+_SENT_END = re.compile(r"[.!?…]+[\"'”’)\]]*(?=\s)")
+_ABBREVIATIONS = {"mr.", "mrs.", "ms.", "dr.", "prof.", "sr.", "jr.", "st.", "vs.", "etc.", "e.g.", "i.e.", "no.", "fig."}
+
+
+def _is_abbreviation(text: str, end: int) -> bool:
+    word = text[:end].rsplit(None, 1)[-1].strip("\"'“‘(")
+    if word.lower() in _ABBREVIATIONS:
+        return True
+    if len(word) == 2 and word[0].isupper() and word[1] == ".":  # initials: "J. Smith", not "Plan B. then"
+        rest = text[end:].split(None, 1)
+        return not rest or rest[0][0].isupper()  # next word not here yet: wait for it
+    return False
+
+
+class IncrementalSegmenter:
+    """
+    Sentence/clause segmentation for text that arrives in pieces (LLM tokens).
+
+    A boundary is trusted only once the whitespace after it has arrived, so a
+    delta split like "3." + "14" is never cut. Sentence ends always cut; clause
+    ends (, ; : —) cut once the segment is long enough (`first_min_chars` for
+    the first segment, so audio starts early, `min_clause_chars` after that);
+    anything longer than `max_chars` is cut at a word break.
+    """
+
+    def __init__(self, max_chars: int = 240, *, min_clause_chars: int = 48, first_min_chars: int = 12):
+        self.max_chars = max_chars
+        self.min_clause_chars = min_clause_chars
+        self.first_min_chars = first_min_chars
+        self.buf = ""
+        self.emitted = 0
+
+    def feed(self, delta: str) -> List[str]:
+        """Add text; return the segments it completed (possibly none)."""
+        self.buf += delta
+        out = []
+        while True:
+            cut = self._find_cut()
+            if cut is None:
+                return out
+            seg = " ".join(self.buf[:cut].split())
+            self.buf = self.buf[cut:].lstrip()
+            if seg:
+                out.append(seg)
+                self.emitted += 1
+
+    def flush(self) -> List[str]:
+        """Return whatever partial text is buffered as a final segment."""
+        seg = " ".join(self.buf.split())
+        self.buf = ""
+        if not seg:
+            return []
+        self.emitted += 1
+        return [seg]
+
+    def _find_cut(self) -> Optional[int]:
+        buf = self.buf
+        limit = min(len(buf), self.max_chars)
+        for m in _SENT_END.finditer(buf, 0, limit + 1):
+            if not _is_abbreviation(buf, m.end()):
+                return m.end()
+        min_clause = self.first_min_chars if self.emitted == 0 else self.min_clause_chars
+        for m in _CLAUSE_END.finditer(buf, 0, limit + 1):
+            if m.end() >= min_clause:
+                return m.end()
+        if len(buf) > self.max_chars:
+            space = buf.rfind(" ", 0, self.max_chars + 1)
+            return space if space > 0 else self.max_chars
+        return None
@@ -0,0 +1,190 @@
+# app/utils/codecs.py
+"""
+Streaming encoders for the live endpoints. Each encoder takes PCM16 (s16le)
+blocks at the engine rate and returns encoded bytes as they become available;
+its state persists across blocks, so the concatenated output is one valid
+continuous stream (one FLAC/Ogg header, one μ-law/A-law byte per 8 kHz sample).
+"""
+from __future__ import annotations
+from typing import Optional
+
+import numpy as np
+
+from app.utils.resample import get_resampler
+
+# fmt parameter value -> encoder kind
+STREAM_FORMATS = {
+    "flac": "flac",
+    "ogg": "vorbis",
+    "vorbis": "vorbis",
+    "mulaw": "ulaw",
+    "ulaw": "ulaw",
+    "alaw": "alaw",
+}
+
+_ULAW_SEG_END = np.array([0x3F, 0x7F, 0xFF, 0x1FF, 0x3FF, 0x7FF, 0xFFF, 0x1FFF], dtype=np.int32)
+_ALAW_SEG_END = np.array([0x1F, 0x3F, 0x7F, 0xFF, 0x1FF, 0x3FF, 0x7FF, 0xFFF], dtype=np.int32)
+
+
+def _ulaw_table() -> np.ndarray:
+    """G.711 μ-law byte for every int16 value (index = sample + 32768)."""
+    pcm = np.arange(-32768, 32768, dtype=np.int32) >> 2
+    mask = np.where(pcm < 0, 0x7F, 0xFF)
+    pcm = np.minimum(np.abs(pcm), 8159) + (0x84 >> 2)
+    seg = np.searchsorted(_ULAW_SEG_END, pcm)
+    val = (seg << 4) | ((pcm >> (np.minimum(seg, 7) + 1)) & 0x0F)
+    val = np.where(seg >= 8, 0x7F, val)
+    return (val ^ mask).astype(np.uint8)
+
+
+def _alaw_table() -> np.ndarray:
+    """G.711 A-law byte for every int16 value (index = sample + 32768)."""
+    pcm = np.arange(-32768, 32768, dtype=np.int32) >> 3
+    mask = np.where(pcm >= 0, 0xD5, 0x55)
+    pcm = np.where(pcm >= 0, pcm, -pcm - 1)
+    seg = np.searchsorted(_ALAW_SEG_END, pcm)
+    shift = np.where(seg < 2, 1, np.minimum(seg, 7))
+    val = (seg << 4) | ((pcm >> shift) & 0x0F)
+    val = np.where(seg >= 8, 0x7F, val)
+    return (val ^ mask).astype(np.uint8)
+
+
+_G711_TABLES = {}
+
+
+def g711_encode(pcm: np.ndarray, law: str = "ulaw") -> bytes:
+    """int16 samples -> G.711 bytes (table lookup, built once per law)."""
+    table = _G711_TABLES.get(law)
+    if table is None:
+        table = _G711_TABLES[law] = _ulaw_table() if law == "ulaw" else _alaw_table()
+    return table[pcm.astype(np.int32) + 32768].tobytes()
+
+
+class StreamEncoder:
+    """Base: PCM16 blocks in, encoded bytes out. Odd trailing bytes are carried to the next block."""
+
+    media_type = "application/octet-stream"
+    offload = False  # True when encode() is heavy enough to run off the event loop
+
+    def __init__(self, sr: int):
+        self.sr_in = int(sr)
+        self.sample_rate = int(sr)
+        self._carry = b""
+
+    def _samples(self, data) -> np.ndarray:
+        data = self._carry + bytes(data) if self._carry else data
+        even = len(data) & ~1
+        self._carry = bytes(data[even:])
+        return np.frombuffer(data, dtype="<i2", count=even // 2)
+
+    def encode(self, data) -> bytes:
+        raise NotImplementedError
+
+    def finish(self) -> bytes:
+        return b""
+
+
+class G711Encoder(StreamEncoder):
+    """μ-law / A-law at 8 kHz for telephony; the rate conversion happens here, once, statefully."""
+
+    def __init__(self, sr: int, law: str = "ulaw", sr_out: int = 8000):
+        super().__init__(sr)
+        self.law = law
+        self.sample_rate = sr_out
+        self.media_type = f"audio/{'PCMU' if law == 'ulaw' else 'PCMA'};rate={sr_out}"
+        self._rate = get_resampler(self.sr_in, sr_out).stream()
+
+    def _emit(self, x: np.ndarray) -> bytes:
+        return g711_encode(np.clip(np.rint(x), -32768, 32767), self.law)
+
+    def encode(self, data) -> bytes:
+        return self._emit(self._rate.process(self._samples(data).astype(np.float32)))
+
+    def finish(self) -> bytes:
+        return self._emit(self._rate.finish())
+
+
+class _ForwardSink:
+    """
+    File object for libsndfile that hands bytes out as they are written.
+    libsndfile may seek back at close to patch headers (e.g. FLAC STREAMINFO);
+    rewrites of bytes already sent are dropped, which leaves the "unknown"
+    length/MD5 values that are valid for a stream.
+    """
+
+    def __init__(self):
+        self._pending = bytearray()
+        self._sent = 0  # bytes handed out
+        self._pos = 0
+        self._size = 0
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        start, end = self._pos, self._pos + len(data)
+        lo = max(start, self._sent)
+        if end > lo:
+            a, b = lo - self._sent, end - self._sent
+            if b > len(self._pending):
+                self._pending.extend(b"\x00" * (b - len(self._pending)))
+            self._pending[a:b] = data[lo - start:]
+        self._pos = end
+        self._size = max(self._size, end)
+        return len(data)
+
+    def read(self, n: int = -1) -> bytes:
+        return b""
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        base = {0: 0, 1: self._pos, 2: self._size}[whence]
+        self._pos = base + offset
+        return self._pos
+
+    def tell(self) -> int:
+        return self._pos
+
+    def flush(self) -> None:
+        pass
+
+    def take(self, final: bool = False) -> bytes:
+        """Bytes that can no longer change (all of them when `final`)."""
+        n = len(self._pending) if final else max(0, min(self._pos, self._size) - self._sent)
+        out = bytes(self._pending[:n])
+        del self._pending[:n]
+        self._sent += n
+        return out
+
+
+class SoundFileEncoder(StreamEncoder):
+    """FLAC or Ogg/Vorbis via soundfile (libsndfile), written incrementally to a forward-only sink."""
+
+    offload = True
+
+    def __init__(self, sr: int, kind: str = "flac"):
+        super().__init__(sr)
+        import soundfile as sf
+
+        self.media_type = "audio/flac" if kind == "flac" else "audio/ogg"
+        self._sink = _ForwardSink()
+        fmt, subtype = ("FLAC", "PCM_16") if kind == "flac" else ("OGG", "VORBIS")
+        self._sf = sf.SoundFile(self._sink, mode="w", samplerate=self.sr_in, channels=1,
+                                format=fmt, subtype=subtype)
+
+    def encode(self, data) -> bytes:
+        pcm = self._samples(data)
+        if pcm.size:
+            self._sf.write(pcm)
+        return self._sink.take()
+
+    def finish(self) -> bytes:
+        self._sf.close()
+        return self._sink.take(final=True)
+
+
+def make_stream_encoder(fmt: str, sr: int) -> Optional[StreamEncoder]:
+    """Encoder for an encoded `fmt`, or None for the raw formats (wav/pcm)."""
+    kind = STREAM_FORMATS.get((fmt or "").lower())
+    if kind is None:
+        return None
+    if kind in ("ulaw", "alaw"):
+        return G711Encoder(sr, law=kind)
+    return SoundFileEncoder(sr, kind=kind)
@@ -0,0 +1,157 @@
+# app/utils/http_range.py
+"""
+Byte-range serving for finished audio files: Content-Length, Accept-Ranges,
+single-range 206 responses and 416 for ranges past the end. The body goes out
+through the ASGI zero-copy extension (sendfile) when the server offers it;
+otherwise it is read in blocks with pread in the threadpool, so only the
+requested bytes are ever touched.
+"""
+from __future__ import annotations
+import os
+import re
+from email.utils import formatdate
+from typing import Mapping, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import Response
+
+_RANGE = re.compile(r"^\s*bytes\s*=\s*(\d*)\s*-\s*(\d*)\s*$", re.IGNORECASE)
+
+
+class RangeNotSatisfiable(ValueError):
+    pass
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    (first, last) byte positions, inclusive, for a single-range `Range` header,
+    or None to send the whole representation. Multi-range and malformed headers
+    are ignored (a full 200 is always a valid answer); a range starting past
+    the end raises RangeNotSatisfiable.
+    """
+    if not header:
+        return None
+    m = _RANGE.match(header)
+    if m is None:
+        return None
+    first, last = m.groups()
+    if not first:
+        if not last:
+            return None
+        n = int(last)  # suffix range: the final n bytes
+        if n == 0 or size == 0:
+            raise RangeNotSatisfiable(header)
+        return max(0, size - n), size - 1
+    first = int(first)
+    if first >= size:
+        raise RangeNotSatisfiable(header)
+    last = min(int(last), size - 1) if last else size - 1
+    if last < first:
+        return None
+    return first, last
+
+
+def _read_at(f, n: int, pos: int) -> bytes:
+    if hasattr(os, "pread"):
+        return os.pread(f.fileno(), n, pos)
+    f.seek(pos)
+    return f.read(n)
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    """If-None-Match comparison: weak, against a list of tags or `*`."""
+    tags = [t.strip() for t in header.split(",")]
+    return "*" in tags or etag in (t[2:] if t.startswith("W/") else t for t in tags)
+
+
+class FileRangeResponse(Response):
+    """
+    Serve bytes [offset, offset + length) of `path` as one resource (the whole
+    file by default), honouring Range / If-Range (ETag or Last-Modified) /
+    If-None-Match. `etag` names the resource; the file's mtime and the span
+    are folded into the ETag sent, so a re-rendered file gets a new validator.
+    A 304 repeats the ETag and the caller's `headers` (Cache-Control), so
+    caches refresh the entry's freshness. The file is opened here, so
+    a store evicting it afterwards does not break a response already started.
+    Raises FileNotFoundError if it is gone, RangeNotSatisfiable for a bad range.
+    """
+
+    chunk_size = 1 << 20
+
+    def __init__(
+        self,
+        path: str,
+        *,
+        media_type: str,
+        range_header: Optional[str] = None,
+        if_range: Optional[str] = None,
+        if_none_match: Optional[str] = None,
+        offset: int = 0,
+        length: Optional[int] = None,
+        etag: Optional[str] = None,
+        filename: Optional[str] = None,
+        method: str = "GET",
+        headers: Optional[Mapping[str, str]] = None,
+    ):
+        self._file = open(path, "rb")
+        try:
+            st = os.fstat(self._file.fileno())
+            size = st.st_size - offset if length is None else int(length)
+            if etag:
+                name = etag.strip('"')
+                etag = f'"{name}-{st.st_mtime_ns:x}-{offset:x}-{size:x}"'
+            not_modified = bool(etag and if_none_match and _etag_matches(if_none_match, etag))
+            last_modified = formatdate(st.st_mtime, usegmt=True)
+            if if_range is not None and if_range.strip() not in (etag or "", last_modified):
+                range_header = None  # representation changed: send it whole
+            span = None if not_modified else parse_range(range_header, size)
+        except BaseException:
+            self._file.close()
+            raise
+        first, last = span if span is not None else (0, size - 1)
+        self._start = offset + first
+        self._count = max(0, last - first + 1)
+        self._send_body = method.upper() != "HEAD"
+        self.media_type = None if not_modified else media_type
+        self.background = None
+        self.body = b""
+        if not_modified:  # the client's copy is current: validators and caching headers, no body
+            self.status_code = 304
+            self._send_body = False
+            self.init_headers({
+                "etag": etag,
+                "last-modified": last_modified,
+                **(headers or {}),
+            })
+            return
+        self.status_code = 206 if span is not None else 200
+        self.init_headers({
+            "content-type": media_type,
+            "content-length": str(self._count),
+            "accept-ranges": "bytes",
+            "last-modified": last_modified,
+            **({"content-range": f"bytes {first}-{last}/{size}"} if span is not None else {}),
+            **({"etag": etag} if etag else {}),
+            **({"content-disposition": f'inline; filename="{filename}"'} if filename else {}),
+            **(headers or {}),
+        })
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+            if not (self._send_body and self._count):
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+                return
+            if "http.response.zerocopysend" in scope.get("extensions", {}):
+                await send({"type": "http.response.zerocopysend", "file": self._file,
+                            "offset": self._start, "count": self._count, "more_body": False})
+                return
+            pos, end = self._start, self._start + self._count
+            while pos < end:
+                data = await run_in_threadpool(_read_at, self._file, min(self.chunk_size, end - pos), pos)
+                if not data:  # truncated underneath us; Content-Length can no longer be met
+                    raise OSError(f"short read at byte {pos} of {end}")
+                pos += len(data)
+                await send({"type": "http.response.body", "body": data, "more_body": pos < end})
+        finally:
+            self._file.close()
@@ -1,4 +1,5 @@
 import re
+from typing import List, Sequence
 
 
 def srt_to_vtt(srt_path: str, vtt_path: str) -> None:
@@ -16,3 +17,57 @@ def srt_to_vtt(srt_path: str, vtt_path: str) -> None:
     out.extend(cues)
     with open(vtt_path, "w", encoding="utf-8") as f:
         f.write("\n".join(out).strip() + "\n")
+
+
+def srt_text_to_vtt(srt: str) -> str:
+    """In-memory SRT → WebVTT (same rules as srt_to_vtt, no file round-trip)."""
+    srt = re.sub(r"(?m)^\s*\d+\s*$", "", srt).strip()
+    srt = re.sub(r"(\d\d:\d\d:\d\d),(\d{3})", r"\1.\2", srt)
+    cues = srt.replace("\r\n", "\n").split("\n\n")
+    out = ["WEBVTT", ""]
+    out.extend(cues)
+    return "\n".join(out).strip() + "\n"
+
+
+def mfa_char_threshold() -> int:
+    """Longest text (in chars) we run MFA on, based on system capability."""
+    from app.services.models import get_recommended_engine
+    if get_recommended_engine() == "kokoro":
+        # Lower-end system - be more conservative with MFA
+        return 300
+    # Higher-end system - can handle MFA on longer texts
+    return 1000
+
+
+def wants_mfa(chunks: List[str], align: bool) -> bool:
+    return align and sum(len(c) for c in chunks) <= mfa_char_threshold()
+
+
+def build_srt(chunks: List[str], wavs: Sequence, sr: int, *, align: bool = True) -> str:
+    """
+    SRT for synthesized chunks: MFA-aligned when requested and the text is short
+    enough, otherwise (or if MFA fails) timed from chunk durations.
+    """
+    from app.utils.srt import srt_from_durations
+
+    durations_ms = [int(len(wav) / sr * 1000) for wav in wavs]
+    if not wants_mfa(chunks, align):
+        if align:
+            print(f"Skipping MFA alignment for long text ({sum(len(c) for c in chunks)} chars). Using simple timing.")
+        return srt_from_durations(chunks, durations_ms)
+
+    import os
+    import tempfile
+    from app.utils.align_subtitles import mfa_align_chunks_to_srt
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            srt_path = os.path.join(tmp, "captions.srt")
+            # Use MFA for precise alignment with more CPU cores
+            num_cores = min(os.cpu_count() or 4, 8)  # Use up to 8 cores
+            mfa_align_chunks_to_srt(
+                chunks, wavs, sr, srt_path, num_jobs=num_cores, single_speaker=True)
+            with open(srt_path, "r", encoding="utf-8") as f:
+                return f.read()
+    except Exception as e:
+        print(f"MFA alignment failed ({e}), falling back to duration-based timing")
+        return srt_from_durations(chunks, durations_ms)
@@ -0,0 +1,84 @@
+# app/utils/quantize.py
+"""
+Dynamic int8 quantization for CPU inference.
+
+Linear weights are stored as int8 and activations are quantized on the fly,
+so those layers use int8 matmul kernels and about a quarter of the memory;
+convolutions, LSTMs and everything else stay float32. (Quantized LSTMs are
+left out on purpose: they lack flatten_parameters(), which Kokoro calls on
+every forward.) Quantized modules are
+pickled to disk, keyed by the source model and the torch version, so a
+restart loads the int8 weights instead of quantizing again.
+"""
+from __future__ import annotations
+import hashlib
+import logging
+import os
+import time
+from typing import Callable
+
+import torch
+from torch import nn
+
+MODES = ("none", "int8")
+
+# Part of every cache key: bump when what gets quantized changes, so old files are not reused
+_FORMAT = "dynamic-int8-linear"
+
+
+def parse_mode(value: str | None) -> str:
+    v = (value or "none").strip().lower()
+    if v in ("", "0", "off", "false", "no", "fp32", "float32"):
+        return "none"
+    if v not in MODES:
+        raise ValueError(f"unknown quantization mode '{value}' (expected one of {', '.join(MODES)})")
+    return v
+
+
+def quantize_dynamic_int8(module: nn.Module) -> nn.Module:
+    """
+    `module` (moved to CPU) with its Linear layers dynamically quantized to
+    int8, in place: a copy is not possible for modules using the old-style
+    weight_norm (Kokoro's decoder), whose derived weights refuse deepcopy.
+    """
+    from torch.ao.quantization import quantize_dynamic
+
+    return quantize_dynamic(module.cpu().eval(), {nn.Linear}, dtype=torch.qint8, inplace=True)
+
+
+def cache_path(*identity: str) -> str:
+    """On-disk location for the quantized module identified by `identity`."""
+    root = os.environ.get("TTS_QUANTIZED_DIR") or os.path.join(os.environ.get("TTS_CACHE_DIR", "cache"), "quantized")
+    key = hashlib.sha1("|".join((*identity, _FORMAT, torch.__version__)).encode("utf-8")).hexdigest()[:20]
+    return os.path.join(root, f"{key}.pt")
+
+
+def load_or_quantize(build: Callable[[], nn.Module], path: str, *, label: str) -> nn.Module:
+    """
+    The int8 module cached at `path`, or quantize build() and cache it there.
+    A cache file that fails to load (e.g. written by other code) is rebuilt.
+    """
+    try:
+        start = time.time()
+        module = torch.load(path, map_location="cpu", weights_only=False)  # our own file: a pickled module
+        logging.info(f"{label}: loaded int8 weights from {path} in {time.time() - start:.2f}s")
+        return module.eval()
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logging.warning(f"{label}: cached int8 weights at {path} unusable ({e}); re-quantizing")
+    start = time.time()
+    module = quantize_dynamic_int8(build())
+    logging.info(f"{label}: quantized to int8 in {time.time() - start:.2f}s")
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        torch.save(module, tmp)
+        os.replace(tmp, path)
+    except Exception as e:  # unpicklable module, disk full: serve it anyway, just uncached
+        logging.warning(f"{label}: could not cache int8 weights ({e})")
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+    return module
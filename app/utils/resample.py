@@ -0,0 +1,128 @@
+# app/utils/resample.py
+"""
+Polyphase windowed-sinc resampling with cached filter banks.
+
+One Resampler per (sr_in, sr_out, quality) holds the filter bank, built
+once. resample() converts whole arrays (vectorized per output phase);
+Resampler.stream() returns a stateful converter whose process(block) carries
+input history between blocks, so streamed segments join without seams and
+the concatenated output equals the whole-array result.
+"""
+from __future__ import annotations
+from functools import lru_cache
+from math import ceil, gcd
+
+import numpy as np
+
+# quality -> (zero crossings per side, passband rolloff, Kaiser beta)
+QUALITY = {
+    "hq": (16, 0.945, 8.6),
+    "fast": (6, 0.9, 6.0),
+}
+
+
+class Resampler:
+    def __init__(self, sr_in: int, sr_out: int, quality: str = "hq"):
+        if quality not in QUALITY:
+            raise ValueError(f"unknown resampler quality '{quality}'")
+        self.sr_in, self.sr_out, self.quality = int(sr_in), int(sr_out), quality
+        g = gcd(self.sr_in, self.sr_out)
+        self.up, self.down = self.sr_out // g, self.sr_in // g
+        zeros, rolloff, beta = QUALITY[quality]
+        span = max(self.up, self.down)
+        fc = rolloff * 0.5 / span  # cycles per sample at the upsampled rate
+        self.half = half = int(ceil(zeros / (2 * fc)))
+        k = np.arange(-half, half + 1)
+        h = 2 * fc * np.sinc(2 * fc * k) * np.kaiser(2 * half + 1, beta) * self.up
+        self.taps = taps = int(ceil((2 * half + 1) / self.up))
+        bank = np.zeros((self.up, taps), dtype=np.float64)
+        for p in range(self.up):
+            phase = h[p::self.up]
+            bank[p, :len(phase)] = phase
+        # bank[p] reversed, so it dots directly with an input window in time order
+        self._bank = np.ascontiguousarray(bank[:, ::-1]).astype(np.float32)
+
+    def out_len(self, n: int) -> int:
+        return int(ceil(n * self.up / self.down))
+
+    def _compute(self, xp: np.ndarray, xp0: int, m0: int, m1: int) -> np.ndarray:
+        """Outputs [m0, m1) from xp, where xp[0] is input sample xp0 (negative = leading zeros)."""
+        y = np.empty(max(0, m1 - m0), dtype=np.float32)
+        if not y.size:
+            return y
+        windows = np.lib.stride_tricks.sliding_window_view(xp, self.taps)
+        for r in range(min(self.up, y.size)):
+            count = len(range(m0 + r, m1, self.up))
+            t = (m0 + r) * self.down + self.half
+            last = t // self.up  # newest input sample feeding this output
+            s = last - self.taps + 1 - xp0
+            y[r::self.up] = windows[s:s + self.down * (count - 1) + 1:self.down] @ self._bank[t - last * self.up]
+        return y
+
+    def resample(self, x: np.ndarray) -> np.ndarray:
+        """Whole-array conversion; len(result) == ceil(len(x) * sr_out / sr_in)."""
+        x = np.asarray(x, dtype=np.float32).reshape(-1)
+        if self.up == self.down or x.size == 0:
+            return x.copy()
+        m = self.out_len(x.size)
+        tail = ((m - 1) * self.down + self.half) // self.up - x.size + 1
+        xp = np.concatenate([np.zeros(self.taps - 1, np.float32), x, np.zeros(max(0, tail), np.float32)])
+        return self._compute(xp, -(self.taps - 1), 0, m)
+
+    def stream(self) -> "ResampleStream":
+        return ResampleStream(self)
+
+
+class ResampleStream:
+    """Stateful block-by-block conversion sharing a Resampler's filter bank."""
+
+    def __init__(self, rs: Resampler):
+        self.rs = rs
+        self._xp = np.zeros(rs.taps - 1, dtype=np.float32)
+        self._xp0 = -(rs.taps - 1)  # input index of _xp[0]
+        self._n_in = 0
+        self._m = 0  # next output index
+
+    def _emit(self, m1: int) -> np.ndarray:
+        rs = self.rs
+        y = rs._compute(self._xp, self._xp0, self._m, m1)
+        self._m = max(self._m, m1)
+        keep = (self._m * rs.down + rs.half) // rs.up - rs.taps + 1  # oldest sample still needed
+        if keep - self._xp0 > 4 * rs.taps:
+            self._xp = self._xp[keep - self._xp0:]
+            self._xp0 = keep
+        return y
+
+    def process(self, block: np.ndarray) -> np.ndarray:
+        x = np.asarray(block, dtype=np.float32).reshape(-1)
+        if self.rs.up == self.rs.down:
+            return x
+        if x.size:
+            self._xp = np.concatenate([self._xp, x])
+            self._n_in += x.size
+        # output m is ready once its newest input sample, (m*down + half) // up, has arrived
+        ready = -(-(self._n_in * self.rs.up - self.rs.half) // self.rs.down)
+        return self._emit(max(self._m, ready))
+
+    def finish(self) -> np.ndarray:
+        """Flush the filter's lookahead; total output matches Resampler.resample()."""
+        rs = self.rs
+        if rs.up == rs.down:
+            return np.zeros(0, dtype=np.float32)
+        m = rs.out_len(self._n_in)
+        have = self._xp0 + len(self._xp)
+        need = ((m - 1) * rs.down + rs.half) // rs.up + 1
+        if need > have:
+            self._xp = np.concatenate([self._xp, np.zeros(need - have, np.float32)])
+        return self._emit(m)
+
+
+@lru_cache(maxsize=32)
+def get_resampler(sr_in: int, sr_out: int, quality: str = "hq") -> Resampler:
+    return Resampler(sr_in, sr_out, quality)
+
+
+def resample(x: np.ndarray, sr_in: int, sr_out: int, quality: str = "hq") -> np.ndarray:
+    if int(sr_in) == int(sr_out):
+        return np.asarray(x, dtype=np.float32)
+    return get_resampler(int(sr_in), int(sr_out), quality).resample(x)
@@ -1,6 +1,8 @@
 # app/utils/streaming.py
 from __future__ import annotations
-from typing import Iterable, Iterator, Union, Protocol, runtime_checkable
+from typing import AsyncIterable, AsyncIterator, Iterable, Iterator, Optional, Sequence, Union, Protocol, runtime_checkable
+import base64
+import json
 import struct
 import numpy as np
 
@@ -25,40 +27,60 @@ def _wav_streaming_header(sr: int) -> bytes:
     return hdr
 
 
+def _byte_view(c: PCMLike) -> memoryview:
+    """Flat byte view of a chunk without copying (bytes, bytearray, memoryview or ndarray)."""
+    mv = c if isinstance(c, memoryview) else memoryview(c if isinstance(c, (bytes, bytearray, np.ndarray)) else bytes(c))
+    return mv if mv.format == "B" and mv.ndim == 1 else mv.cast("B")
+
+
+class _EvenWriter:
+    """
+    Turns PCM16 chunks into even-sized bytes payloads. Aligned chunks (the
+    normal case) cost exactly one copy, at the wire; an odd trailing byte is
+    carried into the next chunk instead of re-buffering everything pending.
+    """
+
+    def __init__(self):
+        self._carry = b""
+
+    def take(self, chunks) -> bytes:
+        views = [v for v in map(_byte_view, chunks) if len(v)]
+        if self._carry:
+            views.insert(0, memoryview(self._carry))
+        if not views:
+            return b""
+        total = sum(len(v) for v in views)
+        even = total & ~1
+        if even == total:
+            self._carry = b""
+            return views[0].tobytes() if len(views) == 1 else b"".join(views)
+        last = views[-1]
+        self._carry = last[len(last) - 1:].tobytes()
+        views[-1] = last[:len(last) - 1]
+        return b"".join(views)
+
+    def finish(self) -> bytes:
+        # a single trailing byte is padded with one zero
+        out, self._carry = (self._carry + b"\x00" if self._carry else b""), b""
+        return out
+
+
+def _silence(sr: int, ms: float) -> bytes:
+    nbytes = int(sr * 2 * (ms / 1000.0))
+    return b"\x00" * (nbytes + (nbytes & 1))
+
+
 def wav_stream_from_chunks(
     sample_rate: int,
-    chunks: Iterable[bytes],
+    chunks: Iterable[PCMLike],
     *,
     prepend_silence_ms: int = 0,
     prebuffer_chunks: int = 2,
 ) -> Iterator[bytes]:
     yield _wav_streaming_header(sample_rate)
-
-    if prepend_silence_ms > 0:
-        silence = b"\x00" * int(sample_rate * 2 * prepend_silence_ms / 1000)
-        if silence:
-            yield silence  # bytes
-
-    buf = bytearray()
-    it = iter(chunks)
-
-    for _ in range(max(0, prebuffer_chunks)):
-        try:
-            c = next(it)
-            if not c:
-                continue
-            buf += bytes(c)
-        except StopIteration:
-            break
-
-    if buf:
-        yield bytes(buf)
-        buf.clear()
-
-    for c in it:
-        if not c:
-            continue
-        yield bytes(c)
+    for out in pcm16_stream_from_chunks(sample_rate, chunks, prepend_silence_ms=prepend_silence_ms,
+                                        prebuffer_chunks=prebuffer_chunks):
+        yield out
 
 
 # --- ADD: raw PCM (s16le) streaming, no WAV header ---
@@ -73,47 +95,242 @@ def pcm16_stream_from_chunks(
     Stream raw PCM16 (s16le) safely. Guarantees only even-sized writes.
     - Optionally sends a short priming silence.
     - Small prebuffer smooths start-up for players.
+    Chunks may be memoryviews (e.g. PCMPacketizer packets); each is copied
+    once, into the payload handed to the server.
     """
-    # Primer: sr * 2 bytes (mono 16-bit) * ms/1000
     if prepend_silence_ms > 0:
-        nbytes = int(sr * 2 * (prepend_silence_ms / 1000.0))
-        if nbytes & 1:
-            nbytes += 1  # keep it even
-        if nbytes:
-            yield b"\x00" * nbytes
+        primer = _silence(sr, prepend_silence_ms)
+        if primer:
+            yield primer
 
     it = iter(chunks)
-    pending = bytearray()
+    writer = _EvenWriter()
 
     # Prebuffer a few chunks to avoid tiny initial packets
+    first = []
     for _ in range(max(0, prebuffer_chunks)):
         try:
-            c = next(it)
+            first.append(next(it))
         except StopIteration:
             break
-        pending += bytes(c)
+    out = writer.take(first)
+    if out:
+        yield out
 
-    def flush_even() -> bytes:
-        nonlocal pending
-        even = len(pending) & ~1  # drop an odd trailing byte, if any
-        if even:
-            out = bytes(pending[:even])
-            del pending[:even]
-            return out
-        return b""
+    for c in it:
+        out = writer.take((c,))
+        if out:
+            yield out
 
-    first = flush_even()
-    if first:
-        yield first
+    out = writer.finish()
+    if out:
+        yield out
 
-    for c in it:
-        pending += bytes(c)
-        out = flush_even()
+
+# --- async variants: same framing, for async chunk sources drained on the event loop ---
+async def awav_stream_from_chunks(
+    sample_rate: int,
+    chunks: AsyncIterable[PCMLike],
+    *,
+    prepend_silence_ms: int = 0,
+    prebuffer_chunks: int = 2,
+) -> AsyncIterator[bytes]:
+    yield _wav_streaming_header(sample_rate)
+    async for out in apcm16_stream_from_chunks(sample_rate, chunks, prepend_silence_ms=prepend_silence_ms,
+                                               prebuffer_chunks=prebuffer_chunks):
+        yield out
+
+
+async def apcm16_stream_from_chunks(
+    sr: int,
+    chunks: AsyncIterable[PCMLike],
+    *,
+    prepend_silence_ms: int = 0,
+    prebuffer_chunks: int = 2,
+) -> AsyncIterator[bytes]:
+    """Async raw PCM16 stream; same even-size guarantees as pcm16_stream_from_chunks."""
+    if prepend_silence_ms > 0:
+        primer = _silence(sr, prepend_silence_ms)
+        if primer:
+            yield primer
+
+    it = chunks.__aiter__()
+    writer = _EvenWriter()
+    first = []
+    for _ in range(max(0, prebuffer_chunks)):
+        try:
+            first.append(await it.__anext__())
+        except StopAsyncIteration:
+            break
+    out = writer.take(first)
+    if out:
+        yield out
+
+    async for c in it:
+        out = writer.take((c,))
         if out:
             yield out
 
-    # Finish: if a single trailing byte remains, pad with one zero
-    if pending:
-        if len(pending) & 1:
-            pending.append(0)
-        yield bytes(pending)
+    out = writer.finish()
+    if out:
+        yield out
+
+
+def _jsonl(event: dict) -> bytes:
+    return json.dumps(event, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
+
+
+async def acaptioned_jsonl_stream(
+    sr: int,
+    chunks: AsyncIterable[PCMLike],
+    texts: Sequence[str],
+    *,
+    cue_per_chunk: bool = True,
+    prepend_silence_ms: int = 0,
+) -> AsyncIterator[bytes]:
+    """
+    JSON-lines stream interleaving audio with caption cues, one event per line:
+      {"type": "start", "sample_rate", "format": "s16le", "channels": 1}
+      {"type": "cue", "index", "text", "start", "end"}   (seconds of stream time)
+      {"type": "audio", "data": <base64 s16le>}
+      {"type": "end", "duration"}
+    With `cue_per_chunk`, chunk i of `chunks` is the audio of texts[i] and its
+    cue precedes it with both times known; items may be (index, audio) pairs
+    when the stream does not start at chunk 0. Otherwise the stream is one cue
+    (texts joined) sent with "end": null before the first audio and re-sent
+    with the same index once the end is known.
+    """
+    yield _jsonl({"type": "start", "sample_rate": sr, "format": "s16le", "channels": 1})
+    writer = _EvenWriter()
+    samples = 0
+
+    def audio(payload: bytes) -> bytes:
+        return _jsonl({"type": "audio", "data": base64.b64encode(payload).decode("ascii")})
+
+    if prepend_silence_ms > 0:
+        primer = _silence(sr, prepend_silence_ms)
+        samples += len(primer) // 2
+        yield audio(primer)
+
+    whole = None if cue_per_chunk else {"type": "cue", "index": 0, "text": " ".join(texts),
+                                        "start": round(samples / sr, 3), "end": None}
+    i = 0
+    async for c in chunks:
+        if isinstance(c, tuple):  # (chunk index, audio) from a reader that may have joined late
+            i, c = c
+        payload = writer.take((c,))
+        n = len(payload) // 2
+        if cue_per_chunk and i < len(texts) and n:
+            yield _jsonl({"type": "cue", "index": i, "text": texts[i],
+                          "start": round(samples / sr, 3), "end": round((samples + n) / sr, 3)})
+        elif whole is not None and i == 0:  # first block, even if empty
+            yield _jsonl(whole)
+        i += 1
+        if payload:
+            samples += n
+            yield audio(payload)
+    tail = writer.finish()
+    if tail:
+        samples += len(tail) // 2
+        yield audio(tail)
+    if whole is not None:
+        whole["end"] = round(samples / sr, 3)
+        yield _jsonl(whole)
+    yield _jsonl({"type": "end", "duration": round(samples / sr, 3)})
+
+
+class PCMPacketizer:
+    """
+    Float audio segments -> PCM16 packets of a fixed duration, without per-packet copies.
+
+    Each segment is clipped and scaled in a reusable float32 scratch buffer
+    and converted to int16 once; packets are memoryview slices of that array.
+    A remainder shorter than `min_packet_ms` is held back and coalesced into
+    the next packet (or released by flush()), so tiny frames never go out alone.
+    """
+
+    def __init__(self, sr: int, packet_ms: float = 30.0, min_packet_ms: Optional[float] = None):
+        self.packet = max(1, int(sr * packet_ms / 1000.0))
+        self.min_packet = self.packet // 2 if min_packet_ms is None else max(1, int(sr * min_packet_ms / 1000.0))
+        self._scratch = np.empty(0, dtype=np.float32)
+        self._tail = np.empty(0, dtype="<i2")
+
+    def to_pcm16(self, audio: np.ndarray) -> np.ndarray:
+        x = np.asarray(audio, dtype=np.float32).reshape(-1)
+        if self._scratch.size < x.size:
+            self._scratch = np.empty(max(x.size, 2 * self._scratch.size), dtype=np.float32)
+        tmp = self._scratch[:x.size]
+        np.clip(x, -1.0, 1.0, out=tmp)
+        tmp *= 32767.0
+        return tmp.astype("<i2")  # the only allocation per segment
+
+    def view(self, audio: np.ndarray) -> memoryview:
+        """A whole segment as one packet."""
+        return memoryview(self.to_pcm16(audio)).cast("B")
+
+    def push(self, audio: np.ndarray) -> Iterator[memoryview]:
+        return self.push_pcm16(self.to_pcm16(audio))
+
+    def push_bytes(self, data: PCMLike) -> Iterator[memoryview]:
+        mv = _byte_view(data)
+        if len(mv) & 1:
+            mv = memoryview(mv.tobytes() + b"\x00")  # pad a final orphan byte
+        return self.push_pcm16(np.frombuffer(mv, dtype="<i2"))
+
+    def push_pcm16(self, pcm: np.ndarray) -> Iterator[memoryview]:
+        P, n, i = self.packet, len(pcm), 0
+        if self._tail.size:
+            need = P - self._tail.size
+            if n < need:
+                self._tail = np.concatenate([self._tail, pcm])
+                return
+            head, self._tail, i = np.concatenate([self._tail, pcm[:need]]), self._tail[:0], need
+            yield memoryview(head).cast("B")
+        while n - i >= P:
+            yield memoryview(pcm[i:i + P]).cast("B")
+            i += P
+        if n - i >= self.min_packet:
+            yield memoryview(pcm[i:]).cast("B")
+        elif n > i:
+            self._tail = pcm[i:].copy()
+
+    def flush(self) -> Iterator[memoryview]:
+        if self._tail.size:
+            tail, self._tail = self._tail, self._tail[:0]
+            yield memoryview(tail).cast("B")
+
+
+async def achain(first: Iterable[bytes], rest: AsyncIterable[bytes]) -> AsyncIterator[bytes]:
+    for b in first:
+        yield b
+    async for b in rest:
+        yield b
+
+
+async def aencoded_stream(
+    chunks: AsyncIterable[PCMLike],
+    encoder,
+    *,
+    prepend_silence_ms: int = 0,
+    run=None,
+) -> AsyncIterator[bytes]:
+    """
+    Feed PCM16 chunks through a stateful StreamEncoder (app.utils.codecs) and
+    yield its output. `run` (e.g. the API's run_blocking) moves encode calls
+    off the event loop for encoders that ask for it.
+    """
+    async def call(fn, *args):
+        return await run(fn, *args) if run is not None and encoder.offload else fn(*args)
+
+    if prepend_silence_ms > 0:
+        out = await call(encoder.encode, b"\x00" * (int(encoder.sr_in * prepend_silence_ms / 1000) * 2))
+        if out:
+            yield out
+    async for c in chunks:
+        if c:
+            out = await call(encoder.encode, c)
+            if out:
+                yield out
+    out = await call(encoder.finish)
+    if out:
+        yield out
@@ -4,24 +4,39 @@ from functools import lru_cache
 from pathlib import Path
 from typing import Iterable, Iterator, List, Tuple, Optional
 import hashlib
+import logging
 import os
 import sys
 import threading
+import time
 import inspect
+import sqlite3
 import torch
 import numpy as np
 import wave
 
-from app.services.models import get_kokoro, get_cosyvoice2
+from app.services.models import get_kokoro, get_cosyvoice2, model_fingerprint
+from app.services.kokoro_batcher import get_kokoro_batcher
+from app.services.kokoro_pool import get_kokoro_pool
+from app.services.engine_workers import engine_workers
+from app.services.lifecycle import MODELS, uses_model
+from app.services.metrics import CACHE_REQUESTS, STAGE_SECONDS, observe_synthesis
+from app.utils.chunk_cache import DiskChunkCache
+from app.utils.chunk_store import PackedChunkStore
+from app.utils.resample import get_resampler, resample
+from app.utils.streaming import PCMPacketizer
+from app.utils.timestretch import WSOLAStretcher, time_stretch
 
 # ---------------------------
 # Common helpers
 # ---------------------------
 
 # ---- Cosy frontend feature cache (safe monkey patch) ----
-_COSY_FEAT_CACHE_INSTALLED = False
 _COSY_LOCK = threading.Lock()
 _COSY_OBJ = None  # cached CosyVoice2 object
+_COSY_CHUNK_CACHES: dict = {}  # cache_dir -> DiskChunkCache
+_KOKORO_STORES: dict = {}  # cache_dir -> PackedChunkStore
+_KOKORO_STORES_LOCK = threading.Lock()
 
 
 def _find_cosy_root() -> Path | None:
@@ -43,12 +58,11 @@ def _find_cosy_root() -> Path | None:
 
 
 def _install_cosy_feat_cache(cv):
-    global _COSY_FEAT_CACHE_INSTALLED
-    if _COSY_FEAT_CACHE_INSTALLED:
-        return
     fe = getattr(cv, "frontend", None)
     if fe is None or not hasattr(fe, "_extract_speech_feat"):
         return
+    if getattr(fe, "_feat_cache_enabled", False):  # per model: a reloaded CosyVoice2 gets its own
+        return
 
     import hashlib
     import torch
@@ -77,30 +91,17 @@ def _install_cosy_feat_cache(cv):
 
     fe._extract_speech_feat = _wrapped
     setattr(fe, "_feat_cache_enabled", True)
-    _COSY_FEAT_CACHE_INSTALLED = True
 
 
-def _hash_key(voice: str, lang_code: str, speed: float, sr: int, text: str) -> str:
+def _hash_key(voice: str, lang_code: str, speed: float, sr: int, text: str, model: str) -> str:
     h = hashlib.sha1(
-        f"{voice}|{lang_code}|{speed}|{sr}|{text}".encode("utf-8")).hexdigest()
+        f"{model}|{voice}|{lang_code}|{speed}|{sr}|{text}".encode("utf-8")).hexdigest()
     return h[:16]
 
 
-def _read_wav_mono16(path: str) -> Tuple[np.ndarray, int]:
-    with wave.open(path, "rb") as w:
-        sr = w.getframerate()
-        frames = w.readframes(w.getnframes())
-        audio = np.frombuffer(frames, dtype="<i2").astype(np.float32) / 32767.0
-        return audio, sr
-
-
-def _write_wav_mono16(path: str, audio: np.ndarray, sr: int):
-    a16 = (np.clip(audio, -1, 1) * 32767).astype("<i2")
-    with wave.open(path, "wb") as w:
-        w.setnchannels(1)
-        w.setsampwidth(2)
-        w.setframerate(sr)
-        w.writeframes(a16.tobytes())
+def _pcm16_to_float32(a16: np.ndarray) -> np.ndarray:
+    """Single-pass int16 -> float32 conversion (reads straight from a memmap view)."""
+    return np.multiply(a16, np.float32(1.0 / 32767.0), dtype=np.float32)
 
 
 def _to_float32(x) -> np.ndarray:
@@ -160,19 +161,6 @@ def _read_wav_mono_float(path: str) -> tuple[np.ndarray, int]:
     return audio, sr
 
 
-def _resample_linear(x: np.ndarray, sr_in: int, sr_out: int) -> np.ndarray:
-    if sr_in == sr_out:
-        return x
-    t_in = np.linspace(0.0, len(x) / sr_in, num=len(x), endpoint=False)
-    t_out = np.linspace(0.0, len(x) / sr_in,
-                        num=int(round(len(x) * sr_out / sr_in)), endpoint=False)
-    return np.interp(t_out, t_in, x).astype(np.float32)
-
-
-def _float_to_pcm16_bytes(x: np.ndarray) -> bytes:
-    return (np.clip(x, -1.0, 1.0) * 32767.0).astype("<i2").tobytes()
-
-
 def _canon_path(p: str) -> str:
     """Canonicalize a path so the cache hits even if callers pass variants."""
     try:
@@ -188,7 +176,7 @@ def _load_ref_16k_cached_core(canon_path: str) -> np.ndarray:
     Return is contiguous float32 in [-1, 1]. Cached by canonical path.
     """
     ref_float, ref_sr = _read_wav_mono_float(canon_path)
-    ref_16k = _resample_linear(ref_float, ref_sr, 16000)
+    ref_16k = resample(ref_float, ref_sr, 16000, quality="fast")
     ref_16k = _trim_ref(ref_16k, 16000, max_sec=4.0)
     if ref_16k.size < int(1.2 * 16000):
         pad = np.zeros(int(1.2 * 16000) - ref_16k.size, dtype=np.float32)
@@ -214,31 +202,43 @@ def _rms_normalize(x: np.ndarray, target_dbfs: float = -20.0) -> np.ndarray:
     return y
 
 
-try:
-    import torchaudio  # noqa: F401
-    _HAS_TORCHAUDIO = True
-except Exception:
-    _HAS_TORCHAUDIO = False
-
-
-def _resample_hq(x: np.ndarray, sr_in: int, sr_out: int) -> np.ndarray:
-    if sr_in == sr_out:
-        return np.asarray(x, dtype=np.float32)
-    if _HAS_TORCHAUDIO:
-        import torch
-        import torchaudio.functional as AF
-        t = torch.from_numpy(np.asarray(x, np.float32)).unsqueeze(0)  # [1, T]
-        with torch.inference_mode():
-            y = AF.resample(t, sr_in, sr_out)  # CPU kernel
-        return y.squeeze(0).numpy().astype(np.float32)
-    # fallback to linear if torchaudio isn't available
-    return _resample_linear(np.asarray(x, np.float32), sr_in, sr_out)
-
 # ---------------------------
 # Kokoro
 # ---------------------------
 
 
+def _kokoro_chunk_store(cache_dir: str) -> PackedChunkStore:
+    max_mb = float(os.environ.get("KOKORO_CACHE_MAX_MB", "2048"))
+    with _KOKORO_STORES_LOCK:
+        store = _KOKORO_STORES.get(cache_dir)
+        if store is None:
+            store = PackedChunkStore(os.path.join(cache_dir, "kokoro"), int(max_mb * 1024 * 1024))
+            _KOKORO_STORES[cache_dir] = store
+        return store
+
+
+@uses_model("kokoro")
+def _kokoro_render(chunks: List[str], *, voice: str, speed: float, lang_code: str,
+                   repo_id: Optional[str] = None) -> List[np.ndarray]:
+    """One float32 array per chunk, via the cross-request batcher when it's enabled."""
+    batcher = get_kokoro_batcher() if repo_id is None else None
+    if batcher is not None:
+        # the batcher records synthesis metrics per model batch
+        return batcher.synthesize(chunks, voice=voice, speed=float(speed), lang_code=lang_code)
+    start = time.perf_counter()
+    text = "\n".join(chunks)
+    if repo_id:
+        pipe = get_kokoro(repo_id=repo_id, lang_code=lang_code)
+        wavs = [_to_float32(wav) for _, _, wav in pipe(text, voice=voice, speed=float(speed), split_pattern=r"\n+")]
+    else:
+        with get_kokoro_pool().checkout() as replica:
+            pipe = replica.pipeline(lang_code)
+            wavs = replica.run(lambda: [_to_float32(wav) for _, _, wav in
+                                        pipe(text, voice=voice, speed=float(speed), split_pattern=r"\n+")])
+    observe_synthesis("kokoro", time.perf_counter() - start, len(chunks), sum(len(w) for w in wavs) / 24000)
+    return wavs
+
+
 def synthesize_kokoro_chunks(
     chunks: List[str],
     voice: str = "af_heart",
@@ -251,60 +251,53 @@ def synthesize_kokoro_chunks(
     post: str = "none",  # Add missing parameter
 ) -> Tuple[List[np.ndarray], int]:
     """Return list of per-chunk mono float32 arrays and the sample rate.
-    If cache_dir is provided, each chunk is cached as 16-bit PCM WAV and reused on re-runs.
+    If cache_dir is provided, chunks are kept in a packed, memory-mapped store
+    under <cache_dir>/kokoro and reused on re-runs.
     """
-    # CPU optimization for better performance
-    import os
-    import torch
-    os.environ["OMP_NUM_THREADS"] = str(min(8, os.cpu_count() or 4))
-    os.environ["MKL_NUM_THREADS"] = str(min(8, os.cpu_count() or 4))
-    torch.set_num_threads(min(8, os.cpu_count() or 4))
-    
-    pipe = get_kokoro(repo_id=repo_id, lang_code=lang_code) if repo_id else get_kokoro(
-        lang_code=lang_code)
-
-    use_cache = bool(cache_dir)
-    if use_cache:
-        os.makedirs(cache_dir, exist_ok=True)
-
+    workers = engine_workers("kokoro")
+    if workers is not None:
+        return workers.call("synthesize_kokoro_chunks", chunks=chunks, voice=voice, lang_code=lang_code,
+                            speed=speed, sr=sr, repo_id=repo_id, cache_dir=cache_dir, post=post)
+    # Intra-op threads are set per replica by the Kokoro pool (KOKORO_THREADS_PER_REPLICA)
     wavs: List[np.ndarray] = []
-    if use_cache:
-        # Check cache first, collect uncached chunks
-        uncached_chunks = []
+    if cache_dir:
+        store = _kokoro_chunk_store(cache_dir)
+        model = model_fingerprint("kokoro", repo_id)
+        keys = [_hash_key(voice, lang_code, speed, sr, txt, model) for txt in chunks]
+
+        # One batched index lookup for the whole chunk list
+        hits = store.get_many(keys)
+        CACHE_REQUESTS.inc(len(hits), cache="kokoro_chunks", result="hit")
+        CACHE_REQUESTS.inc(len(keys) - len(hits), cache="kokoro_chunks", result="miss")
         uncached_indices = []
-        
-        for i, txt in enumerate(chunks):
-            key = _hash_key(voice, lang_code, speed, sr, txt)
-            cpath = os.path.join(cache_dir, f"{key}.wav")
-            if os.path.isfile(cpath):
-                audio, _ = _read_wav_mono16(cpath)
-                wavs.append(audio.astype(np.float32, copy=False))
+        for i, key in enumerate(keys):
+            hit = hits.get(key)
+            if hit is not None:
+                wavs.append(_pcm16_to_float32(hit[0]))
             else:
                 # Placeholder for uncached chunk
                 wavs.append(None)
-                uncached_chunks.append(txt)
                 uncached_indices.append(i)
         
         # Process all uncached chunks at once if any
-        if uncached_chunks:
-            print(f"Processing {len(uncached_chunks)} uncached chunks with Kokoro...")
-            text = "\n".join(uncached_chunks)
-            uncached_wavs = []
-            for _, _, wav in pipe(text, voice=voice, speed=float(speed), split_pattern=r"\n+"):
-                uncached_wavs.append(_to_float32(wav))
+        if uncached_indices:
+            uncached_chunks = [chunks[i] for i in uncached_indices]
+            logging.debug(f"Processing {len(uncached_chunks)} uncached chunks with Kokoro")
+            uncached_wavs = _kokoro_render(
+                uncached_chunks, voice=voice, speed=speed, lang_code=lang_code, repo_id=repo_id)
             
-            # Cache and insert results
-            for i, (idx, txt, wav_data) in enumerate(zip(uncached_indices, uncached_chunks, uncached_wavs)):
-                key = _hash_key(voice, lang_code, speed, sr, txt)
-                cpath = os.path.join(cache_dir, f"{key}.wav")
-                _write_wav_mono16(cpath, wav_data, sr)
+            # Insert results and append them to the store in one locked write
+            for idx, wav_data in zip(uncached_indices, uncached_wavs):
                 wavs[idx] = wav_data
+            try:
+                store.put_many(
+                    (keys[idx], wav_data, sr) for idx, wav_data in zip(uncached_indices, uncached_wavs))
+            except (OSError, sqlite3.Error) as e:
+                print(f"Failed to cache Kokoro chunks: {e}")
     else:
         # Batch process all chunks at once for better performance
-        print(f"Processing {len(chunks)} chunks with Kokoro (batch mode)...")
-        text = "\n".join(chunks)
-        for _, _, wav in pipe(text, voice=voice, speed=float(speed), split_pattern=r"\n+"):
-            wavs.append(_to_float32(wav))
+        logging.debug(f"Processing {len(chunks)} chunks with Kokoro")
+        wavs = _kokoro_render(chunks, voice=voice, speed=speed, lang_code=lang_code, repo_id=repo_id)
 
     return wavs, sr
 
@@ -316,30 +309,60 @@ def stream_kokoro_chunks(
     speed: float = 1.0,
     lang_code: str = "a",
 ) -> Iterator[bytes]:
-    """Yields raw PCM16 (s16le) bytes per chunk, as soon as each chunk is ready."""
-    pipe = get_kokoro(lang_code=lang_code)
-    for txt in chunks:
+    """Yields raw PCM16 (s16le) per chunk, as soon as each chunk is ready: exactly one memoryview per chunk."""
+    workers = engine_workers("kokoro")
+    if workers is not None:
+        yield from workers.stream("stream_kokoro_chunks", chunks=chunks, voice=voice, speed=speed, lang_code=lang_code)
+        return
+    yield from _stream_kokoro_local(chunks, voice=voice, speed=speed, lang_code=lang_code)
+
+
+@uses_model("kokoro")
+def _stream_kokoro_local(chunks: List[str], *, voice: str, speed: float, lang_code: str) -> Iterator[memoryview]:
+    packer = PCMPacketizer(24000)
+    batcher = get_kokoro_batcher()
+    if batcher is not None:
+        for f32 in batcher.stream(chunks, voice=voice, speed=float(speed), lang_code=lang_code):
+            yield packer.view(f32)
+        return
+    pool = get_kokoro_pool()
+
+    def _first_audio(pipe, txt: str) -> np.ndarray:
         for _lang, _ph, wav in pipe(txt, voice=voice, speed=float(speed)):
-            f32 = _to_float32(wav)
-            yield (np.clip(f32, -1.0, 1.0) * 32767.0).astype("<i2").tobytes()
-            break  # one audio per chunk
+            return _to_float32(wav)  # one audio per chunk
+        return np.zeros(0, dtype=np.float32)  # keep blocks 1:1 with chunks (captions rely on it)
+
+    for txt in chunks:
+        # a replica is held per chunk, not while the listener drains the previous one
+        with pool.checkout() as replica:
+            f32 = replica.run(_first_audio, replica.pipeline(lang_code), txt)
+        yield packer.view(f32)
 
 # ---------------------------
 # CosyVoice2 (cross-lingual streaming)
 # ---------------------------
 
 
+COSY_STREAM_SR = 24000
+
+
 def stream_cosyvoice2_cross(
     text: str,
     *,
     ref_path: Optional[str] = None,
     ref_wav: Optional[np.ndarray] = None,
     speed: float = 1.0,
-) -> Tuple[int, Iterator[bytes]]:
+    packet_ms: Optional[float] = None,
+) -> Tuple[int, Iterator[memoryview]]:
     """
-    Returns (sr, chunk_bytes_iter). Chunks are PCM16 bytes at sr=24000.
+    Returns (sr, packet_iter). Packets are PCM16 memoryviews at sr=24000,
+    `packet_ms` long (TTS_STREAM_PACKET_MS, default 30).
     Robust to Cosy returning dicts, tuples, tensors, or numpy arrays.
     """
+    workers = engine_workers("cosyvoice2")
+    if workers is not None:
+        return COSY_STREAM_SR, workers.stream("stream_cosyvoice2_cross", text=text, ref_path=ref_path,
+                                              ref_wav=ref_wav, speed=speed, packet_ms=packet_ms)
     import torch
 
     from app.services.models import get_cosyvoice2
@@ -355,7 +378,7 @@ def stream_cosyvoice2_cross(
         ref_16k = _trim_ref(ref_16k, 16000, max_sec=3.2)
     elif ref_path:
         ref_float, ref_sr = _read_wav_mono_float(ref_path)
-        ref_16k = _resample_linear(ref_float, ref_sr, 16000)
+        ref_16k = resample(ref_float, ref_sr, 16000, quality="fast")
         ref_16k = _trim_ref(ref_16k, 16000, max_sec=3.2)
     else:
         ref_16k = np.zeros(16000, dtype=np.float32)
@@ -370,40 +393,39 @@ def stream_cosyvoice2_cross(
         pad = torch.zeros(1, 16000 - ref_t.shape[1], dtype=torch.float32, device=cv.device)
         ref_t = torch.cat([ref_t, pad], dim=1)
 
-    print(f"[Cosy] start text='{text[:60]}' ref={'mem' if ref_wav is not None else ref_path} "
-          f"ref_sh={tuple(ref_t.shape)} dtype={ref_t.dtype} dev={ref_t.device} speed={speed}")
-
-    # Debug: Check device states before inference
-    print(f"[DEBUG] Model device: {cv.device}")
-    print(f"[DEBUG] Input tensor device: {ref_t.device}")
-
-    # Deep device inspection
-    def check_all_devices(module, name):
-        cpu_params = []
-        mps_params = []
-        for param_name, param in module.named_parameters():
-            if param.device.type == 'cpu':
-                cpu_params.append(f"{name}.{param_name}")
-            elif param.device.type == 'mps':
-                mps_params.append(f"{name}.{param_name}")
-
-        for buffer_name, buffer in module.named_buffers():
-            if buffer.device.type == 'cpu':
-                cpu_params.append(f"{name}.{buffer_name}")
-            elif buffer.device.type == 'mps':
-                mps_params.append(f"{name}.{buffer_name}")
-
-        if cpu_params:
-            print(f"[DEBUG] CPU parameters in {name}: {cpu_params[:5]}...")  # Show first 5
-        if mps_params:
-            print(f"[DEBUG] MPS parameters in {name}: {len(mps_params)} total")
-
-    if hasattr(cv.model, 'llm'):
-        check_all_devices(cv.model.llm, "LLM")
-    if hasattr(cv.model, 'flow'):
-        check_all_devices(cv.model.flow, "Flow")
-    if hasattr(cv.model, 'hift'):
-        check_all_devices(cv.model.hift, "Hift")
+    logging.debug(f"[Cosy] start text='{text[:60]}' ref={'mem' if ref_wav is not None else ref_path} "
+                  f"ref_sh={tuple(ref_t.shape)} dtype={ref_t.dtype} dev={ref_t.device} speed={speed}")
+
+    # Debug: Check device states before inference (walks every parameter, so only when asked)
+    if logging.getLogger().isEnabledFor(logging.DEBUG):
+        logging.debug(f"[Cosy] model device={cv.device} input device={ref_t.device}")
+
+        def check_all_devices(module, name):
+            cpu_params = []
+            mps_params = []
+            for param_name, param in module.named_parameters():
+                if param.device.type == 'cpu':
+                    cpu_params.append(f"{name}.{param_name}")
+                elif param.device.type == 'mps':
+                    mps_params.append(f"{name}.{param_name}")
+
+            for buffer_name, buffer in module.named_buffers():
+                if buffer.device.type == 'cpu':
+                    cpu_params.append(f"{name}.{buffer_name}")
+                elif buffer.device.type == 'mps':
+                    mps_params.append(f"{name}.{buffer_name}")
+
+            if cpu_params:
+                logging.debug(f"[Cosy] CPU parameters in {name}: {cpu_params[:5]}...")  # Show first 5
+            if mps_params:
+                logging.debug(f"[Cosy] MPS parameters in {name}: {len(mps_params)} total")
+
+        if hasattr(cv.model, 'llm'):
+            check_all_devices(cv.model.llm, "LLM")
+        if hasattr(cv.model, 'flow'):
+            check_all_devices(cv.model.flow, "Flow")
+        if hasattr(cv.model, 'hift'):
+            check_all_devices(cv.model.hift, "Hift")
 
     # --- call Cosy (prefer positional; fall back to named) ---
     try:
@@ -412,11 +434,15 @@ def stream_cosyvoice2_cross(
         raw = cv.inference_cross_lingual(
             text=text, prompt_speech_16k=ref_t, stream=True)
 
-    target_sr = 24000
-    frame = max(1, target_sr // 33)  # ~30 ms
+    target_sr = COSY_STREAM_SR
+    if packet_ms is None:
+        packet_ms = float(os.environ.get("TTS_STREAM_PACKET_MS", "30"))
+    packer = PCMPacketizer(target_sr, packet_ms=packet_ms)
+    # speed: pitch-preserving time-stretch, carried across Cosy's streamed segments
+    tsm = WSOLAStretcher(target_sr, float(speed)) if speed and abs(float(speed) - 1.0) > 0.01 else None
+    rate = {}  # source sr -> stateful resampler, so segment boundaries stay seamless
 
-    def _iter_bytes() -> Iterator[bytes]:
-        frame = max(1, target_sr // 33)  # ~30ms worth of samples
+    def _iter_bytes() -> Iterator[memoryview]:
         for seg in raw:
             arr = None
             sr = target_sr
@@ -440,19 +466,7 @@ def stream_cosyvoice2_cross(
                     sr = target_sr
 
             elif isinstance(seg, (bytes, bytearray, memoryview)):
-                # --- FIX: enforce even-length PCM16 and slice on even boundaries
-                b = bytes(seg)
-                if not b:
-                    continue
-                if len(b) & 1:
-                    b += b"\x00"  # pad final orphan byte
-                step = 2 * frame  # bytes per ~30ms chunk (mono s16)
-                for i in range(0, len(b), step):
-                    chunk = b[i:i + step]
-                    # defensive: guarantee even length
-                    if len(chunk) & 1:
-                        chunk += b"\x00"
-                    yield chunk
+                yield from packer.push_bytes(seg)  # odd-length input is padded, packets stay even
                 continue
 
             else:
@@ -466,22 +480,39 @@ def stream_cosyvoice2_cross(
                 arr = arr.mean(axis=1)
 
             if sr != target_sr and sr > 0:
-                arr = _resample_hq(arr, sr, target_sr)
+                if sr not in rate:
+                    rate[sr] = get_resampler(sr, target_sr).stream()
+                arr = rate[sr].process(arr)
+
+            if tsm is not None:
+                arr = tsm.process(arr)
 
-            if speed and abs(float(speed) - 1.0) > 0.01:
-                tmp_sr = int(round(target_sr * float(speed)))
-                tmp_sr = max(8000, min(96000, tmp_sr))
-                arr = _resample_hq(arr, target_sr, tmp_sr)
-                arr = _resample_hq(arr, tmp_sr, target_sr)
+            yield from packer.push(arr)
+        for rs in rate.values():
+            tail = rs.finish()
+            yield from packer.push(tsm.process(tail) if tsm is not None else tail)
+        if tsm is not None:
+            yield from packer.push(tsm.finish())
+        yield from packer.flush()
 
-            n = arr.size
-            i = 0
-            while i < n:
-                j = min(n, i + frame)
-                yield _float_to_pcm16_bytes(arr[i:j])
-                i = j
+    return target_sr, MODELS.leased("cosyvoice2", _iter_bytes())
 
-    return target_sr, _iter_bytes()
+
+def _cosy_chunk_key(model_id: str, mode: str, speed: float, ref_digest: str, text: str) -> str:
+    # speed used to be a no-op; "|wsola" keeps those cached entries from being served
+    tsm = "|wsola" if abs(float(speed) - 1.0) > 0.01 else ""
+    return hashlib.sha1(
+        f"cosyvoice2|{model_id}|{mode}|{float(speed):.4f}{tsm}|{ref_digest}|{text}".encode("utf-8")).hexdigest()
+
+
+def _cosy_chunk_cache(cache_dir: str) -> DiskChunkCache:
+    max_mb = float(os.environ.get("COSY_CACHE_MAX_MB", "2048"))
+    with _COSY_LOCK:
+        cache = _COSY_CHUNK_CACHES.get(cache_dir)
+        if cache is None:
+            cache = DiskChunkCache(cache_dir, int(max_mb * 1024 * 1024))
+            _COSY_CHUNK_CACHES[cache_dir] = cache
+        return cache
 
 
 def synthesize_cosyvoice2_chunks(
@@ -494,24 +525,26 @@ def synthesize_cosyvoice2_chunks(
     fp16: bool = False,
     mode: str = "cross",
     speed: float = 1.0,
+    cache_dir: Optional[str] = None,
 ) -> Tuple[List[np.ndarray], int]:
     """
     Synthesize chunks using CosyVoice2.
     Returns (list_of_audio_arrays, sample_rate).
+    If cache_dir is provided, finished chunks are cached under <cache_dir>/cosyvoice2 keyed by text,
+    reference-audio content, mode, speed and model identity; a fully cached
+    render never loads the model.
     """
-    from app.services.models import get_cosyvoice2
-    cv = get_cosyvoice2()
-    if isinstance(cv, tuple):
-        cv = cv[0]
-
-    _install_cosy_feat_cache(cv)
-
+    workers = engine_workers("cosyvoice2")
+    if workers is not None:
+        return workers.call("synthesize_cosyvoice2_chunks", chunks=chunks, model_dir=model_dir, ref_wav=ref_wav,
+                            prompt_text=prompt_text, stream=stream, fp16=fp16, mode=mode, speed=speed,
+                            cache_dir=cache_dir)
     # Load reference if provided
     ref_16k = None
     if ref_wav:
         try:
             ref_float, ref_sr = _read_wav_mono_float(ref_wav)
-            ref_16k = _resample_linear(ref_float, ref_sr, 16000)
+            ref_16k = resample(ref_float, ref_sr, 16000, quality="fast")
             ref_16k = _trim_ref(ref_16k, 16000, max_sec=3.2)
             ref_16k = _rms_normalize(ref_16k, target_dbfs=-18.0)
         except Exception:
@@ -520,6 +553,43 @@ def synthesize_cosyvoice2_chunks(
     if ref_16k is None:
         ref_16k = np.zeros(16000, dtype=np.float32)
 
+    target_sr = 24000
+    wavs: List[Optional[np.ndarray]] = [None] * len(chunks)
+
+    cache = None
+    keys: List[str] = []
+    if cache_dir:
+        cache = _cosy_chunk_cache(os.path.join(cache_dir, "cosyvoice2"))
+        ref_digest = hashlib.sha1(np.ascontiguousarray(ref_16k).tobytes()).hexdigest()
+        model_id = model_fingerprint("cosyvoice2")
+        keys = [_cosy_chunk_key(model_id, mode, speed, ref_digest, c) for c in chunks]
+        for i, key in enumerate(keys):
+            wavs[i] = cache.get(key)
+        n_hits = sum(w is not None for w in wavs)
+        CACHE_REQUESTS.inc(n_hits, cache="cosy_chunks", result="hit")
+        CACHE_REQUESTS.inc(len(keys) - n_hits, cache="cosy_chunks", result="miss")
+
+    pending = [i for i, w in enumerate(wavs) if w is None]
+    if not pending:
+        logging.debug(f"[CosyVoice2] All {len(chunks)} chunks served from cache")
+        return wavs, target_sr
+    _cosy_render_pending(chunks, pending, wavs, ref_16k, speed=speed, cache=cache, keys=keys)
+    return wavs, target_sr
+
+
+@uses_model("cosyvoice2")
+def _cosy_render_pending(chunks: List[str], pending: List[int], wavs: List[Optional[np.ndarray]],
+                         ref_16k: np.ndarray, *, speed: float, cache: Optional[DiskChunkCache],
+                         keys: List[str]) -> None:
+    """Render chunks[i] for each i in `pending` into wavs[i] (and the chunk cache)."""
+    target_sr = 24000
+    from app.services.models import get_cosyvoice2
+    cv = get_cosyvoice2()
+    if isinstance(cv, tuple):
+        cv = cv[0]
+
+    _install_cosy_feat_cache(cv)
+
     import torch
     ref_t = torch.from_numpy(ref_16k).to(dtype=torch.float32, device="cpu").unsqueeze(0).contiguous()
     
@@ -528,9 +598,6 @@ def synthesize_cosyvoice2_chunks(
         pad = torch.zeros(1, 16000 - ref_t.shape[1], dtype=torch.float32)
         ref_t = torch.cat([ref_t, pad], dim=1)
 
-    wavs = []
-    target_sr = 24000
-
     # Process chunks more efficiently
     import torch
     import os
@@ -548,9 +615,11 @@ def synthesize_cosyvoice2_chunks(
         os.environ["OMP_NUM_THREADS"] = str(min(8, os.cpu_count() or 4))
         os.environ["MKL_NUM_THREADS"] = str(min(8, os.cpu_count() or 4))
     
-    print(f"[CosyVoice2] Processing {len(chunks)} chunks on {device_name}...")
+    logging.debug(f"[CosyVoice2] Processing {len(pending)}/{len(chunks)} uncached chunks on {device_name}")
     
-    for chunk_text in chunks:
+    for idx in pending:
+        chunk_text = chunks[idx]
+        chunk_start = time.perf_counter()
         try:
             # Use cross-lingual mode
             raw = cv.inference_cross_lingual(chunk_text, ref_t, stream=False)
@@ -589,14 +658,11 @@ def synthesize_cosyvoice2_chunks(
                 
                 # Resample if needed
                 if sr != target_sr and sr > 0:
-                    arr = _resample_hq(arr, sr, target_sr)
+                    arr = resample(arr, sr, target_sr)
                 
-                # Apply speed change
+                # Apply speed change (pitch-preserving)
                 if speed and abs(float(speed) - 1.0) > 0.01:
-                    tmp_sr = int(round(target_sr * float(speed)))
-                    tmp_sr = max(8000, min(96000, tmp_sr))
-                    arr = _resample_hq(arr, target_sr, tmp_sr)
-                    arr = _resample_hq(arr, tmp_sr, target_sr)
+                    arr = time_stretch(arr, target_sr, float(speed))
                 
                 # Normalize audio to prevent distortion and clipping
                 # Target RMS level around 0.05 for good quality without distortion
@@ -611,23 +677,120 @@ def synthesize_cosyvoice2_chunks(
                 # Final safety clipping to prevent any overflow
                 arr = np.clip(arr, -0.95, 0.95)
                 
-                wavs.append(arr)
+                wavs[idx] = arr
+                observe_synthesis("cosyvoice2", time.perf_counter() - chunk_start, 1, len(arr) / target_sr)
+                if cache is not None:
+                    try:
+                        cache.put(keys[idx], arr, target_sr)
+                    except OSError as e:
+                        print(f"[CosyVoice2] Failed to cache chunk: {e}")
             else:
-                # Fallback: silence
-                wavs.append(np.zeros(int(target_sr * 0.5), dtype=np.float32))
+                # Fallback: silence (not cached)
+                wavs[idx] = np.zeros(int(target_sr * 0.5), dtype=np.float32)
                 
         except Exception as e:
             import traceback
             print(f"[CosyVoice2] Error processing chunk: {e}")
             print(f"[CosyVoice2] Full traceback: {traceback.format_exc()}")
             # Fallback: silence
-            wavs.append(np.zeros(int(target_sr * 0.5), dtype=np.float32))
+            wavs[idx] = np.zeros(int(target_sr * 0.5), dtype=np.float32)
 
-    return wavs, target_sr
+
+def synthesize_chunks(
+    engine: str,
+    chunks: List[str],
+    *,
+    voice: str = "af_heart",
+    lang_code: str = "a",
+    speed: float = 1.0,
+    ref_wav: Optional[str] = None,
+    prompt_text: str = "",
+    mode: str = "cross",
+    cache_dir: Optional[str] = None,
+) -> Tuple[List[np.ndarray], int]:
+    """Dispatch a chunk list to the named engine; returns (wavs, sr)."""
+    if engine == "kokoro":
+        return synthesize_kokoro_chunks(
+            chunks, voice=voice, lang_code=lang_code, speed=speed, cache_dir=cache_dir)
+    if engine == "cosyvoice2":
+        return synthesize_cosyvoice2_chunks(
+            chunks,
+            model_dir=None,
+            ref_wav=ref_wav,
+            prompt_text=prompt_text,
+            stream=False,
+            fp16=False,
+            mode=mode,
+            speed=speed,
+            cache_dir=cache_dir,
+        )
+    raise ValueError(f"Unknown engine: {engine}")
+
+
+def iter_synthesized_chunks(
+    engine: str,
+    chunks: List[str],
+    *,
+    group: int = 4,
+    **kwargs,
+) -> Iterator[Tuple[List[str], List[np.ndarray], int]]:
+    """
+    synthesize_chunks() delivered in order as (texts, wavs, sr) per `group`
+    chunks. In-process Kokoro with the batcher queues every chunk up front,
+    so the whole document shares batches and keeps synthesizing while the
+    caller consumes earlier groups; other engines synthesize group by group.
+    """
+    step = max(1, int(group))
+    if engine == "kokoro" and engine_workers("kokoro") is None:
+        batcher = get_kokoro_batcher()
+        if batcher is not None:
+            yield from _iter_kokoro_batched(batcher, chunks, group=step, **kwargs)
+            return
+    for i in range(0, len(chunks), step):
+        texts = chunks[i:i + step]
+        wavs, sr = synthesize_chunks(engine, texts, **kwargs)
+        yield texts, wavs, sr
+
+
+@uses_model("kokoro")
+def _iter_kokoro_batched(batcher, chunks: List[str], *, group: int, voice: str = "af_heart",
+                         lang_code: str = "a", speed: float = 1.0, cache_dir: Optional[str] = None,
+                         **_unused) -> Iterator[Tuple[List[str], List[np.ndarray], int]]:
+    sr = 24000
+    store, keys, hits = None, None, {}
+    if cache_dir:
+        store = _kokoro_chunk_store(cache_dir)
+        model = model_fingerprint("kokoro")
+        keys = [_hash_key(voice, lang_code, speed, sr, txt, model) for txt in chunks]
+        hits = store.get_many(keys)
+        CACHE_REQUESTS.inc(len(hits), cache="kokoro_chunks", result="hit")
+        CACHE_REQUESTS.inc(len(keys) - len(hits), cache="kokoro_chunks", result="miss")
+    missing = [txt for i, txt in enumerate(chunks) if keys is None or keys[i] not in hits]
+    audio = batcher.submit_all(missing, voice=voice, speed=float(speed), lang_code=lang_code)
+    try:
+        for start in range(0, len(chunks), group):
+            texts = chunks[start:start + group]
+            wavs, fresh = [], []
+            for i in range(start, start + len(texts)):
+                hit = hits.get(keys[i]) if keys is not None else None
+                if hit is not None:
+                    wavs.append(_pcm16_to_float32(hit[0]))
+                else:
+                    wavs.append(next(audio))
+                    fresh.append(i)
+            if store is not None and fresh:
+                try:
+                    store.put_many((keys[i], wavs[i - start], sr) for i in fresh)
+                except (OSError, sqlite3.Error) as e:
+                    print(f"Failed to cache Kokoro chunks: {e}")
+            yield texts, wavs, sr
+    finally:
+        audio.close()
 
 
 def concat_audio(wavs: List[np.ndarray]) -> np.ndarray:
     """Concatenate list of audio arrays."""
     if not wavs:
         return np.zeros(0, dtype=np.float32)
-    return np.concatenate([_to_float32(w) for w in wavs], axis=0)
+    with STAGE_SECONDS.time(stage="concat"):
+        return np.concatenate([_to_float32(w) for w in wavs], axis=0)
@@ -0,0 +1,116 @@
+# app/utils/timestretch.py
+"""
+Pitch-preserving time-scale modification (WSOLA) for the `speed` parameter.
+
+Output is built from Hann-windowed frames at a fixed synthesis hop of half a
+frame; frame k is read from the input near k * hop * speed, shifted by up to
+`tolerance` samples to the position whose waveform best continues the
+previous frame (cross-correlation via FFT), so pitch is kept and no phasing
+is introduced. The same object works block-by-block (process() carries the
+input window, search position and overlap-add tail) and on whole arrays
+(time_stretch()).
+"""
+from __future__ import annotations
+
+import numpy as np
+
+
+class WSOLAStretcher:
+    def __init__(self, sr: int, speed: float, *, frame_ms: float = 30.0, tolerance_ms: float = 8.0):
+        if speed <= 0:
+            raise ValueError(f"speed must be positive, got {speed}")
+        self.speed = float(speed)
+        n = max(16, int(sr * frame_ms / 1000.0)) & ~1
+        self.frame = n
+        self.hop = n // 2
+        self.tol = max(1, int(sr * tolerance_ms / 1000.0))
+        self._window = (0.5 - 0.5 * np.cos(2 * np.pi * np.arange(n) / n)).astype(np.float32)
+        self._nfft = 1 << int(np.ceil(np.log2(n + 2 * self.tol)))
+        self._buf = np.zeros(0, dtype=np.float32)
+        self._base = 0  # absolute input index of _buf[0]
+        self._k = 0  # next frame
+        self._prev = 0  # absolute input start of the previous frame
+        self._tail = np.zeros(self.hop, dtype=np.float32)  # second half of the previous windowed frame
+        self._n_in = 0
+        self._n_out = 0
+
+    def _segment(self, start: int, length: int) -> np.ndarray:
+        i = start - self._base
+        return self._buf[i:i + length]
+
+    def _next_frame(self, final: bool):
+        """Place frame k, or return None if more input is needed (unless `final`)."""
+        n, hop, tol = self.frame, self.hop, self.tol
+        if self._k == 0:
+            if not final and self._n_in < n:
+                return None
+            return 0
+        nominal = int(round(self._k * hop * self.speed))
+        if final and nominal >= self._n_in:
+            return None
+        lo, hi = max(nominal - tol, 0), nominal + tol
+        need = max(hi + n, self._prev + hop + n)
+        if need > self._base + len(self._buf):
+            if not final:
+                return None
+            self._buf = np.concatenate([self._buf, np.zeros(need - self._base - len(self._buf), np.float32)])
+        template = self._segment(self._prev + hop, n)
+        region = self._segment(lo, hi - lo + n)
+        corr = np.fft.irfft(np.fft.rfft(region, self._nfft) * np.conj(np.fft.rfft(template, self._nfft)),
+                            self._nfft)[:hi - lo + 1]
+        return lo + int(np.argmax(corr))
+
+    def _run(self, final: bool) -> np.ndarray:
+        n, hop = self.frame, self.hop
+        out = []
+        while True:
+            start = self._next_frame(final)
+            if start is None:
+                break
+            frame = self._segment(start, n)
+            if len(frame) < n:
+                frame = np.concatenate([frame, np.zeros(n - len(frame), np.float32)])
+            if self._k == 0:
+                out.append(frame[:hop].copy())  # no fade-in at the very start
+            else:
+                out.append(self._tail + frame[:hop] * self._window[:hop])
+            self._tail = frame[hop:] * self._window[hop:]
+            self._prev = start
+            self._k += 1
+            # drop input no later frame can reach
+            keep = min(int(round(self._k * hop * self.speed)) - self.tol, self._prev + hop)
+            if keep - self._base > 4 * n:
+                self._buf = self._buf[keep - self._base:]
+                self._base = keep
+        y = np.concatenate(out) if out else np.zeros(0, np.float32)
+        self._n_out += len(y)
+        return y
+
+    def process(self, block: np.ndarray) -> np.ndarray:
+        """Feed a block; returns the output that is final so far."""
+        x = np.asarray(block, dtype=np.float32).reshape(-1)
+        if x.size:
+            self._buf = np.concatenate([self._buf, x]) if self._buf.size else x.copy()
+            self._n_in += x.size
+        return self._run(final=False)
+
+    def finish(self) -> np.ndarray:
+        """Flush the rest; total output length is round(input_length / speed)."""
+        emitted = self._n_out
+        y = np.concatenate([self._run(final=True), self._tail])
+        remaining = max(0, int(round(self._n_in / self.speed)) - emitted)
+        y = y[:remaining]
+        if len(y) < remaining:
+            y = np.concatenate([y, np.zeros(remaining - len(y), np.float32)])
+        self._n_out = emitted + len(y)
+        self._tail = np.zeros(self.hop, dtype=np.float32)
+        return y
+
+
+def time_stretch(x: np.ndarray, sr: int, speed: float, **kwargs) -> np.ndarray:
+    """Whole-array WSOLA: len(result) == round(len(x) / speed), pitch unchanged."""
+    x = np.asarray(x, dtype=np.float32).reshape(-1)
+    if abs(float(speed) - 1.0) < 1e-6 or x.size == 0:
+        return x
+    tsm = WSOLAStretcher(sr, speed, **kwargs)
+    return np.concatenate([tsm.process(x), tsm.finish()])
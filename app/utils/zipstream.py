@@ -0,0 +1,152 @@
+# app/utils/zipstream.py
+from __future__ import annotations
+import struct
+import zipfile
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+Entry = Tuple[str, Union[bytes, Iterable[bytes]], int]  # (arcname, payload, compress_type)
+
+
+class _Sink:
+    """
+    Write-only, non-seekable file object for zipfile. Collects whatever zipfile
+    writes so the generator can hand it to the client and drop it immediately.
+    Because tell() works but seek() does not, zipfile writes data descriptors
+    after each entry instead of seeking back to patch local headers.
+    """
+
+    def __init__(self):
+        self._parts: List[bytes] = []
+        self._pos = 0
+
+    def write(self, b) -> int:
+        n = len(b)
+        if n:
+            self._parts.append(bytes(b))
+            self._pos += n
+        return n
+
+    def tell(self) -> int:
+        return self._pos
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        if not self._parts:
+            return b""
+        out = b"".join(self._parts)
+        self._parts.clear()
+        return out
+
+
+def stream_zip(entries: Iterable[Entry]) -> Iterator[bytes]:
+    """
+    Yield a ZIP archive incrementally. Each entry's payload may be bytes or an
+    iterable of byte blocks; blocks are written (and yielded) as they arrive,
+    so peak memory is one block plus zipfile's small internal buffers.
+    """
+    sink = _Sink()
+    with zipfile.ZipFile(sink, "w", allowZip64=True) as zf:
+        for name, payload, compress_type in entries:
+            info = zipfile.ZipInfo(name)
+            info.compress_type = compress_type
+            info.external_attr = 0o644 << 16
+            with zf.open(info, "w", force_zip64=True) as dst:
+                if isinstance(payload, (bytes, bytearray, memoryview)):
+                    dst.write(payload)
+                else:
+                    for block in payload:
+                        dst.write(block)
+                        out = sink.drain()
+                        if out:
+                            yield out
+            out = sink.drain()
+            if out:
+                yield out
+    out = sink.drain()  # central directory
+    if out:
+        yield out
+
+
+def wav_header(sr: int, nsamples: Optional[int]) -> bytes:
+    """
+    Canonical 44-byte PCM16 mono WAV header for a known number of samples, or
+    (nsamples=None) the streaming form with both sizes set to 0xFFFFFFFF.
+    """
+    riff, data = (0xFFFFFFFF, 0xFFFFFFFF) if nsamples is None else (36 + nsamples * 2, nsamples * 2)
+    hdr = b"RIFF" + struct.pack("<I", riff) + b"WAVE"
+    hdr += b"fmt " + struct.pack("<IHHIIHH", 16, 1, 1, sr, sr * 2, 2, 16)
+    hdr += b"data" + struct.pack("<I", data)
+    return hdr
+
+
+def wav_blocks(wavs: Sequence[np.ndarray], sr: int) -> Iterator[bytes]:
+    """Header + per-chunk PCM16 blocks; never materializes the concatenated audio."""
+    yield wav_header(sr, sum(len(w) for w in wavs))
+    for w in wavs:
+        yield (np.clip(w, -1, 1) * 32767).astype("<i2").tobytes()
+
+
+class WavSpool:
+    """
+    PCM16 mono WAV file written incrementally: chunks are appended as soon as
+    they are synthesized and the header is patched with the final size on close.
+    The sample rate is taken from the first chunk.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.sr = 0
+        self.nsamples = 0
+        self._f = None
+
+    def append(self, wav: np.ndarray, sr: int) -> None:
+        if self._f is None:
+            self.sr = int(sr)
+            self._f = open(self.path, "wb")
+            self._f.write(wav_header(self.sr, 0))
+        elif sr != self.sr:
+            raise ValueError(f"sample rate changed mid-stream ({self.sr} -> {sr})")
+        a16 = (np.clip(wav, -1, 1) * 32767).astype("<i2")
+        self._f.write(a16.tobytes())
+        self.nsamples += a16.size
+
+    def flush(self) -> None:
+        """Push appended samples to the OS, so readers of the file see them."""
+        if self._f is not None and not self._f.closed:
+            self._f.flush()
+
+    def close(self) -> None:
+        if self._f is None:
+            self._f = open(self.path, "wb")
+            self._f.write(wav_header(self.sr, 0))
+        if not self._f.closed:
+            self._f.seek(0)
+            self._f.write(wav_header(self.sr, self.nsamples))
+            self._f.close()
+
+
+def file_blocks(path: str, block_size: int = 1 << 20) -> Iterator[bytes]:
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(block_size)
+            if not block:
+                return
+            yield block
+
+
+def stored_member_span(zip_path: str, name: str) -> Tuple[int, int]:
+    """(offset, length) of an uncompressed member's data inside the archive, for serving it in place."""
+    with zipfile.ZipFile(zip_path) as zf:
+        info = zf.getinfo(name)
+        if info.compress_type != zipfile.ZIP_STORED:
+            raise ValueError(f"{name} is compressed")
+        zf.fp.seek(info.header_offset)
+        local = zf.fp.read(30)
+    if local[:4] != b"PK\x03\x04":
+        raise zipfile.BadZipFile(f"bad local header for {name}")
+    name_len, extra_len = struct.unpack("<HH", local[26:30])
+    return info.header_offset + 30 + name_len + extra_len, info.file_size
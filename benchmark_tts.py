@@ -5,12 +5,24 @@ Benchmark Kokoro and (optionally) CosyVoice 2 on the same text.
 Measures: wall time, Real-Time Factor (RTF), and RSS memory.
 Optionally runs aeneas or MFA alignment if installed and requested.
 
+With --clients, Kokoro throughput (chunks/sec) is measured with that many
+concurrent callers, through the cross-request batcher and with batching off
+(a batcher with batch size 1), at the configured KOKORO_BATCH_MAX_PAD.
+
+With --precision, the engine is loaded the way the server loads it
+(app.services.models) in float32 and/or dynamic int8, each in a fresh
+process, and model memory and steady-state RTF are compared.
+
 Usage:
   python benchmark_tts.py --engine kokoro
   python benchmark_tts.py --engine cosyvoice
   python benchmark_tts.py --engine all
+  python benchmark_tts.py --engine kokoro --precision compare
+  python benchmark_tts.py --engine kokoro --clients 8,16,32
 """
 import argparse
+import json
+import re
 import time
 import os
 import sys
@@ -90,6 +102,139 @@ def run_cosyvoice(text, out_wav, lang="en"):
     return dt, dur
 
 
+QUANT_ENV = {"kokoro": "KOKORO_QUANTIZE", "cosyvoice": "COSY_QUANTIZE"}
+
+
+def run_server_engine(engine, text, precision, repeats):
+    """
+    Load `engine` through the server's model manager at `precision` and time
+    `repeats` renders of `text` after one warm-up render. Run in its own
+    process (see compare_precision) so memory figures are not mixed up.
+    """
+    os.environ[QUANT_ENV[engine]] = "int8" if precision == "int8" else "none"
+    os.environ.setdefault("KOKORO_REPLICAS", "1")  # measure one model copy, not a pool
+    os.environ.setdefault("CUDA_VISIBLE_DEVICES", "")  # int8 is a CPU mode: compare both on CPU
+    os.environ.setdefault("COSY_DEVICE", "cpu")
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from app.services.lifecycle import MODELS
+    from app.utils import synthesize as synth
+
+    name = "kokoro" if engine == "kokoro" else "cosyvoice2"
+    if name == "kokoro":
+        import app.services.kokoro_pool  # noqa: F401  (registers the model)
+    else:
+        import app.services.models  # noqa: F401
+    chunks = [c.strip() for c in re.split(r"(?<=[.!?])\s+", text) if c.strip()]
+
+    def render():
+        if name == "kokoro":
+            wavs, sr = synth.synthesize_kokoro_chunks(chunks, voice="af_heart", speed=1.0)
+        else:
+            wavs, sr = synth.synthesize_cosyvoice2_chunks(chunks)
+        return sum(len(w) for w in wavs) / float(sr)
+
+    rss0 = rss_mb()
+    t0 = time.perf_counter()
+    status = MODELS.load(name)
+    load_s = time.perf_counter() - t0
+    model_mb = rss_mb() - rss0
+    render()  # warm-up: first-call kernel/allocator setup is not steady-state speed
+    times, dur = [], 0.0
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        dur = render()
+        times.append(time.perf_counter() - t0)
+    return {
+        "precision": "int8" if status.get("precision") == "int8" else "float32",
+        "load_s": load_s,
+        "model_mb": model_mb,
+        "peak_rss_mb": rss_mb_peak(),
+        "audio_s": dur,
+        "rtf": float(np.median(times)) / max(dur, 1e-6),
+    }
+
+
+def rss_mb_peak():
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1024 if sys.platform != "darwin" else peak / (1024 * 1024)
+    except ImportError:  # Windows
+        return psutil.Process().memory_info().peak_wset / (1024 * 1024)
+
+
+def compare_precision(engine, text, precisions, repeats):
+    """Run each precision in a child process and print one comparison table. Returns the number that failed."""
+    rows = []
+    for precision in precisions:
+        out = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--engine", engine, "--text", text,
+             "--precision", precision, "--repeats", str(repeats), "--child"],
+            capture_output=True, text=True)
+        if out.returncode != 0:
+            print(f"{precision}: failed\n{out.stderr.strip()[-2000:]}")
+            continue
+        rows.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    if not rows:
+        return len(precisions)
+    print(f"{'precision':<10} {'load s':>7} {'model MB':>9} {'peak MB':>8} {'audio s':>8} {'RTF':>6}")
+    for r in rows:
+        print(f"{r['precision']:<10} {r['load_s']:>7.2f} {r['model_mb']:>9.1f} {r['peak_rss_mb']:>8.1f} "
+              f"{r['audio_s']:>8.2f} {r['rtf']:>6.3f}")
+    if len(rows) == 2 and rows[1]["rtf"] > 0:
+        a, b = rows
+        print(f"{b['precision']} vs {a['precision']}: {a['rtf'] / b['rtf']:.2f}x speed, "
+              f"{b['model_mb'] - a['model_mb']:+.1f} MB model memory")
+    return len(precisions) - len(rows)
+
+
+def run_concurrent_clients(text, clients, repeats):
+    """
+    Throughput of the Kokoro batcher: each of `clients` threads renders the
+    sentences of `text` `repeats` times. Every level runs once with batching
+    (KOKORO_BATCH_* settings) and once with batch size 1 on the same pool.
+    """
+    os.environ.setdefault("KOKORO_QUANTIZE", "none")
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import threading
+    from app.services.kokoro_batcher import KokoroBatcher
+    from app.services.kokoro_pool import get_kokoro_pool
+
+    chunks = [c.strip() for c in re.split(r"(?<=[.!?])\s+", text) if c.strip()]
+    pool = get_kokoro_pool()
+    modes = {
+        "batched": dict(window_ms=float(os.environ.get("KOKORO_BATCH_WINDOW_MS", "10")),
+                        max_batch=int(os.environ.get("KOKORO_BATCH_MAX", "16")),
+                        max_pad=float(os.environ.get("KOKORO_BATCH_MAX_PAD", "0"))),
+        "unbatched": dict(window_ms=0, max_batch=1),
+    }
+    print(f"{'clients':>7} {'mode':<10} {'chunks/s':>9} {'avg batch':>10}")
+    for n in clients:
+        for mode, kwargs in modes.items():
+            batcher = KokoroBatcher(pool=pool, **kwargs)
+            batcher.synthesize(chunks[:1], voice="af_heart", speed=1.0)  # warm-up
+            barrier = threading.Barrier(n + 1)
+
+            def client(speed):
+                barrier.wait()
+                for _ in range(repeats):
+                    batcher.synthesize(chunks, voice="af_heart", speed=speed)
+
+            # Slightly different speeds stand in for different texts: identical
+            # segments would share frame counts and flatter the decoder batching
+            threads = [threading.Thread(target=client, args=(0.9 + 0.2 * i / n,)) for i in range(n)]
+            for t in threads:
+                t.start()
+            barrier.wait()
+            t0 = time.perf_counter()
+            for t in threads:
+                t.join()
+            dt = time.perf_counter() - t0
+            stats = batcher.stats()
+            batcher.close()
+            print(f"{n:>7} {mode:<10} {n * repeats * len(chunks) / dt:>9.2f} {stats['avg_batch']:>10.2f}")
+
+
 def maybe_align_with_aeneas(audio_path, text, out_srt):
     """Optional lightweight alignment if aeneas is installed.
        NOTE: aeneas is AGPL-3. Use only if that license is acceptable."""
@@ -143,8 +288,33 @@ def main():
     ap.add_argument("--text", default=SAMPLE_TEXT)
     ap.add_argument("--align", action="store_true",
                     help="Try aeneas if installed (AGPL).")
+    ap.add_argument("--precision", choices=["float32", "int8", "compare"],
+                    help="Benchmark the server's loading path at this precision (compare: float32 vs int8).")
+    ap.add_argument("--repeats", type=int, default=3,
+                    help="Timed renders per precision (median RTF is reported).")
+    ap.add_argument("--clients",
+                    help="Comma-separated concurrent client counts for a Kokoro batcher throughput run (e.g. 8,16,32).")
+    ap.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
     args = ap.parse_args()
 
+    if args.clients:
+        run_concurrent_clients(args.text, [int(n) for n in args.clients.split(",")], args.repeats)
+        return
+
+    if args.precision:
+        engines = [args.engine] if args.engine != "all" else ["kokoro", "cosyvoice"]
+        if args.child:
+            print(json.dumps(run_server_engine(engines[0], args.text, args.precision, args.repeats)))
+            return
+        failed = 0
+        for eng in engines:
+            print(f"\n== Precision benchmark: {eng} ==")
+            precisions = ["float32", "int8"] if args.precision == "compare" else [args.precision]
+            failed += compare_precision(eng, args.text, precisions, args.repeats)
+        if failed:
+            sys.exit(1)
+        return
+
     engines = [args.engine] if args.engine != "all" else [
         "kokoro", "cosyvoice"]
     os.makedirs("bench_out", exist_ok=True)
@@ -0,0 +1,44 @@
+import pytest
+
+# A randomly initialized Kokoro small enough to build in a second: same module
+# layout as the real model (the decoder keeps its 512 channels and the 256-d
+# style vector), so code that walks or batches the model is exercised offline.
+TINY_KOKORO_CONFIG = {
+    "vocab": {c: i + 1 for i, c in enumerate("abcdefghijklmnopqrstuvwxyz .,!?ðɛɹəɪʃʊˈ")},
+    "n_token": 64,
+    "hidden_dim": 512,
+    "style_dim": 128,
+    "n_layer": 1,
+    "max_dur": 50,
+    "dropout": 0.0,
+    "text_encoder_kernel_size": 5,
+    "n_mels": 80,
+    "plbert": {"hidden_size": 64, "num_attention_heads": 2, "intermediate_size": 128,
+               "max_position_embeddings": 64, "num_hidden_layers": 1, "dropout": 0.0},
+    "istftnet": {"upsample_kernel_sizes": [20, 12], "upsample_rates": [10, 6], "gen_istft_hop_size": 5,
+                 "gen_istft_n_fft": 20, "resblock_dilation_sizes": [[1, 3, 5]] * 3,
+                 "resblock_kernel_sizes": [3, 7, 11], "upsample_initial_channel": 512},
+}
+
+
+@pytest.fixture
+def tiny_kokoro(tmp_path):
+    """Factory for tiny random-weight KModels (no Hugging Face download)."""
+    torch = pytest.importorskip("torch")
+    kokoro = pytest.importorskip("kokoro")
+    weights = tmp_path / "empty.pth"
+    torch.save({}, weights)
+
+    def build(seed: int = 0):
+        torch.manual_seed(seed)
+        return kokoro.KModel(repo_id="hexgrad/Kokoro-82M", config=TINY_KOKORO_CONFIG, model=str(weights)).eval()
+
+    return build
+
+
+@pytest.fixture
+def quiet_decoder(monkeypatch):
+    """Silence the decoder's random phase and noise so two renders can be compared exactly."""
+    torch = pytest.importorskip("torch")
+    monkeypatch.setattr(torch, "rand", lambda *size, **kw: torch.zeros(*size, device=kw.get("device")))
+    monkeypatch.setattr(torch, "randn_like", torch.zeros_like)
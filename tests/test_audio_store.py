@@ -0,0 +1,40 @@
+"""AudioStore: renders spooled in its spool_dir are published without a copy."""
+import os
+
+from app.services.audio_store import AudioStore
+
+KEY = "0123456789abcdef0123456789abcdef"
+
+
+def _spool(store: AudioStore, name: str, nbytes: int) -> str:
+    path = os.path.join(store.spool_dir, name)
+    with open(path, "wb") as f:
+        f.write(b"\0" * nbytes)
+    return path
+
+
+def test_put_from_spool_is_a_hard_link(tmp_path):
+    store = AudioStore(str(tmp_path / "renders"), 1 << 20)
+    src = _spool(store, "render_a.wav", 1000)
+    stored = store.put(KEY, src)
+    assert os.path.samefile(stored, src)
+    assert store.put(KEY, src) == stored  # idempotent
+
+
+def test_spool_is_not_counted_or_evicted(tmp_path):
+    store = AudioStore(str(tmp_path / "renders"), 3000, low_water=0.5)
+    live = _spool(store, "render_live.wav", 2500)  # a render still being written
+    store.put(KEY, _spool(store, "render_a.wav", 1000))
+    store.put(KEY.replace("0", "f"), _spool(store, "render_b.wav", 1000))
+    assert os.path.exists(live)
+    assert store.stats()["bytes"] == 2000
+
+
+def test_stale_spool_files_are_removed_on_start(tmp_path):
+    root = str(tmp_path / "renders")
+    store = AudioStore(root, 1 << 20)
+    old = _spool(store, "render_old.wav", 10)
+    fresh = _spool(store, "render_new.wav", 10)
+    os.utime(old, (0, 0))
+    AudioStore(root, 1 << 20)
+    assert not os.path.exists(old) and os.path.exists(fresh)
@@ -0,0 +1,70 @@
+"""DiskChunkCache: WAV round-trip, LRU eviction and concurrent writers."""
+import os
+import threading
+
+import numpy as np
+
+from app.utils.chunk_cache import DiskChunkCache
+
+SR = 24000
+
+
+def _audio(seed: int, n: int = 2400) -> np.ndarray:
+    return np.random.default_rng(seed).uniform(-1, 1, n).astype(np.float32)
+
+
+def test_put_get_round_trip(tmp_path):
+    cache = DiskChunkCache(str(tmp_path), 1 << 30)
+    audio = _audio(0)
+    cache.put("ab12", audio, SR)
+    got = cache.get("ab12")
+    np.testing.assert_allclose(got, audio, atol=1 / 32767)
+    assert cache.get("ab13") is None
+    assert os.path.dirname(cache.path("ab12")).endswith("ab")
+
+
+def test_corrupt_entry_is_a_miss(tmp_path):
+    cache = DiskChunkCache(str(tmp_path), 1 << 30)
+    os.makedirs(os.path.dirname(cache.path("cd01")))
+    with open(cache.path("cd01"), "wb") as f:
+        f.write(b"RIFF")
+    assert cache.get("cd01") is None
+
+
+def test_evicts_least_recently_used(tmp_path):
+    entry = 44 + 2400 * 2
+    cache = DiskChunkCache(str(tmp_path), 3 * entry, low_water=0.7)
+    for i, key in enumerate(["aa", "bb", "cc"]):
+        cache.put(key, _audio(i), SR)
+        os.utime(cache.path(key), (1000 + i, 1000 + i))
+    assert cache.get("aa") is not None  # refreshes its mtime: "bb" is now the oldest
+    cache.put("dd", _audio(3), SR)  # over the cap: evict down to 70% (two entries)
+    assert [k for k in ("aa", "bb", "cc", "dd") if cache.get(k) is not None] == ["aa", "dd"]
+
+
+def test_concurrent_writers_never_expose_partial_files(tmp_path):
+    caches = [DiskChunkCache(str(tmp_path), 1 << 30) for _ in range(2)]  # as two workers would
+    audio = {f"{k:02x}{k:02x}": _audio(k, 24000) for k in range(8)}
+    errors = []
+
+    def writer(cache):
+        for key, a in audio.items():
+            cache.put(key, a, SR)
+
+    def reader():
+        for _ in range(50):
+            for key, a in audio.items():
+                got = caches[0].get(key)
+                if got is not None and got.shape != a.shape:
+                    errors.append(key)
+
+    threads = [threading.Thread(target=writer, args=(c,)) for c in caches for _ in range(2)]
+    threads.append(threading.Thread(target=reader))
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+    for key, a in audio.items():
+        np.testing.assert_allclose(caches[1].get(key), a, atol=1 / 32767)
+    assert not [name for _, _, names in os.walk(tmp_path) for name in names if name.endswith(".tmp")]
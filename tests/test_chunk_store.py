@@ -0,0 +1,103 @@
+"""PackedChunkStore: round-trip, compaction, memmap views across compaction, concurrent writers."""
+import os
+import threading
+
+import numpy as np
+
+from app.utils.chunk_store import PackedChunkStore
+
+SR = 24000
+
+
+def _pcm(seed: int, n: int = 1000) -> np.ndarray:
+    return np.random.default_rng(seed).integers(-32768, 32767, n, dtype=np.int16)
+
+
+def _packs(root) -> list:
+    return sorted(n for n in os.listdir(root) if n.startswith("pack-"))
+
+
+def test_put_get_round_trip(tmp_path):
+    store = PackedChunkStore(str(tmp_path), 1 << 30)
+    pcm = _pcm(0)
+    floats = np.linspace(-1, 1, 500, dtype=np.float32)
+    assert store.put_many([("a", pcm, SR), ("b", floats, 16000)]) == 2
+    assert store.put_many([("a", pcm, SR)]) == 0  # already stored
+
+    got = store.get_many(["a", "b", "missing"])
+    assert sorted(got) == ["a", "b"]
+    assert isinstance(got["a"][0], np.memmap)
+    np.testing.assert_array_equal(got["a"][0], pcm)
+    assert got["a"][1] == SR
+    np.testing.assert_allclose(got["b"][0] / 32767, floats, atol=1 / 32767)
+    assert got["b"][1] == 16000
+    assert store.stats()["live_bytes"] == (1000 + 500) * 2
+
+
+def test_pack_rolls_over_and_grown_pack_is_remapped(tmp_path):
+    store = PackedChunkStore(str(tmp_path), 1 << 30, pack_bytes=3000)
+    store.put_many([("a", _pcm(0), SR)])
+    assert store.get("a") is not None  # maps pack 1 at its current size
+    store.put_many([("b", _pcm(1), SR)])  # same pack (2000 < 3000 bytes), now longer than the map
+    np.testing.assert_array_equal(store.get("b")[0], _pcm(1))
+    store.put_many([("c", _pcm(2), SR)])  # pack 1 is full: starts pack 2
+    assert _packs(tmp_path) == ["pack-000001.bin", "pack-000002.bin"]
+    np.testing.assert_array_equal(store.get("c")[0], _pcm(2))
+
+
+def test_compaction_evicts_lru_and_rewrites_sparse_packs(tmp_path):
+    store = PackedChunkStore(str(tmp_path), 1 << 30)
+    store.put_many([(k, _pcm(i), SR) for i, k in enumerate("abcde")])
+    before = store.get_many(["a", "b"])  # the most recently used now; views into the pack about to be replaced
+    store.max_bytes = 5500  # low water 80% = 4400 bytes: keeps 2 of the 5 2000-byte entries
+
+    result = store.compact()
+    assert result == {"evicted": 3, "packs_rewritten": 1}
+    assert _packs(tmp_path) == ["pack-000002.bin"]
+    left = store.get_many(list("abcde"))
+    assert sorted(left) == ["a", "b"]
+    for key, (audio, sr) in left.items():
+        np.testing.assert_array_equal(audio, _pcm("abcde".index(key)))
+    assert store.stats()["live_bytes"] == 2 * 2000
+    # views taken before compaction keep reading the old (unlinked) pack's bytes
+    np.testing.assert_array_equal(before["a"][0], _pcm(0))
+    np.testing.assert_array_equal(before["b"][0], _pcm(1))
+
+
+def test_put_over_budget_compacts(tmp_path):
+    store = PackedChunkStore(str(tmp_path), 5000)
+    for i in range(5):
+        store.put_many([(f"k{i}", _pcm(i), SR)])
+    stats = store.stats()
+    assert stats["live_bytes"] <= 5000
+    assert stats["entries"] == len(store.get_many([f"k{i}" for i in range(5)]))
+    assert "k4" in store.get_many(["k4"])  # the newest survives LRU eviction
+
+
+def test_concurrent_writers(tmp_path):
+    stores = [PackedChunkStore(str(tmp_path), 1 << 30, pack_bytes=20000) for _ in range(3)]  # as three workers
+    keys = [f"k{i}" for i in range(60)]
+    errors = []
+
+    def writer(store, offset):
+        try:
+            for i in range(len(keys)):
+                j = (i + offset) % len(keys)  # overlapping keys in different orders
+                store.put_many([(keys[j], _pcm(j), SR)])
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=writer, args=(s, 20 * n)) for n, s in enumerate(stores)]
+    threads += [threading.Thread(target=writer, args=(stores[0], 7))]  # and two threads on one store
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+
+    fresh = PackedChunkStore(str(tmp_path), 1 << 30)
+    got = fresh.get_many(keys)
+    assert sorted(got) == sorted(keys)
+    for i, key in enumerate(keys):
+        np.testing.assert_array_equal(got[key][0], _pcm(i))
+    assert fresh.stats()["live_bytes"] == len(keys) * 2000
@@ -0,0 +1,32 @@
+"""IncrementalSegmenter: sentence cuts around abbreviations and initials."""
+import pytest
+
+from app.utils.chunk_text import IncrementalSegmenter
+
+
+def _segment(*deltas):
+    seg = IncrementalSegmenter()
+    out = []
+    for d in deltas:
+        out += seg.feed(d)
+    return out + seg.flush()
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("It is OK. Then we go on.", ["It is OK.", "Then we go on."]),
+    ("We need a plan b. or c.", ["We need a plan b.", "or c."]),
+    ("Plan B. then we go.", ["Plan B.", "then we go."]),
+    ("J. R. R. Tolkien wrote it. Next one.", ["J. R. R. Tolkien wrote it.", "Next one."]),
+    ("Ask Dr. Smith, e.g. now. Yes.", ["Ask Dr. Smith, e.g. now.", "Yes."]),
+])
+def test_sentence_cuts(text, expected):
+    assert _segment(text + " ") == expected
+
+
+def test_initial_waits_for_the_next_word():
+    seg = IncrementalSegmenter()
+    assert seg.feed("Written by J. ") == []  # "J." might be an initial: no cut yet
+    assert seg.feed("Smith today. ") == ["Written by J. Smith today."]
+    seg = IncrementalSegmenter()
+    assert seg.feed("We chose plan B. ") == []
+    assert seg.feed("then it ended. ") == ["We chose plan B.", "then it ended."]
@@ -0,0 +1,48 @@
+"""StreamCoalescer must not hand a new reader a stream whose producer is already stopping."""
+import threading
+
+from app.services.coalesce import StreamCoalescer
+
+BLOCKS = [b"%d" % i for i in range(5)]
+
+
+def test_join_while_abandoned_stream_closes_starts_a_new_stream():
+    coalescer = StreamCoalescer()
+    closing = threading.Event()
+    release = threading.Event()
+
+    def slow_to_close():
+        try:
+            yield from BLOCKS
+        finally:
+            closing.set()
+            release.wait(5)  # hold the producer between its break and `done`
+
+    first, joined = coalescer.join("k", slow_to_close, max_ahead_blocks=1)
+    assert not joined
+    assert next(first) == BLOCKS[0]
+    first.close()  # the only reader leaves: the producer stops early
+    assert closing.wait(5)
+
+    try:
+        second, joined = coalescer.join("k", lambda: iter(BLOCKS))
+        assert not joined
+        assert list(second) == BLOCKS
+    finally:
+        release.set()
+    assert coalescer.stats()["started"] == 2
+
+
+def test_join_shares_a_running_stream():
+    coalescer = StreamCoalescer()
+    gate = threading.Event()
+
+    def gated():
+        gate.wait(5)
+        yield from BLOCKS
+
+    first, joined_first = coalescer.join("k", gated)
+    second, joined_second = coalescer.join("k", gated)
+    gate.set()
+    assert (joined_first, joined_second) == (False, True)
+    assert list(first) == BLOCKS and list(second) == BLOCKS
@@ -0,0 +1,72 @@
+"""Streaming encoders: G.711 tables match audioop, and block splits do not change the stream."""
+import io
+import warnings
+
+import numpy as np
+import pytest
+
+from app.utils.codecs import G711Encoder, _alaw_table, _ulaw_table, g711_encode, make_stream_encoder
+
+SR = 24000
+ALL_INT16 = np.arange(-32768, 32768, dtype=np.int16)
+
+
+def _audioop():
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", DeprecationWarning)
+        return pytest.importorskip("audioop")  # removed from the stdlib in Python 3.13
+
+
+@pytest.mark.parametrize("law, table", [("ulaw", _ulaw_table), ("alaw", _alaw_table)])
+def test_g711_tables_match_audioop(law, table):
+    audioop = _audioop()
+    convert = audioop.lin2ulaw if law == "ulaw" else audioop.lin2alaw
+    expected = np.frombuffer(convert(ALL_INT16.astype("<i2").tobytes(), 2), dtype=np.uint8)
+    np.testing.assert_array_equal(table(), expected)
+    assert g711_encode(ALL_INT16, law) == expected.tobytes()
+
+
+def _pcm(n: int) -> bytes:
+    t = np.arange(n) / SR
+    return (np.sin(2 * np.pi * 330 * t) * 12000).astype("<i2").tobytes()
+
+
+def _encode(encoder, data: bytes, sizes) -> bytes:
+    out, pos = [], 0
+    for n in sizes:
+        out.append(encoder.encode(data[pos:pos + n]))
+        pos += n
+    out.append(encoder.encode(data[pos:]))
+    out.append(encoder.finish())
+    return b"".join(out)
+
+
+@pytest.mark.parametrize("law", ["ulaw", "alaw"])
+def test_g711_stream_is_independent_of_block_splits(law):
+    data = _pcm(SR // 2)
+    whole = _encode(G711Encoder(SR, law), data, [])
+    assert len(whole) == -(-len(data) // 2 * 8000 // SR)  # one byte per 8 kHz sample
+    odd = _encode(G711Encoder(SR, law), data, [1, 2, 333, 0, 4097, 7, 1001])  # odd splits mid-sample
+    assert odd == whole
+
+
+def test_flac_stream_is_one_decodable_stream():
+    sf = pytest.importorskip("soundfile")
+    data = _pcm(SR)
+    expected = np.frombuffer(data, dtype="<i2")
+    encoded = bytearray(_encode(make_stream_encoder("flac", SR), data, [4801, 3, 9000, 12345]))
+    assert encoded.startswith(b"fLaC") and encoded.count(b"fLaC") == 1
+    # The stream leaves STREAMINFO's sample count at 0 ("unknown"), which libsndfile
+    # cannot read back; fill it in (36 bits from byte 21) as a seekable writer would
+    n = len(expected)
+    encoded[21] = (encoded[21] & 0xF0) | (n >> 32)
+    encoded[22:26] = (n & 0xFFFFFFFF).to_bytes(4, "big")
+    decoded, sr = sf.read(io.BytesIO(bytes(encoded)), dtype="int16")
+    assert sr == SR
+    np.testing.assert_array_equal(decoded, expected)
+
+
+def test_raw_formats_have_no_encoder():
+    assert make_stream_encoder("wav", SR) is None
+    assert make_stream_encoder("pcm", SR) is None
+    assert isinstance(make_stream_encoder("MULAW", SR), G711Encoder)
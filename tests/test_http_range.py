@@ -0,0 +1,73 @@
+"""Range, If-Range and conditional requests on GET /audio/{key}.wav."""
+import os
+
+import pytest
+
+pytest.importorskip("fastapi")
+
+KEY = "00112233445566778899aabbccddeeff"
+BODY = bytes(range(256)) * 4
+
+
+@pytest.fixture
+def client(tmp_path_factory, monkeypatch):
+    base = tmp_path_factory.mktemp("api")
+    os.environ.setdefault("TTS_JOBS_DIR", str(base / "jobs"))  # only matters if app.api is imported here first
+    os.environ.setdefault("TTS_CACHE_DIR", str(base / "cache"))
+    from fastapi.testclient import TestClient
+
+    import app.api as api
+    from app.services.audio_store import AudioStore
+
+    store = AudioStore(str(base / "renders"), 1 << 20)
+    src = os.path.join(store.spool_dir, "render.wav")
+    with open(src, "wb") as f:
+        f.write(BODY)
+    store.put(KEY, src)
+    monkeypatch.setattr(api, "AUDIO_STORE", store)
+    return TestClient(api.app)
+
+
+def test_full_and_partial_content(client):
+    r = client.get(f"/audio/{KEY}.wav")
+    assert r.status_code == 200 and r.content == BODY
+    assert r.headers["accept-ranges"] == "bytes"
+    assert r.headers["content-length"] == str(len(BODY))
+    assert "must-revalidate" in r.headers["cache-control"]
+
+    r = client.get(f"/audio/{KEY}.wav", headers={"Range": "bytes=10-19"})
+    assert r.status_code == 206 and r.content == BODY[10:20]
+    assert r.headers["content-range"] == f"bytes 10-19/{len(BODY)}"
+
+    r = client.get(f"/audio/{KEY}.wav", headers={"Range": "bytes=-5"})
+    assert r.status_code == 206 and r.content == BODY[-5:]
+
+    r = client.head(f"/audio/{KEY}.wav", headers={"Range": "bytes=0-99"})
+    assert r.status_code == 206 and r.headers["content-length"] == "100" and r.content == b""
+
+
+def test_unsatisfiable_range(client):
+    r = client.get(f"/audio/{KEY}.wav", headers={"Range": f"bytes={len(BODY)}-"})
+    assert r.status_code == 416
+    assert r.headers["content-range"] == f"bytes */{len(BODY)}"
+
+
+def test_not_modified_keeps_validators_and_cache_control(client):
+    first = client.get(f"/audio/{KEY}.wav")
+    etag = first.headers["etag"]
+    r = client.get(f"/audio/{KEY}.wav", headers={"If-None-Match": f'"other", W/{etag}'})
+    assert r.status_code == 304 and r.content == b""
+    assert r.headers["etag"] == etag
+    assert r.headers["cache-control"] == first.headers["cache-control"]
+    assert r.headers["last-modified"] == first.headers["last-modified"]
+
+    assert client.get(f"/audio/{KEY}.wav", headers={"If-None-Match": '"other"'}).status_code == 200
+
+
+def test_if_range(client):
+    first = client.get(f"/audio/{KEY}.wav")
+    for validator in (first.headers["etag"], first.headers["last-modified"]):
+        r = client.get(f"/audio/{KEY}.wav", headers={"Range": "bytes=0-9", "If-Range": validator})
+        assert r.status_code == 206 and r.content == BODY[:10]
+    r = client.get(f"/audio/{KEY}.wav", headers={"Range": "bytes=0-9", "If-Range": '"stale"'})
+    assert r.status_code == 200 and r.content == BODY  # changed since: the whole representation
@@ -0,0 +1,32 @@
+"""JobManager retention: finished jobs are deleted `ttl` seconds after they finish."""
+import time
+
+from app.services.jobs import JobManager
+
+
+def test_sweep_deletes_expired_jobs_and_their_files(tmp_path):
+    jobs = JobManager(str(tmp_path), ttl=60)
+    old_done = jobs.submit({"engine": "kokoro"}, text="old")
+    old_failed = jobs.submit({"engine": "kokoro"}, text="failed")
+    recent = jobs.submit({"engine": "kokoro"}, text="recent")
+    queued = jobs.submit({"engine": "kokoro"}, text="still queued")
+    now = time.time()
+    jobs._update(old_done, state="done", finished=now - 120)
+    jobs._update(old_failed, state="failed", finished=now - 120)
+    jobs._update(recent, state="done", finished=now - 10)
+
+    assert jobs.sweep(now) == 2
+    for job_id in (old_done, old_failed):
+        assert jobs.status(job_id) is None
+        assert not (tmp_path / job_id).exists()
+    for job_id in (recent, queued):
+        assert jobs.status(job_id) is not None
+        assert (tmp_path / job_id).exists()
+
+
+def test_zero_ttl_keeps_jobs(tmp_path):
+    jobs = JobManager(str(tmp_path), ttl=0)
+    job_id = jobs.submit({"engine": "kokoro"}, text="kept")
+    jobs._update(job_id, state="done", finished=0.0)
+    assert jobs.sweep() == 0
+    assert jobs.status(job_id)["state"] == "done"
@@ -0,0 +1,40 @@
+"""Batched Kokoro inference must produce the same audio as running each segment alone."""
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("kokoro")
+
+from app.services.kokoro_batcher import _pad_groups, forward_batch  # noqa: E402
+
+def test_pad_groups_default_only_groups_equal_lengths():
+    assert sorted(map(sorted, _pad_groups([10, 11, 10, 20], 0.0))) == [[0, 2], [1], [3]]
+    assert sorted(map(sorted, _pad_groups([10, 11, 10, 20], 0.15))) == [[0, 1, 2], [3]]
+
+
+# Phoneme strings in the tiny model's vocabulary; two are equal so the decoder
+# gets a real multi-item group, the others have their own frame counts
+PHONEMES = [
+    "həlˈO ðɛɹ.",
+    "həlˈO ðɛɹ.",
+    "ðɪs sɛntəns ɪz kwaɪt ə bɪt lɔŋɡəɹ ðæn ðə ʌðəɹz.",
+    "ʃɔɹt wʌn.",
+]
+
+
+def test_batched_matches_per_item(tiny_kokoro, quiet_decoder):
+    model = tiny_kokoro()
+    phonemes = ["".join(p for p in ps if p in model.vocab) for ps in PHONEMES]
+    torch.manual_seed(1)
+    ref_s = torch.randn(len(phonemes), 256)
+    speed = torch.full((len(phonemes),), 5.0)  # random weights predict long durations; keep the decode small
+
+    with torch.no_grad():
+        batched = dict(forward_batch(model, phonemes, ref_s, speed))
+
+    assert sorted(batched) == list(range(len(phonemes)))
+    for i, ps in enumerate(phonemes):
+        with torch.no_grad():
+            single = model(ps, ref_s[i:i + 1], 5.0)
+        assert batched[i].shape == single.shape
+        scale = single.abs().max()  # random weights give arbitrary amplitudes; compare relative to the peak
+        torch.testing.assert_close(batched[i] / scale, single / scale, rtol=1e-4, atol=1e-4)
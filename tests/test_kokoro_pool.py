@@ -0,0 +1,34 @@
+"""The replica pool must be able to copy a freshly loaded Kokoro model."""
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("kokoro")
+
+from app.services import kokoro_pool  # noqa: E402
+from app.services.models import KOKORO_REGISTRY  # noqa: E402
+
+
+def test_pool_with_two_replicas_copies_the_model(tiny_kokoro, quiet_decoder, monkeypatch):
+    base = tiny_kokoro()
+    monkeypatch.setattr(KOKORO_REGISTRY, "model", lambda *a, **kw: base)
+
+    pool = kokoro_pool.KokoroPool(replicas=2, threads=1, pin=False)
+    try:
+        assert len(pool) == 2
+        a, b = (r.model for r in pool.replicas)
+        assert a is base and b is not base
+        assert b.decoder.generator.conv_post.weight_v.data_ptr() != a.decoder.generator.conv_post.weight_v.data_ptr()
+        ref_s = torch.randn(1, 256)
+        outs = [r.run(r.model, "hello there.", ref_s, 1.0) for r in pool.replicas]
+        torch.testing.assert_close(outs[0], outs[1])
+    finally:
+        pool.close()
+
+
+def test_clone_of_int8_model(tiny_kokoro, quiet_decoder):
+    from app.utils.quantize import quantize_dynamic_int8
+
+    base = quantize_dynamic_int8(tiny_kokoro())
+    clone = kokoro_pool._clone_model(base)
+    ref_s = torch.randn(1, 256)
+    torch.testing.assert_close(clone("hello.", ref_s, 1.0), base("hello.", ref_s, 1.0))
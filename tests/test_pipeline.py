@@ -0,0 +1,73 @@
+"""start_render: audio is readable while synthesis runs, and MFA aligns a prefix meanwhile."""
+import threading
+import time
+
+import numpy as np
+import pytest
+
+pytest.importorskip("torch")
+
+from app.services import pipeline  # noqa: E402
+
+SR = 24000
+
+
+def _fake_synth(gate: threading.Event):
+    def iter_chunks(engine, chunks, *, group, **kwargs):
+        for i, text in enumerate(chunks):
+            if i == len(chunks) - 1:
+                gate.wait(5)  # hold the last chunk back until the test lets it go
+            yield [text], [np.full(SR // 10, 0.25, np.float32)], SR
+    return iter_chunks
+
+
+@pytest.fixture
+def mfa_passes(monkeypatch):
+    passes = []
+
+    def align(texts, wavs, sr, **kwargs):
+        passes.append(len(texts))
+        return [(0.0, len(w) / sr) for w in wavs]
+
+    monkeypatch.setattr(pipeline, "wants_mfa", lambda chunks, align: align)
+    monkeypatch.setattr(pipeline, "mfa_align_chunk_bounds", align)
+    return passes
+
+
+def test_audio_streams_and_prefix_aligns_before_synthesis_ends(monkeypatch, mfa_passes, tmp_path):
+    gate = threading.Event()
+    monkeypatch.setattr(pipeline, "iter_synthesized_chunks", _fake_synth(gate))
+    chunks = ["a" * 120, "b" * 120, "c" * 120]
+
+    render = pipeline.start_render("kokoro", chunks, spool_dir=str(tmp_path), synth_chunks=1,
+                                   align_prefix_chars=200)
+    blocks = render.audio_blocks()
+    header = next(blocks)
+    assert header[4:8] == b"\xff\xff\xff\xff"  # live: streaming header
+    deadline = time.time() + 5
+    while not mfa_passes and time.time() < deadline:
+        time.sleep(0.01)
+    assert mfa_passes == [2] and not render.done  # first 240 chars aligned while chunk 3 is pending
+
+    gate.set()
+    body = b"".join(blocks)
+    assert len(body) == 3 * (SR // 10) * 2
+    render.wait(5)
+    assert mfa_passes == [2, 1]
+    assert render.srt.count("-->") == 3
+    with open(render.wav_path, "rb") as f:
+        assert f.read(44) == pipeline.wav_header(SR, 3 * (SR // 10))  # final header once closed
+    assert b"".join(render.audio_blocks())[44:] == body
+
+
+def test_render_error_reaches_readers(monkeypatch, mfa_passes, tmp_path):
+    def failing(engine, chunks, *, group, **kwargs):
+        yield [chunks[0]], [np.zeros(100, np.float32)], SR
+        raise RuntimeError("engine crashed")
+
+    monkeypatch.setattr(pipeline, "iter_synthesized_chunks", failing)
+    render = pipeline.start_render("kokoro", ["one", "two"], spool_dir=str(tmp_path), synth_chunks=1)
+    with pytest.raises(RuntimeError, match="engine crashed"):
+        b"".join(render.audio_blocks())
+    with pytest.raises(RuntimeError, match="engine crashed"):
+        render.wait(5)
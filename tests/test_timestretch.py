@@ -0,0 +1,50 @@
+"""WSOLA time stretch: output length round(n / speed), streamed == whole-array, pitch kept."""
+import numpy as np
+import pytest
+
+from app.utils.timestretch import WSOLAStretcher, time_stretch
+
+SR = 24000
+SPEEDS = [0.5, 0.8, 1.25, 1.5, 2.0]
+
+
+def _tone(n: int, f: float = 220.0) -> np.ndarray:
+    return (0.5 * np.sin(2 * np.pi * f * np.arange(n) / SR)).astype(np.float32)
+
+
+@pytest.mark.parametrize("speed", SPEEDS)
+@pytest.mark.parametrize("n", [0, 100, 719, 720, SR + 13])
+def test_output_length(speed, n):
+    assert len(time_stretch(_tone(n), SR, speed)) == round(n / speed)
+
+
+@pytest.mark.parametrize("speed", SPEEDS)
+def test_stream_matches_whole_array(speed):
+    x = np.random.default_rng(0).uniform(-0.5, 0.5, SR).astype(np.float32)
+    whole = time_stretch(x, SR, speed)
+
+    rng = np.random.default_rng(1)
+    tsm, parts, pos = WSOLAStretcher(SR, speed), [], 0
+    while pos < len(x):
+        n = int(rng.integers(0, 2000))
+        parts.append(tsm.process(x[pos:pos + n]))
+        pos += n
+    parts.append(tsm.finish())
+    streamed = np.concatenate(parts)
+    assert len(streamed) == round(len(x) / speed)
+    np.testing.assert_allclose(streamed, whole, rtol=1e-5, atol=1e-6)
+
+
+@pytest.mark.parametrize("speed", [0.8, 1.5])
+def test_pitch_is_kept(speed):
+    y = time_stretch(_tone(SR), SR, speed)
+    spectrum = np.abs(np.fft.rfft(y * np.hanning(len(y))))
+    peak = np.argmax(spectrum) * SR / len(y)
+    assert abs(peak - 220.0) < 3.0
+
+
+def test_unit_speed_is_identity_and_bad_speed_rejected():
+    x = _tone(1000)
+    np.testing.assert_array_equal(time_stretch(x, SR, 1.0), x)
+    with pytest.raises(ValueError):
+        WSOLAStretcher(SR, 0.0)